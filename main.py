@@ -5,11 +5,17 @@ st.set_page_config(page_title="E-commerce Chatbot", layout="wide")
 
 st.title("🛒 E-commerce Chatbot Demo")
 
+
+# One bot per browser session: its cart, history and session ID belong to that
+# user. The OpenAI client, Chroma collection and search indexes behind it are
+# shared process-wide, so a new session does not reload them.
 if 'bot' not in st.session_state:
     st.session_state['bot'] = EcommerceChatbot()
 
+bot = st.session_state['bot']
+
 user_input = st.text_input("Ask me about products, prices, or place an order:")
 
 if user_input:
-    response = st.session_state['bot'].handle_message(user_input)
+    response = bot.handle_message(user_input)
     st.markdown(f"**Bot:** {response}")
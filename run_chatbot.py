@@ -40,6 +40,7 @@ try:
     from src.chatbot import EcommerceChatbot
     
     chatbot = EcommerceChatbot()
+    chatbot.warmup()
     chatbot.run()
 except KeyboardInterrupt:
     print("\n\nGoodbye!")
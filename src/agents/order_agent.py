@@ -1,21 +1,29 @@
 """Order Agent for processing orders with stock verification and confirmation."""
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
-from openai import OpenAI
-
-from src.database import check_stock, create_order
+from src.cache import get_product_cache, get_stock_cache
+from src.database import create_order, create_orders, create_pending_order, get_product_meta
+from src.llm_client import get_openai_client
 from src.logger import get_logger
 from src.models import OrderModel
 from src.utils import sanitize_input, validate_email
+from src.vector_store import get_collection
 
 logger = get_logger()
 
+# Stock changes as orders come in, so it is cached much shorter than prices
+STOCK_CACHE_TTL = 10
+
 
 class OrderAgent:
     """Order Agent for processing orders with validation and stock checking."""
     
+    # Background writes that overlap with waiting for user confirmation
+    _io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="order-io")
+    
     def __init__(self, api_key: Optional[str] = None, db_path: str = "./orders.db", vector_store_path: str = "./vector_store"):
         """
         Initialize Order Agent.
@@ -31,15 +39,69 @@ class OrderAgent:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY or OPENROUTER_API_KEY not provided")
         
-        # Configure client for OpenRouter if base_url is provided
-        if base_url:
-            self.client = OpenAI(api_key=self.api_key, base_url=base_url)
-        else:
-            self.client = OpenAI(api_key=self.api_key)
+        # Shared client (OpenRouter if base_url is provided) on a pooled connection
+        self.client = get_openai_client(self.api_key, base_url)
         self.db_path = db_path
         self.vector_store_path = vector_store_path
+        # Products collection handle, opened on first use and reused afterwards
+        self._products_collection = None
+        self.product_cache = get_product_cache()
+        self.stock_cache = get_stock_cache()
         logger.info("Order Agent initialized")
     
+    def _get_products_collection(self):
+        """
+        Get the products collection, opening it on first use.
+        
+        Returns:
+            ChromaDB collection for products
+        """
+        if self._products_collection is None:
+            self._products_collection = get_collection("products", self.vector_store_path)
+        return self._products_collection
+    
+    def _fetch_product_meta(self, product_name: str) -> Optional[Dict]:
+        """
+        Fetch price and stock status for a product in a single metadata read.
+        
+        Reads the products table first and falls back to vector store
+        metadata. Results are cached briefly so verify_stock and
+        get_product_price share one lookup per order.
+        
+        Args:
+            product_name: Name of the product
+        
+        Returns:
+            Dict with 'price' and 'stock_status', or None if not found
+        """
+        cache_key = ("meta", product_name)
+        meta = self.stock_cache.get(cache_key)
+        if meta is not None:
+            return meta
+        
+        # Indexed lookup in the products table; the vector store is the fallback
+        meta = get_product_meta(product_name, self.db_path)
+        if meta is not None:
+            self.stock_cache.set(cache_key, meta, ttl=STOCK_CACHE_TTL)
+            return meta
+        
+        results = self._get_products_collection().get(
+            where={"name": product_name},
+            limit=1,
+            include=["metadatas"]
+        )
+        
+        if not (results and results['metadatas']):
+            return None
+        
+        metadata = results['metadatas'][0]
+        meta = {
+            "price": metadata.get('price'),
+            "stock_status": metadata.get('stock_status', 'in_stock')
+        }
+        self.stock_cache.set(cache_key, meta, ttl=STOCK_CACHE_TTL)
+        return meta
+    
     def verify_stock(self, product_name: str) -> Tuple[bool, str]:
         """
         Verify stock status for a product.
@@ -51,7 +113,18 @@ class OrderAgent:
             Tuple of (can_proceed, message)
         """
         try:
-            stock_status = check_stock(product_name, self.vector_store_path)
+            try:
+                meta = self._fetch_product_meta(product_name)
+            except Exception as e:
+                logger.error(f"Error checking stock for {product_name}: {str(e)}", exc_info=True)
+                meta = None
+            
+            if meta is None:
+                # Unknown products and lookup errors are treated as out of stock for safety
+                logger.warning(f"Product not found in vector store: {product_name}")
+                stock_status = "out_of_stock"
+            else:
+                stock_status = meta["stock_status"]
             
             if stock_status == "out_of_stock":
                 return False, f"Sorry, {product_name} is currently out of stock. Please check back later or consider a similar product."
@@ -75,25 +148,18 @@ class OrderAgent:
         Returns:
             Price as float or None
         """
+        cache_key = ("price", product_name)
+        cached_price = self.product_cache.get(cache_key)
+        if cached_price is not None:
+            return cached_price
+        
         try:
-            import chromadb
-            from chromadb.config import Settings
+            meta = self._fetch_product_meta(product_name)
             
-            client = chromadb.PersistentClient(
-                path=self.vector_store_path,
-                settings=Settings(anonymized_telemetry=False)
-            )
-            collection = client.get_collection("products")
-            
-            results = collection.get(
-                where={"name": product_name},
-                limit=1
-            )
-            
-            if results and results['metadatas'] and len(results['metadatas']) > 0:
-                price = results['metadatas'][0].get('price')
-                if price is not None:
-                    return float(price)
+            if meta and meta["price"] is not None:
+                price = float(meta["price"])
+                self.product_cache.set(cache_key, price)
+                return price
             
             return None
             
@@ -101,6 +167,19 @@ class OrderAgent:
             logger.error(f"Error getting product price: {str(e)}", exc_info=True)
             return None
     
+    def _lookup_stock_and_price(self, product_name: str) -> Tuple[Tuple[bool, str], Optional[float]]:
+        """
+        Verify stock and fetch price from a single metadata read.
+        
+        Args:
+            product_name: Name of the product
+        
+        Returns:
+            Tuple of (verify_stock result, price or None)
+        """
+        # verify_stock populates the metadata cache that get_product_price reads
+        return self.verify_stock(product_name), self.get_product_price(product_name)
+    
     def request_confirmation(self, order_summary: Dict) -> bool:
         """
         Request final confirmation from user.
@@ -143,13 +222,11 @@ class OrderAgent:
             Tuple of (success, message, order_id)
         """
         try:
-            # Verify stock
-            can_proceed, stock_message = self.verify_stock(order_data['product_name'])
+            # Verify stock and get price from metadata
+            (can_proceed, stock_message), unit_price = self._lookup_stock_and_price(order_data['product_name'])
             if not can_proceed:
                 return False, stock_message, None
             
-            # Get price from metadata
-            unit_price = self.get_product_price(order_data['product_name'])
             if unit_price is None:
                 return False, f"Could not retrieve price for {order_data['product_name']}. Please try again.", None
             
@@ -175,11 +252,28 @@ class OrderAgent:
                 'total_price': order.total_price
             }
             
-            if not self.request_confirmation(order_summary):
+            # Stage the order in the background while the user reads the summary,
+            # so confirming only has to move the row into orders
+            staging = self._io_pool.submit(create_pending_order, order, self.db_path)
+            confirmed = self.request_confirmation(order_summary)
+            
+            try:
+                _, commit_pending, discard_pending = staging.result()
+            except Exception as e:
+                logger.warning(f"Could not stage pending order, will write directly: {str(e)}")
+                commit_pending = discard_pending = None
+            
+            if not confirmed:
+                if discard_pending:
+                    try:
+                        discard_pending()
+                    except Exception as e:
+                        logger.error(f"Error discarding pending order: {str(e)}", exc_info=True)
                 return False, "Order cancelled by user.", None
             
             # Save to database
-            order_id = create_order(order, self.db_path)
+            order_id = commit_pending() if commit_pending else create_order(order, self.db_path)
+            self.stock_cache.invalidate(("meta", order.product_name))
             
             confirmation_message = (
                 f"Your order has been confirmed!\n"
@@ -206,13 +300,12 @@ class OrderAgent:
             Tuple of (success, message, order_id)
         """
         try:
-            # Verify stock
-            can_proceed, stock_message = self.verify_stock(order_data['product_name'])
+            # Verify stock and get price from metadata
+            (can_proceed, stock_message), unit_price = self._lookup_stock_and_price(order_data['product_name'])
             if not can_proceed:
                 return False, stock_message, None
             
-            # Get price from metadata (or use unit_price from cart if available)
-            unit_price = self.get_product_price(order_data['product_name'])
+            # Fall back to unit_price from cart if metadata has no price
             if unit_price is None:
                 # Try to get price from order_data if it's a cart item
                 unit_price = order_data.get('unit_price')
@@ -235,6 +328,7 @@ class OrderAgent:
             
             # Save to database (skip confirmation for checkout)
             order_id = create_order(order, self.db_path)
+            self.stock_cache.invalidate(("meta", order.product_name))
             
             confirmation_message = (
                 f"Order confirmed for {order.product_name} x{order.quantity} - ${order.total_price:.2f}"
@@ -245,4 +339,65 @@ class OrderAgent:
         except Exception as e:
             logger.error(f"Error processing order without confirmation: {str(e)}", exc_info=True)
             return False, f"An error occurred while processing your order: {str(e)}", None
-
+    
+    def process_orders_bulk(self, order_dicts: List[Dict]) -> List[Tuple[bool, str, Optional[str]]]:
+        """
+        Process several orders without confirmation, saving them in one transaction.
+        
+        Each order is validated like process_order_without_confirmation;
+        the ones that pass are written together with a single batched INSERT.
+        
+        Args:
+            order_dicts: Dictionaries with order details
+        
+        Returns:
+            (success, message, order_id) for each input order, in input order
+        """
+        results: List[Optional[Tuple[bool, str, Optional[str]]]] = [None] * len(order_dicts)
+        orders: List[OrderModel] = []
+        positions: List[int] = []
+        
+        for i, order_data in enumerate(order_dicts):
+            try:
+                (can_proceed, stock_message), unit_price = self._lookup_stock_and_price(order_data['product_name'])
+                if not can_proceed:
+                    results[i] = (False, stock_message, None)
+                    continue
+                
+                # Fall back to unit_price from cart if metadata has no price
+                if unit_price is None:
+                    unit_price = order_data.get('unit_price')
+                    if unit_price is None:
+                        results[i] = (False, f"Could not retrieve price for {order_data['product_name']}. Please try again.", None)
+                        continue
+                
+                quantity = order_data['quantity']
+                orders.append(OrderModel(
+                    product_name=order_data['product_name'],
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    total_price=quantity * unit_price,
+                    customer_name=order_data.get('customer_name'),
+                    customer_email=order_data.get('customer_email')
+                ))
+                positions.append(i)
+            except Exception as e:
+                logger.error(f"Error preparing order: {str(e)}", exc_info=True)
+                results[i] = (False, f"An error occurred while processing your order: {str(e)}", None)
+        
+        if orders:
+            try:
+                order_ids = create_orders(orders, self.db_path)
+                for i, order, order_id in zip(positions, orders, order_ids):
+                    self.stock_cache.invalidate(("meta", order.product_name))
+                    results[i] = (
+                        True,
+                        f"Order confirmed for {order.product_name} x{order.quantity} - ${order.total_price:.2f}",
+                        order_id
+                    )
+            except Exception as e:
+                logger.error(f"Error saving orders: {str(e)}", exc_info=True)
+                for i in positions:
+                    results[i] = (False, f"An error occurred while processing your order: {str(e)}", None)
+        
+        return results
@@ -1,29 +1,53 @@
 """RAG Agent for product information retrieval."""
 
+import hashlib
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 
-import chromadb
-from chromadb.config import Settings
-from openai import OpenAI
-
 from src.logger import get_logger
+from src.keyword_index import KEYWORD_SYNONYMS, get_keyword_index
 from src.search import get_search_engine, HybridSearch
-from src.cache import get_search_cache
+from src.catalog import PRODUCTS_PATH
+from src.cache import EmbeddingCache, TTLCache, get_product_cache, get_search_cache, get_semantic_cache
+from src.embeddings import get_embedding_batcher
+from src.llm_client import get_openai_client
+from src.debug_log import AGENT_DEBUG, agent_log
+from src.utils import backoff_delay, is_retryable_error
+from src.vector_store import get_chroma_client, get_collection
 
 logger = get_logger()
 
+ANSWER_SYSTEM_PROMPT = """You are a helpful product information assistant for an e-commerce store.
+Your role is to answer customer questions about products using the information provided.
+Always use the exact prices from the product information (never make up prices).
+Be conversational, friendly, and helpful.
+If asked about a product, provide the price, description, and stock status.
+If multiple products match, list them all."""
+
+# Shared by every answer_query prompt; never modified
+ANSWER_SYSTEM_MESSAGE = {"role": "system", "content": ANSWER_SYSTEM_PROMPT}
+
+# Query embeddings saved at exit (in the vector store directory) and restored at startup
+EMBEDDING_CACHE_FILE = "query_embeddings.npz"
+
 
 class RAGAgent:
     """RAG Agent for retrieving product information from vector store."""
     
+    # Runs the parallel BM25 and vector steps of a search; shared
+    # by all agents so the thread count does not grow with each chatbot
+    _search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-search")
+    
     def __init__(
         self,
         vector_store_path: str = "./vector_store",
         embedding_model: Optional[str] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        products_path: str = PRODUCTS_PATH
     ):
         """
         Initialize RAG Agent.
@@ -32,29 +56,26 @@ class RAGAgent:
             vector_store_path: Path to vector store directory
             embedding_model: OpenAI embedding model name
             api_key: OpenAI API key (defaults to environment variable)
+            products_path: Products JSON file used by the keyword fallback search
         """
         self.vector_store_path = vector_store_path
+        self.products_path = products_path
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "openai/text-embedding-3-small")
+        self.chat_model = os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini")
         self.api_key = api_key or os.getenv("OPENAI_API_KEY") or os.getenv("OPENROUTER_API_KEY")
         base_url = os.getenv("OPENROUTER_BASE_URL") or os.getenv("OPENAI_BASE_URL")
         
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY or OPENROUTER_API_KEY not provided")
         
-        # Configure client for OpenRouter if base_url is provided
-        if base_url:
-            self.client = OpenAI(api_key=self.api_key, base_url=base_url)
-        else:
-            self.client = OpenAI(api_key=self.api_key)
+        # Shared client (OpenRouter if base_url is provided) on a pooled connection
+        self.client = get_openai_client(self.api_key, base_url)
         self.last_product: Optional[str] = None
         
         # Initialize vector store connection
         try:
-            self.chroma_client = chromadb.PersistentClient(
-                path=vector_store_path,
-                settings=Settings(anonymized_telemetry=False)
-            )
-            self.collection = self.chroma_client.get_collection("products")
+            self.chroma_client = get_chroma_client(vector_store_path)
+            self.collection = get_collection("products", vector_store_path)
             logger.info(f"RAG Agent initialized with vector store at {vector_store_path}")
         except Exception as e:
             logger.error(f"Error initializing vector store connection: {str(e)}", exc_info=True)
@@ -63,67 +84,113 @@ class RAGAgent:
         # Initialize hybrid search engine
         self.hybrid_search = get_search_engine()
         
+        # Filter extraction is pure per query string, so repeat queries skip the regex work
+        self._extract_filters = lru_cache(maxsize=2048)(
+            lambda query: (
+                self.hybrid_search._extract_price_filter(query),
+                tuple(self.hybrid_search._extract_categories(query))
+            )
+        )
+        
         # Initialize cache
         self.search_cache = get_search_cache()
-        
-        # Initialize embedding cache (instance-level, max 512 entries)
-        self._embedding_cache = {}
+        self.product_cache = get_product_cache()
+        
+        # Initialize embedding cache (instance-level, max 512 entries, stored as float16),
+        # warm-started from the previous session's saved embeddings
+        self._embedding_cache = EmbeddingCache(default_ttl=3600, max_size=512)
+        self._embedding_cache_path = os.path.join(vector_store_path, EMBEDDING_CACHE_FILE)
+        self._load_embedding_cache()
+        # Concurrent searches (across all sessions) share batched embedding requests
+        self._embedder = get_embedding_batcher(self.client, self.embedding_model)
+        
+        # Answer cache keyed by prompt digest, plus in-flight requests by digest
+        self._answer_cache = TTLCache(default_ttl=300, max_size=512)
+        self._answer_inflight: Dict[bytes, Future] = {}
+        self._answer_inflight_lock = threading.Lock()
     
-    def _get_query_embedding(self, query: str, max_retries: int = 3) -> List[float]:
+    def get_query_embedding(self, query: str, max_retries: int = 3) -> List[float]:
         """
         Get query embedding with caching.
         
         Args:
             query: Search query
-            max_retries: Maximum retry attempts
+            max_retries: Maximum retry attempts (unused, the batcher retries)
             
         Returns:
             Query embedding vector
         """
-        # Normalize query for cache key
-        cache_key = query.lower().strip()
-        # Remove extra whitespace
-        cache_key = ' '.join(cache_key.split())
+        cache_key = self._embedding_cache_key(query)
         
         # Check if we have a cached embedding
-        if cache_key in self._embedding_cache:
+        cached_embedding = self._embedding_cache.get(cache_key)
+        if cached_embedding is not None:
             logger.debug(f"Embedding cache hit for query: {query[:50]}...")
-            return self._embedding_cache[cache_key]
+            return cached_embedding
         
-        # Generate query embedding
-        retry_count = 0
-        while retry_count < max_retries:
-            try:
-                response = self.client.embeddings.create(
-                    model=self.embedding_model,
-                    input=[query]
-                )
-                query_embedding = response.data[0].embedding
-                # Cache the embedding (limit cache size to 512 entries)
-                if len(self._embedding_cache) >= 512:
-                    # Remove oldest entry (simple FIFO)
-                    oldest_key = next(iter(self._embedding_cache))
-                    del self._embedding_cache[oldest_key]
-                self._embedding_cache[cache_key] = query_embedding
-                logger.debug(f"Cached embedding for query: {query[:50]}...")
-                return query_embedding
-            except Exception as e:
-                retry_count += 1
-                if retry_count < max_retries:
-                    import time
-                    wait_time = 2 ** retry_count
-                    logger.warning(f"Embedding generation failed, retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"Failed to generate query embedding: {str(e)}", exc_info=True)
-                    raise
+        # Generate query embedding (batched with concurrent searches, retried inside)
+        query_embedding = self._embedder.embed(query)
+        self._embedding_cache.set(cache_key, query_embedding)
+        logger.debug(f"Cached embedding for query: {query[:50]}...")
+        return query_embedding
+    
+    def _load_embedding_cache(self) -> None:
+        """Restore query embeddings saved by an earlier session, if any."""
+        if not os.path.exists(self._embedding_cache_path):
+            return
+        try:
+            restored = self._embedding_cache.load(self._embedding_cache_path, self.embedding_model)
+            logger.info(f"Restored {restored} cached query embeddings")
+        except Exception as e:
+            logger.warning(f"Could not restore query embedding cache: {e}")
+    
+    def save_embedding_cache(self) -> None:
+        """Save cached query embeddings so the next session starts warm."""
+        try:
+            saved = self._embedding_cache.save(self._embedding_cache_path, self.embedding_model)
+            logger.info(f"Saved {saved} cached query embeddings")
+        except Exception as e:
+            logger.warning(f"Could not save query embedding cache: {e}")
+    
+    @staticmethod
+    def _embedding_cache_key(query: str) -> str:
+        """Normalize a query for the embedding cache (case and whitespace insensitive)."""
+        return ' '.join(query.lower().split())
+    
+    def prewarm_query_embeddings(self, queries: List[str]) -> None:
+        """
+        Embed several queries in shared API calls and cache the results.
+        
+        Queries already in the embedding cache are skipped. Errors are logged
+        and left for the individual lookups to retry.
+        
+        Args:
+            queries: Queries that are about to be embedded one by one
+        """
+        missing = {}
+        for query in queries:
+            cache_key = self._embedding_cache_key(query)
+            if cache_key not in missing and self._embedding_cache.get(cache_key) is None:
+                missing[cache_key] = query
+        if not missing:
+            return
+        
+        try:
+            embeddings = self._embedder.embed_many(list(missing.values()))
+        except Exception as e:
+            logger.warning(f"Batch embedding prewarm failed: {e}")
+            return
+        for cache_key, embedding in zip(missing, embeddings):
+            self._embedding_cache.set(cache_key, embedding)
+        logger.debug(f"Prewarmed {len(missing)} query embeddings")
     
     def search_products(
         self,
         query: str,
         k: int = 10,
         max_retries: int = 3,
-        sort_by: str = 'relevance'
+        sort_by: str = 'relevance',
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Search for products using hybrid BM25 + vector search with result fusion.
@@ -133,47 +200,47 @@ class RAGAgent:
             k: Number of results to return
             max_retries: Maximum retry attempts (unused, kept for compatibility)
             sort_by: Sort order ('relevance', 'price_low', 'price_high')
+            query_embedding: Embedding of the query if the caller already has
+                one; otherwise it is computed (or read from cache) once here
         
         Returns:
             List of product dictionaries with metadata, or Dict for multi-category results
         """
-        # #region agent log
-        import time
-        import json
         search_start = time.time()
-        try:
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"rag_agent.py:90","message":"search_products START","data":{"query":query,"k":k},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-        except: pass
-        # #endregion
+        if AGENT_DEBUG:
+            agent_log("rag_agent.py:90", "search_products START", {"query": query, "k": k}, hypothesis_id="C")
         
-        # Create cache key from query parameters
-        cache_key = f"search:{query.lower().strip()}:k{k}:sort{sort_by}"
+        # Create cache key from query parameters (tuples hash without building a string)
+        cache_key = ("search", query.strip().casefold(), k, sort_by)
         
         # Check cache first
         cached_result = self.search_cache.get(cache_key)
         if cached_result is not None:
             logger.info(f"Cache hit for query: {query}")
-            # #region agent log
-            try:
-                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"rag_agent.py:98","message":"search_products CACHE HIT","data":{"query":query},"sessionId":"debug-session","runId":"run1","hypothesisId":"F"}) + '\n')
-            except: pass
-            # #endregion
+            if AGENT_DEBUG:
+                agent_log("rag_agent.py:98", "search_products CACHE HIT", {"query": query}, hypothesis_id="F")
             return cached_result
         
         logger.info(f"Searching products with query: {query}")
         
-        # Extract filters before search (for fallback if needed)
-        price_filter = self.hybrid_search._extract_price_filter(query)
-        categories = self.hybrid_search._extract_categories(query)
-        # #region agent log
-        try:
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_categories_extracted","timestamp":int(time.time()*1000),"location":"rag_agent.py:115","message":"Categories extracted from query","data":{"query":query,"categories":categories},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-        except: pass
-        # #endregion
-        category_filter = categories[0] if categories else None
+        # Paraphrases of an earlier query can reuse its results (opt-in)
+        semantic_cache = get_semantic_cache()
+        semantic_scope = None
+        if semantic_cache is not None:
+            price_filter, categories = self._query_filters(query)
+            semantic_scope = f"k{k}:sort{sort_by}:price{price_filter}:cat{','.join(categories or [])}"
+            try:
+                # Reused by the vector search below
+                if query_embedding is None:
+                    query_embedding = self.get_query_embedding(query, max_retries)
+                cached_result = semantic_cache.get(semantic_scope, query_embedding)
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {e}")
+                cached_result = None
+            if cached_result is not None:
+                logger.info(f"Semantic cache hit for query: {query}")
+                self.search_cache.set(cache_key, cached_result)
+                return cached_result
         
         # Async retrieval: Run BM25 and vector search in parallel for 30-40% speed boost
         def run_bm25_search():
@@ -183,23 +250,19 @@ class RAGAgent:
         def run_vector_search():
             """Run vector search in thread."""
             try:
-                return self._vector_search(query, k=k*2, max_retries=max_retries)
+                return self._vector_search(query, k=k*2, max_retries=max_retries, query_embedding=query_embedding)
             except Exception as e:
                 logger.warning(f"Vector search failed: {e}, using BM25 results only")
                 return []
         
-        # Execute both searches in parallel
-        bm25_products = None
-        vector_products = []
+        # Execute both searches in parallel (the keyword fallback's index is
+        # built by warmup)
+        bm25_future = self._search_executor.submit(run_bm25_search)
+        vector_future = self._search_executor.submit(run_vector_search)
         
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            # Submit both tasks
-            bm25_future = executor.submit(run_bm25_search)
-            vector_future = executor.submit(run_vector_search)
-            
-            # Wait for both to complete
-            bm25_products = bm25_future.result()
-            vector_products = vector_future.result()
+        # Wait for both to complete
+        bm25_products = bm25_future.result()
+        vector_products = vector_future.result()
         
         # Merge BM25 and vector results
         # Handle multi-category results (dict) vs single category (list)
@@ -254,10 +317,8 @@ class RAGAgent:
             else:
                 products = bm25_products[:k] if isinstance(bm25_products, list) else bm25_products
         
-        # #region agent log
         search_end = time.time()
         search_duration = search_end - search_start
-        # #endregion
         
         # Check if results are grouped by category (dict) or flat list
         if isinstance(products, dict):
@@ -269,46 +330,99 @@ class RAGAgent:
                 self.last_product = all_products[0].get('name')
                 logger.info(f"Found products in {len(products)} categories for query: {query}")
             # Cache the result
-            self.search_cache.set(cache_key, products)
-            # #region agent log
-            try:
-                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"rag_agent.py:114","message":"search_products END","data":{"query":query,"duration_ms":search_duration*1000,"result_type":"dict","categories":len(products)},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-            except: pass
-            # #endregion
+            self._cache_search_result(cache_key, products, semantic_scope, query_embedding)
+            if AGENT_DEBUG:
+                agent_log("rag_agent.py:114", "search_products END", {"query": query, "duration_ms": search_duration * 1000, "result_type": "dict", "categories": len(products)}, hypothesis_id="C")
             return products
         elif products:
             self.last_product = products[0].get('name')
             logger.info(f"Found {len(products)} products for query: {query}")
             # Cache the result
-            self.search_cache.set(cache_key, products)
-            # #region agent log
-            try:
-                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"rag_agent.py:120","message":"search_products END","data":{"query":query,"duration_ms":search_duration*1000,"result_type":"list","count":len(products)},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-            except: pass
-            # #endregion
+            self._cache_search_result(cache_key, products, semantic_scope, query_embedding)
+            if AGENT_DEBUG:
+                agent_log("rag_agent.py:120", "search_products END", {"query": query, "duration_ms": search_duration * 1000, "result_type": "list", "count": len(products)}, hypothesis_id="C")
         else:
             # Fallback to basic keyword search WITH filters applied
+            price_filter, categories = self._query_filters(query)
+            category_filter = categories[0] if categories else None
             products = self._keyword_search(query, k, price_filter=price_filter, category_filter=category_filter)
             if products:
                 self.last_product = products[0].get('name')
                 logger.info(f"Fallback found {len(products)} products for query: {query} (with filters applied)")
                 # Cache the result
-                self.search_cache.set(cache_key, products)
+                self._cache_search_result(cache_key, products, semantic_scope, query_embedding)
             else:
                 logger.warning(f"No products found for query: {query}")
                 # Cache empty result to avoid repeated searches
                 self.search_cache.set(cache_key, [], ttl=60)  # Shorter TTL for empty results
-            # #region agent log
-            try:
-                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"rag_agent.py:128","message":"search_products END (fallback)","data":{"query":query,"duration_ms":search_duration*1000,"count":len(products) if products else 0},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-            except: pass
-            # #endregion
+            if AGENT_DEBUG:
+                agent_log("rag_agent.py:128", "search_products END (fallback)", {"query": query, "duration_ms": search_duration * 1000, "count": len(products) if products else 0}, hypothesis_id="C")
         
         return products
     
+    def _query_filters(self, query: str) -> Tuple[Optional[Tuple[float, float]], List[str]]:
+        """
+        Get the price filter and categories for a query, memoized per query string.
+        
+        Args:
+            query: Search query
+        
+        Returns:
+            Tuple of (price filter or None, list of categories)
+        """
+        price_filter, categories = self._extract_filters(query)
+        if AGENT_DEBUG:
+            agent_log("rag_agent.py:115", "Categories extracted from query", {"query": query, "categories": categories}, hypothesis_id="A")
+        return price_filter, list(categories)
+    
+    def _warm_keyword_index(self) -> None:
+        """Build the keyword index used by the fallback search, if not built yet."""
+        try:
+            get_keyword_index(self.products_path)
+        except Exception as e:
+            logger.debug(f"Keyword index warmup failed: {e}")
+    
+    def _cache_search_result(
+        self,
+        cache_key: Tuple,
+        products,
+        semantic_scope: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> None:
+        """
+        Store search results in the exact-match cache and, when enabled, the semantic cache.
+        
+        Args:
+            cache_key: Exact-match cache key
+            products: Search results (list or dict of category lists)
+            semantic_scope: Semantic cache scope, or None if disabled
+            query_embedding: Query embedding, or None if unavailable
+        """
+        self.search_cache.set(cache_key, products)
+        if semantic_scope is not None and query_embedding is not None:
+            get_semantic_cache().set(semantic_scope, query_embedding, products)
+    
+    def warmup(self) -> None:
+        """
+        Load the search indexes before the first user query needs them.
+        
+        Runs one local vector query (ChromaDB loads the collection's HNSW
+        index into memory on first query), builds the keyword index and
+        loads the price map. No embeddings API call is made. Failures are
+        logged and left for the first real search to surface.
+        """
+        warmup_start = time.time()
+        try:
+            sample = self.collection.get(limit=1, include=["embeddings"])
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings) > 0:
+                self.collection.query(query_embeddings=[list(embeddings[0])], n_results=1, include=[])
+            self._warm_keyword_index()
+            self._get_price_map()
+            logger.info(f"Search indexes warmed up in {time.time() - warmup_start:.2f}s")
+        except Exception as e:
+            logger.warning(f"Search warmup failed: {e}")
+    
     def get_recommendations(self, product_name: str, k: int = 3) -> List[Dict]:
         """
         Get product recommendations based on a product.
@@ -330,17 +444,11 @@ class RAGAgent:
         category_filter: Optional[str] = None
     ) -> List[Dict]:
         """Keyword-based search using products.json directly with price and category filters."""
-        import json
-        from pathlib import Path
-        
         try:
-            products_file = Path("./data/products.json")
-            if not products_file.exists():
+            index = get_keyword_index(self.products_path)
+            if index is None:
                 return []
             
-            with open(products_file, 'r') as f:
-                all_products = json.load(f)
-            
             # Enhanced keyword matching with synonyms
             query_lower = query.lower()
             
@@ -351,95 +459,15 @@ class RAGAgent:
                     return word[:-1]  # laptops -> laptop
                 return word
             
-            # Common synonyms/related terms
-            synonyms = {
-                'laptop': ['laptop', 'macbook', 'dell', 'notebook', 'xps', 'portable'],
-                'phone': ['phone', 'iphone', 'samsung', 'galaxy', 'smartphone', 'mobile'],
-                'headphones': ['headphones', 'headphone', 'earbuds', 'airpods', 'earphones', 'headset', 'wh-1000'],
-                'watch': ['watch', 'smartwatch', 'apple watch', 'fitness'],
-                'tablet': ['tablet', 'ipad', 'surface'],
-                'computer': ['computer', 'laptop', 'macbook', 'desktop', 'pc'],
-                'monitor': ['monitor', 'display', 'screen', 'lg'],
-                'keyboard': ['keyboard', 'logitech', 'mechanical'],
-                'mouse': ['mouse', 'logitech'],
-            }
-            
             # Expand keywords with synonyms
             keywords = [normalize_word(k) for k in query_lower.split()]
             expanded_keywords = set(keywords)
             for keyword in keywords:
-                if keyword in synonyms:
-                    expanded_keywords.update(synonyms[keyword])
-            
-            scored_products = []
-            for product in all_products:
-                # Apply price filter if present
-                if price_filter:
-                    price = float(product.get('price', 0))
-                    min_price, max_price = price_filter
-                    if price < min_price or price > max_price:
-                        continue
-                
-                # Apply category filter if present
-                if category_filter:
-                    product_category = product.get('category', '').lower()
-                    product_name = product.get('name', '').lower()
-                    product_desc = product.get('description', '').lower()
-                    
-                    category_match = False
-                    if category_filter == 'phones':
-                        phone_keywords = ['iphone', 'samsung', 'galaxy', 'smartphone', 'mobile phone', 'cell phone']
-                        exclude_keywords = ['headphone', 'earbud', 'airpod', 'speaker']
-                        is_excluded = any(kw in product_name or kw in product_desc for kw in exclude_keywords)
-                        if not is_excluded:
-                            category_match = any(kw in product_name or kw in product_desc for kw in phone_keywords) or 'phone' in product_name
-                    elif category_filter == 'computers':
-                        computer_keywords = ['laptop', 'macbook', 'computer', 'pc', 'desktop', 'xps', 'notebook']
-                        category_match = any(kw in product_name or kw in product_desc for kw in computer_keywords)
-                    elif category_filter == 'audio':
-                        audio_keywords = ['headphone', 'earbud', 'speaker', 'airpod', 'audio', 'sound']
-                        category_match = any(kw in product_name or kw in product_desc for kw in audio_keywords)
-                    elif category_filter == 'gaming':
-                        gaming_keywords = ['playstation', 'xbox', 'nintendo', 'console', 'controller', 'switch', 'ps5']
-                        category_match = any(kw in product_name or kw in product_desc for kw in gaming_keywords)
-                        if any(exclude in product_name or exclude in product_desc for exclude in ['laptop', 'macbook', 'computer', 'xps', 'dell']):
-                            category_match = False
-                    elif category_filter == 'books':
-                        if 'book' in product_category.lower():
-                            category_match = True
-                        else:
-                            book_keywords = ['book', 'novel', 'reading']
-                            exclude_keywords = ['macbook', 'notebook', 'laptop']
-                            has_book_keyword = any(kw in product_name or kw in product_desc for kw in book_keywords)
-                            is_excluded = any(kw in product_name for kw in exclude_keywords)
-                            category_match = has_book_keyword and not is_excluded
-                    elif category_filter == 'wearables':
-                        wearable_keywords = ['watch', 'smartwatch', 'fitness', 'tracker', 'wearable']
-                        category_match = any(kw in product_name or kw in product_desc for kw in wearable_keywords)
-                    elif category_filter == 'electronics':
-                        category_match = 'electronics' in product_category.lower()
-                    
-                    if not category_match:
-                        continue
-                
-                # Score products by keyword matching
-                score = 0
-                searchable = f"{product.get('name', '')} {product.get('description', '')} {product.get('category', '')}".lower()
-                for keyword in expanded_keywords:
-                    if keyword in searchable:
-                        score += 1
-                        # Bonus for exact name match
-                        if keyword in product.get('name', '').lower():
-                            score += 2
-                
-                if score > 0:
-                    scored_products.append((score, product))
-            
-            # Sort by score descending
-            scored_products.sort(key=lambda x: x[0], reverse=True)
+                if keyword in KEYWORD_SYNONYMS:
+                    expanded_keywords.update(KEYWORD_SYNONYMS[keyword])
             
-            # Return top k
-            return [p[1] for p in scored_products[:k]]
+            # Score every product at once; ties keep catalog order
+            return index.top_matches(expanded_keywords, k, price_filter, category_filter)
         except Exception as e:
             logger.error(f"Keyword search failed: {str(e)}")
             return []
@@ -448,11 +476,13 @@ class RAGAgent:
         self,
         query: str,
         k: int = 3,
-        max_retries: int = 3
+        max_retries: int = 3,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """Vector similarity search using embeddings with caching."""
-        # Get cached or generate query embedding
-        query_embedding = self._get_query_embedding(query, max_retries)
+        # Get cached or generate query embedding unless the caller passed one
+        if query_embedding is None:
+            query_embedding = self.get_query_embedding(query, max_retries)
         
         # Search vector store
         results = self.collection.query(
@@ -465,18 +495,19 @@ class RAGAgent:
         products = []
         if results['metadatas'] and len(results['metadatas']) > 0:
             distances = results.get('distances', [[]])[0] if results.get('distances') else []
+            documents = results['documents'][0] if results.get('documents') else None
+            # Normalize: similarity = 1 - distance / max_distance (computed once per query)
+            max_distance = max(distances) if distances else 1.0
             for i, metadata in enumerate(results['metadatas'][0]):
                 # Convert distance to similarity score (1 - normalized distance)
                 # ChromaDB returns distances (lower is better), convert to similarity (higher is better)
                 distance = distances[i] if i < len(distances) else 1.0
-                # Normalize: similarity = 1 / (1 + distance) or 1 - normalized_distance
-                max_distance = max(distances) if distances else 1.0
                 similarity = 1.0 - (distance / max_distance) if max_distance > 0 else 1.0
                 
                 product = {
                     "product_id": metadata.get("product_id"),
                     "name": metadata.get("name"),
-                    "description": results['documents'][0][i] if results.get('documents') else "",
+                    "description": documents[i] if documents is not None else "",
                     "price": float(metadata.get("price", 0)),  # Get price from metadata
                     "category": metadata.get("category"),
                     "stock_status": metadata.get("stock_status"),
@@ -501,15 +532,9 @@ class RAGAgent:
             Price as float or None if not found
         """
         try:
-            results = self.collection.get(
-                where={"name": product_name},
-                limit=1
-            )
-            
-            if results and results['metadatas'] and len(results['metadatas']) > 0:
-                price = results['metadatas'][0].get('price')
-                if price is not None:
-                    return float(price)
+            price = self._get_price_map().get(product_name)
+            if price is not None:
+                return price
             
             logger.warning(f"Price not found in metadata for product: {product_name}")
             return None
@@ -518,6 +543,38 @@ class RAGAgent:
             logger.error(f"Error getting price from metadata: {str(e)}", exc_info=True)
             return None
     
+    def _get_price_map(self) -> Dict[str, float]:
+        """
+        Get a name -> price map for all products in the vector store.
+        
+        Loaded with one bulk metadata read and kept in the product cache, so
+        price lookups are dict hits instead of a filtered query per name.
+        
+        Returns:
+            Dictionary mapping product name to price
+        """
+        cache_key = ("price_map", self.vector_store_path)
+        price_map = self.product_cache.get(cache_key)
+        if price_map is not None:
+            return price_map
+        
+        results = self.collection.get(include=["metadatas"])
+        price_map = {}
+        for metadata in results.get('metadatas') or []:
+            name = metadata.get('name')
+            price = metadata.get('price')
+            # Keep the first entry per name, as the filtered lookup did
+            if name is None or price is None or name in price_map:
+                continue
+            try:
+                price_map[name] = float(price)
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid price in metadata for product: {name}")
+        
+        self.product_cache.set(cache_key, price_map)
+        logger.debug(f"Loaded {len(price_map)} product prices from vector store")
+        return price_map
+    
     def answer_query(
         self,
         user_query: str,
@@ -556,53 +613,102 @@ class RAGAgent:
             if products:
                 self.last_product = products[0]['name']
             
-            # Build system prompt
-            system_prompt = """You are a helpful product information assistant for an e-commerce store.
-Your role is to answer customer questions about products using the information provided.
-Always use the exact prices from the product information (never make up prices).
-Be conversational, friendly, and helpful.
-If asked about a product, provide the price, description, and stock status.
-If multiple products match, list them all."""
+            # System prompt, then recent chat history for context, then the question
+            messages = [ANSWER_SYSTEM_MESSAGE]
+            if chat_history:
+                messages.extend(
+                    {"role": msg["role"], "content": msg["content"]}
+                    for msg in chat_history[-3:]  # Last 3 exchanges
+                    if msg.get("role") in ("user", "assistant")
+                )
+            messages.append({"role": "user", "content": f"Product Information:\n{context}\n\nUser Question: {user_query}"})
             
-            # Build messages
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Product Information:\n{context}\n\nUser Question: {user_query}"}
-            ]
+            # Identical prompts (same products, history tail and question) reuse
+            # the previous answer instead of calling the LLM again
+            cache_key = self._answer_cache_key(messages)
+            cached_answer = self._answer_cache.get(cache_key)
+            if cached_answer is not None:
+                logger.debug("Answer cache hit")
+                return cached_answer
             
-            # Add recent chat history for context
-            if chat_history:
-                recent_history = chat_history[-3:]  # Last 3 exchanges
-                for msg in recent_history:
-                    if msg.get("role") in ["user", "assistant"]:
-                        messages.insert(-1, {"role": msg["role"], "content": msg["content"]})
+            # Concurrent identical prompts wait on the first caller's request
+            with self._answer_inflight_lock:
+                pending = self._answer_inflight.get(cache_key)
+                is_owner = pending is None
+                if is_owner:
+                    pending = Future()
+                    self._answer_inflight[cache_key] = pending
             
-            # Call OpenAI API with retry logic
-            retry_count = 0
-            while retry_count < max_retries:
+            if not is_owner:
+                answer = pending.result()
+            else:
                 try:
-                    # Use model from environment or default
-                    model = os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini")
-                    response = self.client.chat.completions.create(
-                        model=model,
-                        messages=messages,
-                        temperature=0.7,
-                        max_tokens=500
-                    )
-                    answer = response.choices[0].message.content
-                    return answer
+                    answer = self._generate_answer(messages, max_retries)
+                    if answer is not None:
+                        self._answer_cache.set(cache_key, answer)
+                    pending.set_result(answer)
                 except Exception as e:
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        import time
-                        wait_time = 2 ** retry_count
-                        logger.warning(f"API call failed, retrying in {wait_time}s... ({retry_count}/{max_retries})")
-                        time.sleep(wait_time)
-                    else:
-                        logger.error(f"Failed to get response after {max_retries} attempts: {str(e)}", exc_info=True)
-                        return "I'm sorry, I'm having trouble processing your request right now. Please try again in a moment."
+                    pending.set_exception(e)
+                    raise
+                finally:
+                    with self._answer_inflight_lock:
+                        self._answer_inflight.pop(cache_key, None)
+            
+            if answer is None:
+                return "I'm sorry, I'm having trouble processing your request right now. Please try again in a moment."
+            return answer
             
         except Exception as e:
             logger.error(f"Error answering query: {str(e)}", exc_info=True)
             return "I encountered an error while processing your query. Please try again."
-
+    
+    @staticmethod
+    def _answer_cache_key(messages: List[Dict]) -> bytes:
+        """
+        Build a compact cache key for a chat prompt.
+        
+        Args:
+            messages: Messages sent to the LLM
+        
+        Returns:
+            16-byte BLAKE2b digest of the prompt
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for msg in messages:
+            digest.update(msg["role"].encode())
+            digest.update(b"\x00")
+            digest.update(msg["content"].encode())
+            digest.update(b"\x00")
+        return digest.digest()
+    
+    def _generate_answer(self, messages: List[Dict], max_retries: int = 3) -> Optional[str]:
+        """
+        Call the chat model with retry logic.
+        
+        Args:
+            messages: Messages to send
+            max_retries: Maximum retry attempts for API calls
+        
+        Returns:
+            Model answer, or None if every attempt failed
+        """
+        retry_count = 0
+        while retry_count < max_retries:
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500
+                )
+                return response.choices[0].message.content
+            except Exception as e:
+                retry_count += 1
+                if retry_count < max_retries and is_retryable_error(e):
+                    wait_time = backoff_delay(retry_count)
+                    logger.warning(f"API call failed, retrying in {wait_time:.2f}s... ({retry_count}/{max_retries})")
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"Failed to get response after {retry_count} attempts: {str(e)}", exc_info=True)
+                    break
+        return None
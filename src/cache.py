@@ -1,22 +1,85 @@
 """Simple in-memory cache with TTL (Time-To-Live) for performance optimization."""
 
+import heapq
+import itertools
+import os
 import time
-from typing import Any, Optional, Dict, Tuple
-from threading import Lock
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Dict, List, Sequence, Set, Tuple
+from threading import Event, Lock, Thread
+
+import numpy as np
+
 from src.logger import get_logger
 
 logger = get_logger()
 
 
+# Most independently locked stripes per cache (power of two)
+NUM_SHARDS = 16
+# Fewest entries per stripe; smaller caches use fewer stripes, down to a
+# single one, so their LRU order and size limit stay exact
+MIN_SHARD_SIZE = 64
+
+# Seconds between background sweeps of expired entries
+REAP_INTERVAL = 30
+
+
+class _Entry:
+    """A cached value and its expiration time in whole epoch seconds."""
+    
+    __slots__ = ('value', 'expiration')
+    
+    def __init__(self, value: Any, expiration: int):
+        self.value = value
+        self.expiration = expiration
+
+
+class _CacheShard:
+    """One lock-protected stripe of a TTLCache."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # key -> entry, ordered from least to most recently used
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (expiration_time, sequence, key) min-heap; entries for keys that were
+        # overwritten, evicted or invalidated are skipped when popped
+        self.expiry_heap: List[Tuple[int, int, Hashable]] = []
+        self.sequence = itertools.count()
+    
+    def schedule_expiry(self, key: Hashable, expiration: int) -> None:
+        """Record a key's expiration time (caller holds the lock)."""
+        heapq.heappush(self.expiry_heap, (expiration, next(self.sequence), key))
+        # Rebuild from live entries when stale records dominate the heap
+        if len(self.expiry_heap) > 4 * max(len(self.entries), self.max_size):
+            self.expiry_heap = [
+                (entry.expiration, next(self.sequence), key)
+                for key, entry in self.entries.items()
+            ]
+            heapq.heapify(self.expiry_heap)
+
+
 class TTLCache:
     """
     Thread-safe cache with Time-To-Live (TTL) expiration.
     
     Features:
     - Automatic expiration of cached items
-    - Thread-safe operations
+    - Thread-safe operations, striped across up to NUM_SHARDS locks so
+      lookups of unrelated keys don't contend
     - Configurable TTL per cache
-    - Size limits to prevent memory issues
+    - Size limits with least-recently-used (LRU) eviction. A cache smaller
+      than 2 * MIN_SHARD_SIZE has one stripe and is an exact LRU; larger
+      caches split max_size evenly across stripes and evict per stripe, an
+      approximate LRU that can evict while other stripes have room
+    - Hit/miss counters for observability
+    - Expired entries swept every REAP_INTERVAL seconds by a shared
+      background thread, not only when they are read
     """
     
     def __init__(self, default_ttl: int = 300, max_size: int = 1000):
@@ -28,36 +91,50 @@ class TTLCache:
             max_size: Maximum number of items in cache (default: 1000)
         """
         self.default_ttl = default_ttl
-        self.max_size = max_size
-        self._cache: Dict[str, Tuple[Any, float]] = {}  # key -> (value, expiration_time)
-        self._lock = Lock()
+        num_shards = NUM_SHARDS
+        while num_shards > 1 and max_size // num_shards < MIN_SHARD_SIZE:
+            num_shards //= 2
+        shard_size = max(1, -(-max_size // num_shards))
+        self._shards = [_CacheShard(shard_size) for _ in range(num_shards)]
+        self._shard_mask = num_shards - 1
+        # Real capacity: max_size rounded up to a whole number of entries per shard
+        self.max_size = shard_size * num_shards
+        _register_for_reaping(self)
     
-    def get(self, key: str) -> Optional[Any]:
+    def _shard(self, key: Hashable) -> _CacheShard:
+        """Get the shard that owns a key."""
+        return self._shards[hash(key) & self._shard_mask]
+    
+    def get(self, key: Hashable) -> Optional[Any]:
         """
         Get value from cache if it exists and hasn't expired.
         
         Args:
-            key: Cache key
+            key: Cache key (any hashable; tuples avoid building strings)
             
         Returns:
             Cached value or None if not found/expired
         """
-        with self._lock:
-            if key not in self._cache:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.misses += 1
                 return None
             
-            value, expiration = self._cache[key]
-            
             # Check if expired
-            if time.time() > expiration:
-                del self._cache[key]
-                logger.debug(f"Cache expired for key: {key}")
+            if time.time() > entry.expiration:
+                del shard.entries[key]
+                shard.misses += 1
+                logger.debug("Cache expired for key: %s", key)
                 return None
             
-            logger.debug(f"Cache hit for key: {key}")
-            return value
+            shard.entries.move_to_end(key)
+            shard.hits += 1
+            logger.debug("Cache hit for key: %s", key)
+            return entry.value
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
         """
         Set value in cache with TTL.
         
@@ -66,34 +143,76 @@ class TTLCache:
             value: Value to cache
             ttl: Time-to-live in seconds (uses default if None)
         """
-        with self._lock:
-            # Evict oldest if cache is full
-            if len(self._cache) >= self.max_size and key not in self._cache:
-                self._evict_oldest()
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.entries.move_to_end(key)
+            elif len(shard.entries) >= shard.max_size:
+                # Evict least recently used if the shard is full
+                self._evict_oldest(shard)
             
             ttl = ttl or self.default_ttl
-            expiration = time.time() + ttl
-            self._cache[key] = (value, expiration)
-            logger.debug(f"Cached key: {key} (TTL: {ttl}s)")
+            # Second precision is plenty for TTLs and keeps entries small
+            expiration = int(time.time()) + ttl
+            shard.entries[key] = _Entry(value, expiration)
+            shard.schedule_expiry(key, expiration)
+            logger.debug("Cached key: %s (TTL: %ss)", key, ttl)
     
-    def _evict_oldest(self) -> None:
-        """Evict the oldest (first) entry from cache."""
-        if self._cache:
-            oldest_key = next(iter(self._cache))
-            del self._cache[oldest_key]
-            logger.debug(f"Evicted oldest cache entry: {oldest_key}")
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Remove a single key from cache.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            True if the key was cached, False otherwise
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            if shard.entries.pop(key, None) is None:
+                return False
+            logger.debug("Invalidated cache key: %s", key)
+            return True
+    
+    def _evict_oldest(self, shard: _CacheShard) -> None:
+        """Evict the least recently used entry from a shard (caller holds its lock)."""
+        if shard.entries:
+            oldest_key, _ = shard.entries.popitem(last=False)
+            shard.evictions += 1
+            logger.debug("Evicted least recently used cache entry: %s", oldest_key)
     
     def clear(self) -> None:
         """Clear all cached items."""
-        with self._lock:
-            count = len(self._cache)
-            self._cache.clear()
-            logger.info(f"Cleared cache ({count} items)")
+        count = 0
+        for shard in self._shards:
+            with shard.lock:
+                count += len(shard.entries)
+                shard.entries.clear()
+        logger.info(f"Cleared cache ({count} items)")
     
     def size(self) -> int:
-        """Get current cache size."""
-        with self._lock:
-            return len(self._cache)
+        """Get current cache size (approximate while other threads are writing)."""
+        return sum(len(shard.entries) for shard in self._shards)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache usage statistics.
+        
+        Returns:
+            Dictionary with size, max_size, hits, misses, evictions and hit_rate
+        """
+        hits = sum(shard.hits for shard in self._shards)
+        misses = sum(shard.misses for shard in self._shards)
+        lookups = hits + misses
+        return {
+            "size": self.size(),
+            "max_size": self.max_size,
+            "hits": hits,
+            "misses": misses,
+            "evictions": sum(shard.evictions for shard in self._shards),
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
     
     def cleanup_expired(self) -> int:
         """
@@ -102,24 +221,360 @@ class TTLCache:
         Returns:
             Number of entries removed
         """
+        removed = 0
+        now = time.time()
+        for shard in self._shards:
+            with shard.lock:
+                # Only the expired prefix of the heap is visited
+                heap = shard.expiry_heap
+                while heap and heap[0][0] < now:
+                    expiration, _, key = heapq.heappop(heap)
+                    entry = shard.entries.get(key)
+                    if entry is not None and entry.expiration == expiration:
+                        del shard.entries[key]
+                        removed += 1
+        
+        if removed:
+            logger.debug(f"Cleaned up {removed} expired cache entries")
+        return removed
+
+
+class EmbeddingCache(TTLCache):
+    """
+    TTLCache for embedding vectors, stored as float16.
+    
+    Half-precision halves the memory per cached vector (a 1536-d embedding
+    drops from ~12KB as a Python float list to 3KB); the rounding error is
+    far below what changes nearest-neighbour rankings.
+    """
+    
+    def set(self, key: Hashable, value: Sequence[float], ttl: Optional[int] = None) -> None:
+        """
+        Cache an embedding vector.
+        
+        Args:
+            key: Cache key
+            value: Embedding vector
+            ttl: Time-to-live in seconds (uses default if None)
+        """
+        super().set(key, np.asarray(value, dtype=np.float16), ttl)
+    
+    def get(self, key: Hashable) -> Optional[List[float]]:
+        """
+        Get a cached embedding vector.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Embedding as a list of floats, or None if not found/expired
+        """
+        vector = super().get(key)
+        if vector is None:
+            return None
+        return vector.astype(np.float32).tolist()
+    
+    def save(self, path: str, model: str) -> int:
+        """
+        Write the unexpired string-keyed embeddings to a compressed .npz file.
+        
+        Args:
+            path: Destination file path
+            model: Embedding model the vectors came from (checked on load)
+        
+        Returns:
+            Number of embeddings written
+        """
+        keys, vectors, expirations = [], [], []
+        for shard in self._shards:
+            with shard.lock:
+                for key, entry in shard.entries.items():
+                    if isinstance(key, str):
+                        keys.append(key)
+                        vectors.append(entry.value)
+                        expirations.append(entry.expiration)
+        
+        now = int(time.time())
+        live = [i for i, expiration in enumerate(expirations) if expiration > now]
+        if not live or len({vectors[i].shape for i in live}) != 1:
+            return 0
+        
+        # Write beside the target and rename, so a crash never leaves a torn file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                model=np.array(model),
+                keys=np.array([keys[i] for i in live]),
+                vectors=np.stack([vectors[i] for i in live]),
+                expirations=np.array([expirations[i] for i in live], dtype=np.int64)
+            )
+        os.replace(tmp_path, path)
+        return len(live)
+    
+    def load(self, path: str, model: str) -> int:
+        """
+        Restore embeddings saved by save(), keeping their original expiration.
+        
+        Args:
+            path: File written by save()
+            model: Current embedding model; files from another model are ignored
+        
+        Returns:
+            Number of embeddings restored
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["model"]) != model:
+                return 0
+            keys, vectors, expirations = data["keys"], data["vectors"], data["expirations"]
+        
+        now = int(time.time())
+        restored = 0
+        for key, vector, expiration in zip(keys.tolist(), vectors, expirations.tolist()):
+            if expiration > now:
+                super().set(key, vector, ttl=expiration - now)
+                restored += 1
+        return restored
+
+
+def _quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Quantize a vector to int8 with a symmetric per-vector scale.
+    
+    Args:
+        vector: Float vector
+    
+    Returns:
+        Tuple of (int8 vector, scale); vector is approximately int8 vector * scale
+    """
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    if peak == 0.0:
+        return np.zeros(vector.shape, dtype=np.int8), 0.0
+    scale = peak / 127.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+
+class SemanticCache:
+    """
+    TTL cache keyed by query embedding, so paraphrased queries share results.
+    
+    Embeddings are hashed with random-hyperplane LSH into several bands; a
+    lookup only computes cosine similarity against entries that share a band
+    bucket with the query, and returns the closest one at or above the
+    similarity threshold. Entries are grouped by a scope string so results
+    are only reused for identical search parameters (k, sort order, filters).
+    
+    Stored embeddings are int8 with a per-vector scale (a quarter of float32),
+    compared against the unquantized float32 query; the similarity error is
+    under 1e-3, far below the gap between a hit and a near miss.
+    """
+    
+    def __init__(
+        self,
+        default_ttl: int = 600,
+        max_size: int = 500,
+        threshold: float = 0.95,
+        num_bands: int = 4,
+        bits_per_band: int = 12,
+        seed: int = 0
+    ):
+        """
+        Initialize semantic cache.
+        
+        Args:
+            default_ttl: Default time-to-live in seconds
+            max_size: Maximum number of items in cache
+            threshold: Minimum cosine similarity for a hit
+            num_bands: Number of LSH bands (more bands = higher recall)
+            bits_per_band: Hyperplanes per band (more bits = smaller buckets)
+            seed: Seed for the random hyperplanes
+        """
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.threshold = threshold
+        self.num_bands = num_bands
+        self.bits_per_band = bits_per_band
+        self.seed = seed
+        # Hyperplanes are created on first use, once the embedding size is known
+        self._planes: Optional[np.ndarray] = None
+        # entry id -> (scope, (int8 unit embedding, scale), value, expiration, bucket keys), LRU ordered
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[np.ndarray, float], Any, float, List[Tuple]]]" = OrderedDict()
+        self._buckets: Dict[Tuple, Set[int]] = {}
+        self._next_id = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    def _prepare(self, embedding: Sequence[float]) -> np.ndarray:
+        """Normalize an embedding, (re)building hyperplanes for its dimension (caller holds the lock)."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self._planes is None or self._planes.shape[0] != vector.shape[0]:
+            if self._entries:
+                logger.info("Embedding size changed, clearing semantic cache")
+                self._entries.clear()
+                self._buckets.clear()
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal(
+                (vector.shape[0], self.num_bands * self.bits_per_band)
+            ).astype(np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+    
+    def _bucket_keys(self, scope: str, unit: np.ndarray) -> List[Tuple]:
+        """LSH bucket keys for an embedding, one per band."""
+        bits = (unit @ self._planes > 0).reshape(self.num_bands, self.bits_per_band)
+        packed = np.packbits(bits, axis=1)
+        return [(scope, band, packed[band].tobytes()) for band in range(self.num_bands)]
+    
+    def _remove(self, entry_id: int) -> None:
+        """Remove an entry and its bucket memberships (caller holds the lock)."""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for bucket_key in entry[4]:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[bucket_key]
+    
+    def get(self, scope: str, embedding: Sequence[float]) -> Optional[Any]:
+        """
+        Get the cached value for the most similar stored embedding.
+        
+        Args:
+            scope: Scope the entry was stored under
+            embedding: Query embedding
+        
+        Returns:
+            Cached value, or None if no entry is similar enough
+        """
         with self._lock:
+            unit = self._prepare(embedding)
+            candidates: Set[int] = set()
+            for bucket_key in self._bucket_keys(scope, unit):
+                candidates |= self._buckets.get(bucket_key, set())
+            
             now = time.time()
-            expired_keys = [
-                key for key, (_, expiration) in self._cache.items()
-                if now > expiration
-            ]
-            for key in expired_keys:
-                del self._cache[key]
+            best_id, best_score = None, self.threshold
+            for entry_id in candidates:
+                _, (stored, scale), _, expiration, _ = self._entries[entry_id]
+                if now > expiration:
+                    self._remove(entry_id)
+                    continue
+                score = float(unit @ stored) * scale
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
             
-            if expired_keys:
-                logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
-            return len(expired_keys)
+            if best_id is None:
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(best_id)
+            self._hits += 1
+            logger.debug(f"Semantic cache hit (similarity {best_score:.3f})")
+            return self._entries[best_id][2]
+    
+    def set(self, scope: str, embedding: Sequence[float], value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Store a value under a query embedding.
+        
+        Args:
+            scope: Scope to store the entry under
+            embedding: Query embedding
+            value: Value to cache
+            ttl: Time-to-live in seconds (uses default if None)
+        """
+        with self._lock:
+            unit = self._prepare(embedding)
+            bucket_keys = self._bucket_keys(scope, unit)
+            
+            while len(self._entries) >= self.max_size:
+                # Evict least recently used
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+            
+            entry_id = self._next_id
+            self._next_id += 1
+            expiration = time.time() + (ttl or self.default_ttl)
+            self._entries[entry_id] = (scope, _quantize_int8(unit), value, expiration, bucket_keys)
+            for bucket_key in bucket_keys:
+                self._buckets.setdefault(bucket_key, set()).add(entry_id)
+    
+    def clear(self) -> None:
+        """Clear all cached items."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._buckets.clear()
+            logger.info(f"Cleared semantic cache ({count} items)")
+    
+    def size(self) -> int:
+        """Get current cache size."""
+        with self._lock:
+            return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache usage statistics.
+        
+        Returns:
+            Dictionary with size, max_size, hits, misses, evictions and hit_rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+
+# Caches swept by the background reaper (dropped automatically once unused)
+_reaped_caches: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+_reaper_lock = Lock()
+_reaper_thread: Optional[Thread] = None
+_reaper_stopped = Event()
+
+
+def _register_for_reaping(cache: TTLCache) -> None:
+    """Add a cache to the background sweep, starting the reaper thread on first use."""
+    global _reaper_thread
+    with _reaper_lock:
+        _reaped_caches.add(cache)
+        if _reaper_thread is None:
+            _reaper_thread = Thread(target=_reap_expired, name="cache-reaper", daemon=True)
+            _reaper_thread.start()
+
+
+def _reap_expired() -> None:
+    """Sweep expired entries from all registered caches every REAP_INTERVAL seconds."""
+    while not _reaper_stopped.wait(REAP_INTERVAL):
+        with _reaper_lock:
+            caches = list(_reaped_caches)
+        for cache in caches:
+            try:
+                cache.cleanup_expired()
+            except Exception as e:
+                logger.error(f"Error sweeping expired cache entries: {str(e)}", exc_info=True)
+
+
+def stop_reaper() -> None:
+    """Stop the background sweep (e.g. in tests)."""
+    _reaper_stopped.set()
 
 
 # Global cache instances for different use cases
 _search_cache = TTLCache(default_ttl=600, max_size=500)  # 10 minutes for searches
 _stock_cache = TTLCache(default_ttl=300, max_size=100)   # 5 minutes for stock info
 _product_cache = TTLCache(default_ttl=1800, max_size=200)  # 30 minutes for product data
+_tool_plan_cache = TTLCache(default_ttl=600, max_size=1000)  # 10 minutes for model tool choices
+_semantic_cache: Optional[SemanticCache] = None  # Created on first use when enabled
+_semantic_cache_lock = Lock()
 
 
 def get_search_cache() -> TTLCache:
@@ -137,10 +592,38 @@ def get_product_cache() -> TTLCache:
     return _product_cache
 
 
+def get_tool_plan_cache() -> TTLCache:
+    """Get the cache of tool calls chosen by the model per message."""
+    return _tool_plan_cache
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Get the semantic search cache.
+    
+    Disabled unless SEMANTIC_CACHE_ENABLED is set to true, since similar
+    but not identical queries may then share results.
+    
+    Returns:
+        SemanticCache, or None when disabled
+    """
+    global _semantic_cache
+    if _semantic_cache is None and os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"):
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+                _semantic_cache = SemanticCache(default_ttl=600, max_size=500, threshold=threshold)
+                logger.info(f"Semantic search cache enabled (threshold {threshold})")
+    return _semantic_cache
+
+
 def clear_all_caches() -> None:
     """Clear all caches."""
     _search_cache.clear()
     _stock_cache.clear()
     _product_cache.clear()
+    _tool_plan_cache.clear()
+    if _semantic_cache is not None:
+        _semantic_cache.clear()
     logger.info("All caches cleared")
 
@@ -1,8 +1,12 @@
 """Shopping cart model for multi-product orders."""
 
-from typing import Dict, List, Optional
+from typing import ClassVar, Dict, List, Optional, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime
+from threading import Lock
+import io
+import time
 import uuid
 
 from src.logger import get_logger
@@ -10,7 +14,7 @@ from src.logger import get_logger
 logger = get_logger()
 
 
-@dataclass
+@dataclass(slots=True)
 class CartItem:
     """Single item in the shopping cart."""
     product_id: str
@@ -18,7 +22,13 @@ class CartItem:
     unit_price: float
     quantity: int
     category: Optional[str] = None
-    added_at: datetime = field(default_factory=datetime.now)
+    # Epoch seconds; formatted as ISO 8601 only in to_dict
+    added_at: float = field(default_factory=time.time)
+    # Lowercased product name, the cart's lookup key for this item
+    _name_lower: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._name_lower = self.product_name.lower()
     
     @property
     def subtotal(self) -> float:
@@ -33,12 +43,12 @@ class CartItem:
             "unit_price": self.unit_price,
             "quantity": self.quantity,
             "category": self.category,
-            "subtotal": self.subtotal,
-            "added_at": self.added_at.isoformat()
+            "subtotal": self.unit_price * self.quantity,
+            "added_at": datetime.fromtimestamp(self.added_at).isoformat()
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ShoppingCart:
     """
     Shopping cart supporting multiple products.
@@ -56,16 +66,25 @@ class ShoppingCart:
     customer_email: Optional[str] = None
     coupon_code: Optional[str] = None
     discount_percent: float = 0.0
-    created_at: datetime = field(default_factory=datetime.now)
-    updated_at: datetime = field(default_factory=datetime.now)
+    # Epoch seconds; formatted as ISO 8601 only in to_dict
+    created_at: float = field(default_factory=time.time)
+    # Stamped by touch() when a changed cart is next read out, not on every mutation
+    updated_at: float = field(default_factory=time.time)
+    _dirty: bool = field(default=False, init=False, repr=False, compare=False)
+    # Item totals, computed on first use and reset whenever items change
+    _subtotal_cache: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+    _item_count_cache: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    # Items indexed by product ID and by lowercased name
+    _by_id: Dict[str, CartItem] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _by_name_lower: Dict[str, CartItem] = field(default_factory=dict, init=False, repr=False, compare=False)
     
     # Tax and shipping rates
-    TAX_RATE = 0.08  # 8% tax
-    FREE_SHIPPING_THRESHOLD = 100.0
-    SHIPPING_COST = 9.99
+    TAX_RATE: ClassVar[float] = 0.08  # 8% tax
+    FREE_SHIPPING_THRESHOLD: ClassVar[float] = 100.0
+    SHIPPING_COST: ClassVar[float] = 9.99
     
     # Available coupon codes
-    COUPON_CODES = {
+    COUPON_CODES: ClassVar[Dict[str, float]] = {
         "SAVE10": 10.0,
         "SAVE20": 20.0,
         "WELCOME": 15.0,
@@ -89,12 +108,14 @@ class ShoppingCart:
             True if successful
         """
         # Check if product already in cart
-        for item in self.items:
-            if item.product_id == product_id or item.product_name.lower() == product_name.lower():
-                item.quantity += quantity
-                self.updated_at = datetime.now()
-                logger.info(f"Updated cart: {product_name} x{item.quantity}")
-                return True
+        name_lower = product_name.lower()
+        item = self._by_id.get(product_id) or self._by_name_lower.get(name_lower)
+        if item is not None:
+            item.quantity += quantity
+            self._invalidate_totals()
+            self._dirty = True
+            logger.info(f"Updated cart: {product_name} x{item.quantity}")
+            return True
         
         # Add new item
         item = CartItem(
@@ -105,39 +126,48 @@ class ShoppingCart:
             category=category
         )
         self.items.append(item)
-        self.updated_at = datetime.now()
+        self._by_id[product_id] = item
+        self._by_name_lower[item._name_lower] = item
+        self._invalidate_totals()
+        self._dirty = True
         logger.info(f"Added to cart: {product_name} x{quantity} @ ${unit_price}")
         return True
     
     def remove_item(self, product_name: str) -> bool:
         """Remove an item from the cart."""
-        for i, item in enumerate(self.items):
-            if item.product_name.lower() == product_name.lower():
-                removed = self.items.pop(i)
-                self.updated_at = datetime.now()
-                logger.info(f"Removed from cart: {removed.product_name}")
-                return True
-        return False
+        removed = self._by_name_lower.pop(product_name.lower(), None)
+        if removed is None:
+            return False
+        self._by_id.pop(removed.product_id, None)
+        self.items.remove(removed)
+        self._invalidate_totals()
+        self._dirty = True
+        logger.info(f"Removed from cart: {removed.product_name}")
+        return True
     
     def update_quantity(self, product_name: str, quantity: int) -> bool:
         """Update quantity of an item."""
         if quantity <= 0:
             return self.remove_item(product_name)
         
-        for item in self.items:
-            if item.product_name.lower() == product_name.lower():
-                item.quantity = quantity
-                self.updated_at = datetime.now()
-                logger.info(f"Updated quantity: {product_name} x{quantity}")
-                return True
-        return False
+        item = self._by_name_lower.get(product_name.lower())
+        if item is None:
+            return False
+        item.quantity = quantity
+        self._invalidate_totals()
+        self._dirty = True
+        logger.info(f"Updated quantity: {product_name} x{quantity}")
+        return True
     
     def clear(self):
         """Clear all items from cart."""
         self.items = []
+        self._by_id.clear()
+        self._by_name_lower.clear()
+        self._invalidate_totals()
         self.coupon_code = None
         self.discount_percent = 0.0
-        self.updated_at = datetime.now()
+        self._dirty = True
         logger.info("Cart cleared")
     
     def apply_coupon(self, code: str) -> tuple[bool, str]:
@@ -151,46 +181,83 @@ class ShoppingCart:
         if code_upper in self.COUPON_CODES:
             self.coupon_code = code_upper
             self.discount_percent = self.COUPON_CODES[code_upper]
-            self.updated_at = datetime.now()
+            self._dirty = True
             return True, f"Coupon applied! {self.discount_percent}% discount"
         return False, f"Invalid coupon code. Valid codes: {', '.join(self.COUPON_CODES.keys())}"
     
+    def touch(self):
+        """Set updated_at to now if the cart changed since it was last stamped."""
+        if self._dirty:
+            self.updated_at = time.time()
+            self._dirty = False
+    
+    def _invalidate_totals(self):
+        """Forget cached item totals after the items change."""
+        self._subtotal_cache = None
+        self._item_count_cache = None
+    
+    def _compute_totals(self):
+        """Compute subtotal and item count in one pass over the items."""
+        subtotal = 0.0
+        count = 0
+        for item in self.items:
+            subtotal += item.unit_price * item.quantity
+            count += item.quantity
+        self._subtotal_cache = subtotal
+        self._item_count_cache = count
+    
     @property
     def subtotal(self) -> float:
         """Calculate subtotal before discounts."""
-        return sum(item.subtotal for item in self.items)
+        if self._subtotal_cache is None:
+            self._compute_totals()
+        return self._subtotal_cache
+    
+    def _totals(self) -> Tuple[float, float, float, float, float, float]:
+        """
+        Compute every cart amount from the cached subtotal in one place.
+        
+        Returns:
+            (subtotal, discount, subtotal after discount, tax, shipping, total)
+        """
+        subtotal = self.subtotal
+        discount = subtotal * (self.discount_percent / 100)
+        after_discount = subtotal - discount
+        tax = after_discount * self.TAX_RATE
+        shipping = 0.0 if after_discount >= self.FREE_SHIPPING_THRESHOLD else self.SHIPPING_COST
+        return subtotal, discount, after_discount, tax, shipping, after_discount + tax + shipping
     
     @property
     def discount_amount(self) -> float:
         """Calculate discount amount."""
-        return self.subtotal * (self.discount_percent / 100)
+        return self._totals()[1]
     
     @property
     def subtotal_after_discount(self) -> float:
         """Subtotal after applying discount."""
-        return self.subtotal - self.discount_amount
+        return self._totals()[2]
     
     @property
     def tax_amount(self) -> float:
         """Calculate tax amount."""
-        return self.subtotal_after_discount * self.TAX_RATE
+        return self._totals()[3]
     
     @property
     def shipping_cost(self) -> float:
         """Calculate shipping cost."""
-        if self.subtotal_after_discount >= self.FREE_SHIPPING_THRESHOLD:
-            return 0.0
-        return self.SHIPPING_COST
+        return self._totals()[4]
     
     @property
     def total(self) -> float:
         """Calculate total including tax and shipping."""
-        return self.subtotal_after_discount + self.tax_amount + self.shipping_cost
+        return self._totals()[5]
     
     @property
     def item_count(self) -> int:
         """Total number of items."""
-        return sum(item.quantity for item in self.items)
+        if self._item_count_cache is None:
+            self._compute_totals()
+        return self._item_count_cache
     
     @property
     def is_empty(self) -> bool:
@@ -199,33 +266,37 @@ class ShoppingCart:
     
     def get_summary(self) -> str:
         """Get a formatted cart summary."""
+        self.touch()
         if self.is_empty:
             return "Your cart is empty."
         
-        lines = ["** Shopping Cart **", ""]
+        subtotal, discount, _, tax, shipping, total = self._totals()
+        buf = io.StringIO()
+        buf.write("** Shopping Cart **\n\n")
         
         for item in self.items:
-            lines.append(f"- {item.product_name} x{item.quantity} @ ${item.unit_price:.2f} = ${item.subtotal:.2f}")
+            buf.write(f"- {item.product_name} x{item.quantity} @ ${item.unit_price:.2f} = ${item.unit_price * item.quantity:.2f}\n")
         
-        lines.append("")
-        lines.append(f"Subtotal: ${self.subtotal:.2f}")
+        buf.write(f"\nSubtotal: ${subtotal:.2f}\n")
         
         if self.discount_percent > 0:
-            lines.append(f"Discount ({self.coupon_code} - {self.discount_percent}%): -${self.discount_amount:.2f}")
+            buf.write(f"Discount ({self.coupon_code} - {self.discount_percent}%): -${discount:.2f}\n")
         
-        lines.append(f"Tax (8%): ${self.tax_amount:.2f}")
+        buf.write(f"Tax (8%): ${tax:.2f}\n")
         
-        if self.shipping_cost > 0:
-            lines.append(f"Shipping: ${self.shipping_cost:.2f}")
+        if shipping > 0:
+            buf.write(f"Shipping: ${shipping:.2f}\n")
         else:
-            lines.append("Shipping: FREE")
+            buf.write("Shipping: FREE\n")
         
-        lines.append(f"**Total: ${self.total:.2f}**")
+        buf.write(f"**Total: ${total:.2f}**")
         
-        return "\n".join(lines)
+        return buf.getvalue()
     
     def to_dict(self) -> Dict:
         """Convert cart to dictionary."""
+        self.touch()
+        subtotal, discount_amount, _, tax_amount, shipping_cost, total = self._totals()
         return {
             "session_id": self.session_id,
             "items": [item.to_dict() for item in self.items],
@@ -233,37 +304,54 @@ class ShoppingCart:
             "customer_email": self.customer_email,
             "coupon_code": self.coupon_code,
             "discount_percent": self.discount_percent,
-            "subtotal": self.subtotal,
-            "discount_amount": self.discount_amount,
-            "tax_amount": self.tax_amount,
-            "shipping_cost": self.shipping_cost,
-            "total": self.total,
+            "subtotal": subtotal,
+            "discount_amount": discount_amount,
+            "tax_amount": tax_amount,
+            "shipping_cost": shipping_cost,
+            "total": total,
             "item_count": self.item_count,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat()
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "updated_at": datetime.fromtimestamp(self.updated_at).isoformat()
         }
 
 
 class CartManager:
-    """Manage shopping carts for multiple sessions."""
+    """
+    Manage shopping carts for multiple sessions.
+    
+    Thread-safe; keeps at most _MAX_CARTS carts, evicting the least
+    recently used session's cart when full.
+    """
     
-    _carts: Dict[str, ShoppingCart] = {}
+    _MAX_CARTS = 10_000
+    _carts: "OrderedDict[str, ShoppingCart]" = OrderedDict()
+    _lock = Lock()
     
     @classmethod
     def get_cart(cls, session_id: str) -> ShoppingCart:
         """Get or create a cart for a session."""
-        if session_id not in cls._carts:
-            cls._carts[session_id] = ShoppingCart(session_id=session_id)
-        return cls._carts[session_id]
+        with cls._lock:
+            cart = cls._carts.get(session_id)
+            if cart is None:
+                cart = ShoppingCart(session_id=session_id)
+                cls._carts[session_id] = cart
+                if len(cls._carts) > cls._MAX_CARTS:
+                    evicted_id, _ = cls._carts.popitem(last=False)
+                    logger.debug(f"Evicted least recently used cart: {evicted_id}")
+            else:
+                cls._carts.move_to_end(session_id)
+            return cart
     
     @classmethod
     def clear_cart(cls, session_id: str):
         """Clear a session's cart."""
-        if session_id in cls._carts:
-            cls._carts[session_id].clear()
+        with cls._lock:
+            cart = cls._carts.get(session_id)
+        if cart is not None:
+            cart.clear()
     
     @classmethod
     def remove_cart(cls, session_id: str):
         """Remove a cart completely."""
-        if session_id in cls._carts:
-            del cls._carts[session_id]
+        with cls._lock:
+            cls._carts.pop(session_id, None)
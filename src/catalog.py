@@ -0,0 +1,58 @@
+"""Cached access to the product catalog file (data/products.json)."""
+
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from src.logger import get_logger
+from src.utils import json_loads
+
+logger = get_logger()
+
+PRODUCTS_PATH = "./data/products.json"
+
+
+@lru_cache(maxsize=4)
+def _read_catalog(products_path: str, mtime: float) -> Tuple[List[Dict], List[str]]:
+    """Parse one version (mtime) of the products file, with lowercased names."""
+    with open(products_path, 'rb') as f:
+        products = json_loads(f.read())
+    names_lower = [product.get('name', '').lower() for product in products]
+    logger.debug(f"Loaded {len(products)} products from {products_path}")
+    return products, names_lower
+
+
+def load_catalog(products_path: str = PRODUCTS_PATH) -> Optional[Tuple[List[Dict], List[str]]]:
+    """
+    Load products and their lowercased names, re-reading the file only when it changes.
+
+    The returned lists are shared between callers and must not be modified.
+
+    Args:
+        products_path: Path to products JSON file
+
+    Returns:
+        Tuple of (products, lowercased names in the same order), or None if
+        the file does not exist
+    """
+    try:
+        mtime = os.stat(products_path).st_mtime
+    except FileNotFoundError:
+        return None
+    return _read_catalog(products_path, mtime)
+
+
+def load_products(products_path: str = PRODUCTS_PATH) -> Optional[List[Dict]]:
+    """
+    Load products from the catalog file, re-reading it only when it changes.
+
+    The returned list is shared between callers and must not be modified.
+
+    Args:
+        products_path: Path to products JSON file
+
+    Returns:
+        List of product dictionaries, or None if the file does not exist
+    """
+    catalog = load_catalog(products_path)
+    return catalog[0] if catalog is not None else None
@@ -1,27 +1,399 @@
 """Main chatbot application with function calling and session management."""
 
+import asyncio
 import os
-import uuid
+import queue
+import re
+import secrets
+import sys
+import threading
 import time
-import json
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
-
-from src.agents.order_agent import OrderAgent
-from src.agents.rag_agent import RAGAgent
-from src.database import init_database
+from src.debug_log import AGENT_DEBUG, agent_log
 from src.logger import get_logger, setup_logger
-from src.tracing import get_tracer, traced
 from src.cart import ShoppingCart, CartManager
-from src.cache import get_stock_cache, get_product_cache
+from src.catalog import load_catalog, load_products
+from src.cache import get_product_cache, get_semantic_cache, get_stock_cache, get_tool_plan_cache
+from src.utils import backoff_delay, is_retryable_error, json_dumps, json_loads, json_preview
+
+# The OpenAI SDK, agents, database and tracer are imported when a chatbot is
+# created, so importing this module (e.g. for --help) stays cheap
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessage
 
 logger = get_logger()
 
+# Most chat messages kept per session; only the latest few are sent as context
+MAX_CHAT_HISTORY = 20
+# Most recently browsed products remembered per session
+MAX_BROWSED_PRODUCTS = 30
+
+# Phrases that continue the active search intent ("show me more", ...)
+CONTINUATION_PHRASES = ["show me more", "more products", "more", "continue", "keep going", "next page"]
+# Phrases that start a new search and expire the active intent
+NEW_SEARCH_INDICATORS = ["show me", "find", "search for", "looking for", "what is the price", "how much"]
+
+# Each phrase list is compiled into one case-insensitive alternation so a
+# message is scanned once instead of once per phrase (substring semantics kept)
+_CONTINUATION_RE = re.compile("|".join(map(re.escape, CONTINUATION_PHRASES)), re.IGNORECASE)
+_NEW_SEARCH_RE = re.compile("|".join(map(re.escape, NEW_SEARCH_INDICATORS)), re.IGNORECASE)
+
+# Phrases asking for the full stock list instead of the first few products
+SHOW_ALL_STOCK_PHRASES = [
+    "show me all stock", "show all stock", "all stock", "show me the stock",
+    "stock information", "inventory", "all products", "list all products"
+]
+_SHOW_ALL_STOCK_RE = re.compile("|".join(map(re.escape, SHOW_ALL_STOCK_PHRASES)), re.IGNORECASE)
+
+# "add [N] [x] <product> to [my] cart" - handled locally without an LLM call
+_ADD_TO_CART_RE = re.compile(
+    r"^(?:please\s+)?add\s+(?:(\d{1,3})\s*(?:x\s+)?)?(?:an?\s+|the\s+)?(.+?)\s+to\s+(?:my\s+)?cart\s*[.!]?$",
+    re.IGNORECASE
+)
+# Whole-message commands answered without the LLM: argument-free tools and small talk
+_LOCAL_COMMAND_RE = re.compile(
+    r"^(?:please\s+)?(?:"
+    r"(?P<cart>(?:(?:show|view|see|check)\s+)?(?:me\s+)?(?:my\s+|the\s+)?cart)"
+    r"|(?P<categories>(?:(?:list|show)\s+)?(?:me\s+)?(?:all\s+)?(?:the\s+)?(?:product\s+)?categories)"
+    r"|(?P<greeting>hi|hello|hey)(?:\s+there)?"
+    r"|(?P<thanks>thanks|thank\s+you|thx)(?:\s+you)?"
+    r"|(?P<goodbye>bye|goodbye)"
+    r")\s*[.!?]*$",
+    re.IGNORECASE
+)
+_LOCAL_REPLIES = {
+    "greeting": "Hi! I can help you find products, compare prices, manage your cart, and place orders. What are you looking for today?",
+    "thanks": "You're welcome! Let me know if there's anything else I can help you find.",
+    "goodbye": "Goodbye! Thanks for shopping with us.",
+}
+# Characters stripped from user input (deleted in one str.translate pass)
+_SANITIZE_TABLE = str.maketrans('', '', '<>"\';\\')
+
+# References that need conversation context to resolve
+_CONTEXTUAL_REFERENCES = {"it", "this", "that", "one", "them", "these", "those", "this one", "that one"}
+_WORD_RE = re.compile(r"\w+")
+# Price filters echoed back in the "no products found" reply
+_UNDER_PRICE_RE = re.compile(r'under\s*\$?\s*(\d+(?:\.\d+)?)')
+_BELOW_PRICE_RE = re.compile(r'below\s*\$?\s*(\d+(?:\.\d+)?)')
+
+# Read-only functions whose calls can be replayed for a repeated message
+# instead of asking the model again (results are recomputed on replay)
+REPLAYABLE_FUNCTIONS = {"search_products", "get_recommendations", "get_stock_info", "list_categories"}
+
+
+SYSTEM_PROMPT = """You are a helpful e-commerce chatbot assistant.
+You help customers find products and place orders.
+Use the search_products function to find product information.
+Use the create_order function ONLY when the user explicitly wants to place an order.
+Be conversational, friendly, and helpful.
+Always use exact prices from search results."""
+
+# Shared by every handle_message prompt; never modified
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Langfuse user ID for traces (the chatbot has no user accounts)
+TRACE_USER_ID = "demo_user"
+
+# Function tools offered to the model on every turn (shared, never modified)
+FUNCTION_TOOLS: List[Dict] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_products",
+            "description": "Search for products by name, category, or description. Use this when the user asks about product information, prices, or availability. Supports filters like 'laptops under $1000' or 'cheap phones'. For multi-category queries (e.g., 'books, garden and sports' or 'Home,Sports and clothing'), pass the ENTIRE query as a single function call - do NOT split into multiple calls. The search engine will automatically detect and group results by category.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Search query for products (e.g., 'iPhone', 'laptops under $1000', 'cheap phones', 'books, garden and sports'). For multi-category queries, include the full query with all categories."
+                    },
+                    "sort_by": {
+                        "type": "string",
+                        "enum": ["relevance", "price_low", "price_high"],
+                        "description": "Sort order for results"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_to_cart",
+            "description": "Add a product to the shopping cart. Use when user says 'add to cart', 'I want this', 'add X to my cart'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_name": {
+                        "type": "string",
+                        "description": "Name of the product to add"
+                    },
+                    "quantity": {
+                        "type": "integer",
+                        "description": "Quantity to add (default 1)",
+                        "minimum": 1,
+                        "default": 1
+                    },
+                    "unit_price": {
+                        "type": "number",
+                        "description": "Unit price of the product"
+                    }
+                },
+                "required": ["product_name", "unit_price"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "view_cart",
+            "description": "View the current shopping cart contents. Use when user asks 'show my cart', 'what's in my cart', 'view cart'.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "remove_from_cart",
+            "description": "Remove a product from the shopping cart.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_name": {
+                        "type": "string",
+                        "description": "Name of the product to remove"
+                    }
+                },
+                "required": ["product_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "apply_coupon",
+            "description": "Apply a coupon code to the cart for a discount.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "coupon_code": {
+                        "type": "string",
+                        "description": "The coupon code to apply (e.g., SAVE10, SAVE20, WELCOME)"
+                    }
+                },
+                "required": ["coupon_code"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "checkout",
+            "description": "Checkout and place an order for all items in the cart. Use when user says 'checkout', 'place order', 'buy now', 'complete order'. Customer name and email are optional - if not provided, defaults will be used. User can provide them in the query like 'checkout with name John and email john@example.com'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_name": {
+                        "type": "string",
+                        "description": "Customer name (optional - will use default if not provided)"
+                    },
+                    "customer_email": {
+                        "type": "string",
+                        "description": "Customer email address (optional - will use default if not provided)"
+                    }
+                },
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_recommendations",
+            "description": "Get product recommendations based on a product. Use when user asks for similar products or recommendations.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_name": {
+                        "type": "string",
+                        "description": "Name of the product to get recommendations for"
+                    }
+                },
+                "required": ["product_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_order",
+            "description": "Create a single order directly (bypasses cart). Use ONLY when the user EXPLICITLY expresses order intent with clear phrases like 'I'll take it', 'place order', 'buy', 'purchase', 'confirm order', 'I want to buy', 'order it', 'I'll buy', 'checkout'. CRITICAL: Do NOT use this function if the user just says 'yes' or 'ok' after liking a product without explicit order intent. If user says 'I like X' followed by 'yes', ask for clarification: 'Do you want me to place an order?' instead of calling this function.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product_name": {
+                        "type": "string",
+                        "description": "Name of the product to order"
+                    },
+                    "quantity": {
+                        "type": "integer",
+                        "description": "Quantity to order (must be at least 1)",
+                        "minimum": 1
+                    },
+                    "unit_price": {
+                        "type": "number",
+                        "description": "Unit price of the product (must be greater than 0)",
+                        "minimum": 0.01
+                    },
+                    "customer_name": {
+                        "type": "string",
+                        "description": "Customer name (optional)"
+                    },
+                    "customer_email": {
+                        "type": "string",
+                        "description": "Customer email address (optional)"
+                    }
+                },
+                "required": ["product_name", "quantity", "unit_price"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_stock_info",
+            "description": "Get stock information for all products. Use when user asks for stock details, stock info, inventory, or wants to see all products with their stock status.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_categories",
+            "description": "List all available product categories. Use when user asks for categories, wants to see all categories, or asks what categories are available.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    }
+]
+
+
+@lru_cache(maxsize=1024)
+def _product_id(product_name: str) -> str:
+    """Derive the cart product ID for a product name ("Wireless Mouse" -> "wireless_mouse")."""
+    return product_name.lower().replace(" ", "_")
+
+
+def _read_pasted_lines() -> List[str]:
+    """
+    Read further lines already waiting on an interactive stdin (a multi-line paste).
+    
+    Returns:
+        Non-empty stripped lines, or an empty list when nothing is waiting or
+        stdin can't be polled (not a terminal, or a platform without select
+        support for it)
+    """
+    if not sys.stdin.isatty():
+        return []
+    lines = []
+    try:
+        import select
+        while select.select([sys.stdin], [], [], 0)[0]:
+            line = sys.stdin.readline()
+            if not line:
+                break
+            if line.strip():
+                lines.append(line.strip())
+    except (ImportError, OSError, ValueError):
+        pass
+    return lines
+
+
+def _tool_plan_key(text: str) -> Optional[str]:
+    """
+    Normalize a message into a tool-plan cache key.
+    
+    Args:
+        text: Sanitized user message
+    
+    Returns:
+        Casefolded, whitespace-collapsed message, or None if it refers back
+        to the conversation ("it", "that one", ...) and so can't be reused
+    """
+    folded = text.casefold()
+    if _CONTEXTUAL_REFERENCES.intersection(_WORD_RE.findall(folded)):
+        return None
+    return " ".join(folded.split()) or None
+
+
+def _plan_is_replayable(plan_key: str, tool_calls, exact: bool = True) -> bool:
+    """
+    Check that a tool plan only reads data and is grounded in the message itself.
+    
+    Search queries and recommendation targets must share a word with the
+    message, so answers that drew on earlier turns (e.g. "yes" after a
+    suggestion) are never cached. A plan found by similarity to a different
+    message must have every word and number of those arguments in the new
+    message, so "laptops under $500" never replays a search for "laptops
+    under $1000".
+    
+    Args:
+        plan_key: Normalized message
+        tool_calls: Tool calls chosen by the model
+        exact: Whether plan_key is the message the plan was made for
+    
+    Returns:
+        True if the plan can be replayed for the message
+    """
+    message_words = set(_WORD_RE.findall(plan_key))
+    for tool_call in tool_calls:
+        name = tool_call.function.name
+        if name not in REPLAYABLE_FUNCTIONS:
+            return False
+        if name in ("search_products", "get_recommendations"):
+            try:
+                arguments = json_loads(tool_call.function.arguments or "{}")
+            except ValueError:
+                return False
+            if not isinstance(arguments, dict):
+                return False
+            target = arguments.get("query" if name == "search_products" else "product_name") or ""
+            target_words = _WORD_RE.findall(str(target).casefold())
+            if exact:
+                if not message_words.intersection(target_words):
+                    return False
+            elif not target_words or not message_words.issuperset(target_words):
+                return False
+    return True
+
 
 class EcommerceChatbot:
     """Main chatbot application with RAG and Order agents."""
     
+    # Runs independent searches from one model response concurrently; shared
+    # by all sessions so the thread count does not grow with each chatbot
+    _tool_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="tool-calls")
+    # Speculative lookups run while the CLI waits for the user's next message
+    _speculation_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculation")
+    
     def __init__(
         self,
         api_key: Optional[str] = None,
@@ -36,24 +408,37 @@ class EcommerceChatbot:
             db_path: Path to database file
             vector_store_path: Path to vector store
         """
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY") or os.getenv("OPENROUTER_API_KEY")
-        base_url = os.getenv("OPENROUTER_BASE_URL") or os.getenv("OPENAI_BASE_URL")
+        from src.agents.order_agent import OrderAgent
+        from src.agents.rag_agent import RAGAgent
+        from src.database import init_database, seed_products_table
+        from src.llm_client import get_openai_client, start_prewarm
+        from src.tracing import get_tracer
+        
+        env = os.environ
+        self.api_key = api_key or env.get("OPENAI_API_KEY") or env.get("OPENROUTER_API_KEY")
+        base_url = env.get("OPENROUTER_BASE_URL") or env.get("OPENAI_BASE_URL")
         
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY or OPENROUTER_API_KEY not provided")
         
-        # Configure client for OpenRouter if base_url is provided
+        # Chat model, read once rather than on every call
+        self.model = env.get("OPENAI_MODEL", "openai/gpt-4o-mini")
+        
+        # Shared client (OpenRouter if base_url is provided) on a pooled connection
+        self.client = get_openai_client(self.api_key, base_url)
         if base_url:
-            self.client = OpenAI(api_key=self.api_key, base_url=base_url)
             logger.info(f"Using OpenRouter API at {base_url}")
         else:
-            self.client = OpenAI(api_key=self.api_key)
             logger.info("Using OpenAI API")
+        # Handshake with the endpoint while the database and agents load
+        # (once per shared client, not per session)
+        start_prewarm(self.client)
         self.db_path = db_path
         self.vector_store_path = vector_store_path
         
-        # Initialize database
+        # Initialize database (and the products lookup table on first run)
         init_database(db_path)
+        seed_products_table(db_path)
         
         # Initialize agents
         self.rag_agent = RAGAgent(
@@ -67,8 +452,9 @@ class EcommerceChatbot:
         )
         
         # Session state
-        self.session_id = str(uuid.uuid4())
-        self.chat_history: List[Dict] = []
+        # 64 random bits: unique per session and short in every log and trace line
+        self.session_id = secrets.token_hex(8)
+        self.chat_history: Deque[Dict] = deque(maxlen=MAX_CHAT_HISTORY)
         self.last_product: Optional[str] = None
         self.pending_order: Optional[Dict] = None
         self.order_count = 0
@@ -81,33 +467,26 @@ class EcommerceChatbot:
         self.cart = CartManager.get_cart(self.session_id)
         
         # Session memory for browsed products
-        self.browsed_products: List[Dict] = []
+        self.browsed_products: Deque[Dict] = deque(maxlen=MAX_BROWSED_PRODUCTS)
         
         # Initialize caches
         self.stock_cache = get_stock_cache()
         self.product_cache = get_product_cache()
+        self.tool_plan_cache = get_tool_plan_cache()
         
-        # Initialize Langfuse tracer
+        # Initialize Langfuse tracer (flushed by its background thread and at exit)
         self.tracer = get_tracer()
         
+        # Serializes this session's turns and direct cart/function calls that
+        # touch its state (cart, chat history, browsed products). Each browser
+        # session has its own chatbot, so other users' turns never wait on it.
+        self._state_lock = threading.RLock()
+        
         # Setup logger with session ID
         setup_logger(session_id=self.session_id)
         
         logger.info(f"Chatbot initialized with session ID: {self.session_id}")
     
-    def _flush_tracer_async(self):
-        """Flush tracer asynchronously to avoid blocking response."""
-        import threading
-        def flush_in_background():
-            try:
-                self.tracer.flush()
-            except Exception as e:
-                logger.debug(f"Background flush error (non-critical): {e}")
-        
-        # Start flush in background thread
-        thread = threading.Thread(target=flush_in_background, daemon=True)
-        thread.start()
-    
     def sanitize_input(self, text: str) -> str:
         """
         Sanitize user input.
@@ -121,9 +500,7 @@ class EcommerceChatbot:
         if not text:
             return ""
         # Remove potentially dangerous characters
-        import re
-        sanitized = re.sub(r'[<>"\';\\]', '', text)
-        return sanitized.strip()
+        return text.translate(_SANITIZE_TABLE).strip()
     
     def _resolve_product_name(self, product_name: str) -> Optional[Dict]:
         """
@@ -136,22 +513,17 @@ class EcommerceChatbot:
             Product dict with exact name and price, or None if not found
         """
         # Check cache first
-        cache_key = f"product_resolve:{product_name.lower().strip()}"
+        cache_key = ("product_resolve", product_name.strip().casefold())
         cached_result = self.product_cache.get(cache_key)
         if cached_result is not None:
             logger.debug(f"Cache hit for product resolution: {product_name}")
             return cached_result
         
-        import json
-        from pathlib import Path
-        
         try:
-            products_file = Path("./data/products.json")
-            if not products_file.exists():
+            catalog = load_catalog()
+            if catalog is None:
                 return None
-            
-            with open(products_file, 'r', encoding='utf-8') as f:
-                all_products = json.load(f)
+            all_products, names_lower = catalog
             
             product_name_lower = product_name.lower().strip()
             
@@ -162,16 +534,15 @@ class EcommerceChatbot:
                 product_name_normalized = product_name_lower
             
             # Try exact match first
-            for product in all_products:
-                if product_name_lower in product.get('name', '').lower():
+            for product, product_name_db in zip(all_products, names_lower):
+                if product_name_lower in product_name_db:
                     result = product
                     # Cache the result
                     self.product_cache.set(cache_key, result)
                     return result
             
             # Try normalized match (plural handling)
-            for product in all_products:
-                product_name_db = product.get('name', '').lower()
+            for product, product_name_db in zip(all_products, names_lower):
                 if product_name_normalized in product_name_db or product_name_db.startswith(product_name_normalized):
                     result = product
                     # Cache the result
@@ -184,9 +555,7 @@ class EcommerceChatbot:
             best_match = None
             best_score = 0
             
-            for product in all_products:
-                product_name_db = product.get('name', '').lower()
-                
+            for product, product_name_db in zip(all_products, names_lower):
                 # Check if normalized query is a prefix or substring of product name
                 # This handles "iPhone" matching "iPhone 15 Pro"
                 if product_name_normalized in product_name_db:
@@ -227,202 +596,27 @@ class EcommerceChatbot:
         Define function tools for OpenAI Function Calling.
         
         Returns:
-            List of function tool definitions
+            List of function tool definitions (shared; do not modify)
         """
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_products",
-                    "description": "Search for products by name, category, or description. Use this when the user asks about product information, prices, or availability. Supports filters like 'laptops under $1000' or 'cheap phones'. For multi-category queries (e.g., 'books, garden and sports' or 'Home,Sports and clothing'), pass the ENTIRE query as a single function call - do NOT split into multiple calls. The search engine will automatically detect and group results by category.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "Search query for products (e.g., 'iPhone', 'laptops under $1000', 'cheap phones', 'books, garden and sports'). For multi-category queries, include the full query with all categories."
-                            },
-                            "sort_by": {
-                                "type": "string",
-                                "enum": ["relevance", "price_low", "price_high"],
-                                "description": "Sort order for results"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "add_to_cart",
-                    "description": "Add a product to the shopping cart. Use when user says 'add to cart', 'I want this', 'add X to my cart'.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_name": {
-                                "type": "string",
-                                "description": "Name of the product to add"
-                            },
-                            "quantity": {
-                                "type": "integer",
-                                "description": "Quantity to add (default 1)",
-                                "minimum": 1,
-                                "default": 1
-                            },
-                            "unit_price": {
-                                "type": "number",
-                                "description": "Unit price of the product"
-                            }
-                        },
-                        "required": ["product_name", "unit_price"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "view_cart",
-                    "description": "View the current shopping cart contents. Use when user asks 'show my cart', 'what's in my cart', 'view cart'.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "remove_from_cart",
-                    "description": "Remove a product from the shopping cart.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_name": {
-                                "type": "string",
-                                "description": "Name of the product to remove"
-                            }
-                        },
-                        "required": ["product_name"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "apply_coupon",
-                    "description": "Apply a coupon code to the cart for a discount.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "coupon_code": {
-                                "type": "string",
-                                "description": "The coupon code to apply (e.g., SAVE10, SAVE20, WELCOME)"
-                            }
-                        },
-                        "required": ["coupon_code"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "checkout",
-                    "description": "Checkout and place an order for all items in the cart. Use when user says 'checkout', 'place order', 'buy now', 'complete order'. Customer name and email are optional - if not provided, defaults will be used. User can provide them in the query like 'checkout with name John and email john@example.com'.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "customer_name": {
-                                "type": "string",
-                                "description": "Customer name (optional - will use default if not provided)"
-                            },
-                            "customer_email": {
-                                "type": "string",
-                                "description": "Customer email address (optional - will use default if not provided)"
-                            }
-                        },
-                        "required": []
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_recommendations",
-                    "description": "Get product recommendations based on a product. Use when user asks for similar products or recommendations.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_name": {
-                                "type": "string",
-                                "description": "Name of the product to get recommendations for"
-                            }
-                        },
-                        "required": ["product_name"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_order",
-                    "description": "Create a single order directly (bypasses cart). Use ONLY when the user EXPLICITLY expresses order intent with clear phrases like 'I'll take it', 'place order', 'buy', 'purchase', 'confirm order', 'I want to buy', 'order it', 'I'll buy', 'checkout'. CRITICAL: Do NOT use this function if the user just says 'yes' or 'ok' after liking a product without explicit order intent. If user says 'I like X' followed by 'yes', ask for clarification: 'Do you want me to place an order?' instead of calling this function.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product_name": {
-                                "type": "string",
-                                "description": "Name of the product to order"
-                            },
-                            "quantity": {
-                                "type": "integer",
-                                "description": "Quantity to order (must be at least 1)",
-                                "minimum": 1
-                            },
-                            "unit_price": {
-                                "type": "number",
-                                "description": "Unit price of the product (must be greater than 0)",
-                                "minimum": 0.01
-                            },
-                            "customer_name": {
-                                "type": "string",
-                                "description": "Customer name (optional)"
-                            },
-                            "customer_email": {
-                                "type": "string",
-                                "description": "Customer email address (optional)"
-                            }
-                        },
-                        "required": ["product_name", "quantity", "unit_price"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_stock_info",
-                    "description": "Get stock information for all products. Use when user asks for stock details, stock info, inventory, or wants to see all products with their stock status.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_categories",
-                    "description": "List all available product categories. Use when user asks for categories, wants to see all categories, or asks what categories are available.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            }
-        ]
+        return FUNCTION_TOOLS
+    
+    def apply_coupon(self, coupon_code: str) -> Tuple[bool, str]:
+        """
+        Apply a coupon to this session's cart (for UI controls outside a turn).
+        
+        Args:
+            coupon_code: Coupon code entered by the user
+        
+        Returns:
+            (success, message)
+        """
+        with self._state_lock:
+            return self.cart.apply_coupon(coupon_code)
+    
+    def clear_cart(self) -> None:
+        """Empty this session's cart (for UI controls outside a turn)."""
+        with self._state_lock:
+            self.cart.clear()
     
     def execute_function(self, function_name: str, arguments: Dict) -> Dict:
         """
@@ -435,6 +629,11 @@ class EcommerceChatbot:
         Returns:
             Function result dictionary
         """
+        with self._state_lock:
+            return self._execute_function(function_name, arguments)
+    
+    def _execute_function(self, function_name: str, arguments: Dict) -> Dict:
+        """Execute a function; callers hold _state_lock."""
         try:
             if function_name == "search_products":
                 query = arguments.get("query", "")
@@ -444,7 +643,7 @@ class EcommerceChatbot:
                 # Check if results are grouped by category (dict) or flat list
                 if isinstance(products, dict):
                     # Multi-category results - format with category headers
-                    result_text = "I found products in multiple categories:\n\n"
+                    parts = ["I found products in multiple categories:\n\n"]
                     all_products = []
                     # Category display names
                     category_names = {
@@ -473,26 +672,21 @@ class EcommerceChatbot:
                                 category_normalized = 'sports'
                             
                             display_name = category_names.get(category_normalized, category.title())
-                            # #region agent log
-                            try:
-                                import json
-                                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps({"id":f"log_category_display","timestamp":int(__import__('time').time()*1000),"location":"chatbot.py:456","message":"Displaying category","data":{"category":category,"category_normalized":category_normalized,"display_name":display_name,"product_count":len(category_products)},"sessionId":"debug-session","runId":"run2","hypothesisId":"A"}) + '\n')
-                            except: pass
-                            # #endregion
-                            result_text += f"**{display_name}:**\n"
+                            if AGENT_DEBUG:
+                                agent_log("chatbot.py:456", "Displaying category", {"category": category, "category_normalized": category_normalized, "display_name": display_name, "product_count": len(category_products)}, hypothesis_id="A", run_id="run2")
+                            parts.append(f"**{display_name}:**\n")
                             # Limit displayed products to ≤8 per category for better performance
                             display_limit = min(8, len(category_products))
-                            for i, p in enumerate(category_products[:display_limit], 1):
-                                stock_msg = "in stock" if p['stock_status'] == "in_stock" else f"{p['stock_status']}"
-                                result_text += f"  {i}. {p['name']} - ${p['price']:.2f} ({stock_msg})\n"
+                            for i, p in enumerate(islice(category_products, display_limit), 1):
+                                stock_msg = "in stock" if p['stock_status'] == "in_stock" else p['stock_status']
+                                parts.append(f"  {i}. {p['name']} - ${p['price']:.2f} ({stock_msg})\n")
                             if len(category_products) > display_limit:
-                                result_text += f"  ... and {len(category_products) - display_limit} more\n"
-                            result_text += "\n"
+                                parts.append(f"  ... and {len(category_products) - display_limit} more\n")
+                            parts.append("\n")
                             all_products.extend(category_products[:display_limit])
                             if not self.last_product and category_products:
                                 self.last_product = category_products[0]['name']
-                            self.browsed_products.extend(category_products[:2])
+                            self.browsed_products.extend(islice(category_products, 2))
                     if not all_products:
                         # Clear intent on empty results
                         self.active_intent = None
@@ -526,7 +720,7 @@ class EcommerceChatbot:
                     
                     return {
                         "success": True,
-                        "result": result_text,
+                        "result": "".join(parts),
                         "products": all_products,
                         "grouped_by_category": True,
                         "query": query
@@ -557,7 +751,7 @@ class EcommerceChatbot:
                         }
                 # Only use filtered products, no fallback
                 self.last_product = products[0]['name']
-                self.browsed_products.extend(products[:3])
+                self.browsed_products.extend(islice(products, 3))
                 if len(products) == 1:
                     p = products[0]
                     stock_msg = "in stock" if p['stock_status'] == "in_stock" else f"{p['stock_status']}"
@@ -568,13 +762,16 @@ class EcommerceChatbot:
                 else:
                     # Limit displayed products to ≤8 for better performance
                     display_limit = min(8, len(products))
-                    result_text = f"I found {len(products)} product(s) matching your search:\n\n"
-                    for i, p in enumerate(products[:display_limit], 1):
-                        stock_msg = "in stock" if p['stock_status'] == "in_stock" else f"{p['stock_status']}"
-                        result_text += f"{i}. **{p['name']}** - ${p['price']:.2f} ({stock_msg})\n"
-                        result_text += f"   {p['description'][:100]}...\n\n"
+                    parts = [f"I found {len(products)} product(s) matching your search:\n\n"]
+                    for i, p in enumerate(islice(products, display_limit), 1):
+                        stock_msg = "in stock" if p['stock_status'] == "in_stock" else p['stock_status']
+                        parts.append(
+                            f"{i}. **{p['name']}** - ${p['price']:.2f} ({stock_msg})\n"
+                            f"   {p['description'][:100]}...\n\n"
+                        )
                     if len(products) > display_limit:
-                        result_text += f"... and {len(products) - display_limit} more product(s)\n\n"
+                        parts.append(f"... and {len(products) - display_limit} more product(s)\n\n")
+                    result_text = "".join(parts)
                 return {
                     "success": True,
                     "result": result_text,
@@ -635,7 +832,7 @@ class EcommerceChatbot:
                     }
                 
                 self.cart.add_item(
-                    product_id=product_name.lower().replace(" ", "_"),
+                    product_id=_product_id(product_name),
                     product_name=product_name,
                     unit_price=unit_price,
                     quantity=quantity
@@ -699,19 +896,21 @@ class EcommerceChatbot:
                 self.cart.customer_name = customer_name
                 self.cart.customer_email = customer_email
                 
-                # Create orders for each item
-                order_ids = []
-                errors = []
-                for item in self.cart.items:
-                    order_data = {
+                # Create orders for all items in a single transaction
+                items = self.cart.items
+                results = self.order_agent.process_orders_bulk([
+                    {
                         "product_name": item.product_name,
                         "quantity": item.quantity,
                         "unit_price": item.unit_price,  # Include unit_price from cart
-                        "customer_name": self.cart.customer_name,
-                        "customer_email": self.cart.customer_email
+                        "customer_name": customer_name,
+                        "customer_email": customer_email
                     }
-                    # Use process_order_without_confirmation for checkout (skip interactive confirmation)
-                    success, message, order_id = self.order_agent.process_order_without_confirmation(order_data)
+                    for item in items
+                ])
+                order_ids = []
+                errors = []
+                for item, (success, message, order_id) in zip(items, results):
                     if success:
                         order_ids.append(order_id)
                         self.order_count += 1
@@ -798,20 +997,14 @@ Thank you for your purchase! 🎉
                     return cached_result
                 
                 # Get all products with stock information
-                import json
-                from pathlib import Path
-                
                 try:
-                    products_file = Path("./data/products.json")
-                    if not products_file.exists():
+                    all_products = load_products()
+                    if all_products is None:
                         return {
                             "success": False,
                             "result": "Product database not found."
                         }
                     
-                    with open(products_file, 'r', encoding='utf-8') as f:
-                        all_products = json.load(f)
-                    
                     # Group by category
                     categories = {}
                     for product in all_products:
@@ -906,20 +1099,14 @@ Thank you for your purchase! 🎉
             
             elif function_name == "list_categories":
                 # List all available categories
-                import json
-                from pathlib import Path
-                
                 try:
-                    products_file = Path("./data/products.json")
-                    if not products_file.exists():
+                    all_products = load_products()
+                    if all_products is None:
                         return {
                             "success": False,
                             "result": "Product database not found."
                         }
                     
-                    with open(products_file, 'r', encoding='utf-8') as f:
-                        all_products = json.load(f)
-                    
                     # Get unique categories
                     categories = set()
                     category_counts = {}
@@ -1003,7 +1190,7 @@ Thank you for your purchase! 🎉
                 # If no product_name or ambiguous, check browsed_products
                 if not product_name or product_name.lower() in ["it", "this", "that", "one"]:
                     if len(self.browsed_products) > 1:
-                        product_names = [p.get('name', 'Unknown') for p in self.browsed_products[:5]]
+                        product_names = [p.get('name', 'Unknown') for p in islice(self.browsed_products, 5)]
                         product_list = " or ".join([f"**{name}**" for name in product_names])
                         return {
                             "success": False,
@@ -1060,30 +1247,764 @@ Thank you for your purchase! 🎉
         else:
             return "I'm not sure which product you're referring to. Could you please specify the product name?"
     
-    def handle_message(self, user_input: str) -> str:
+    def _try_local_add_to_cart(self, text: str) -> Optional[str]:
+        """
+        Handle simple "add <product> to cart" messages without calling the LLM.
+        
+        Only messages naming exactly one catalog product are handled; names
+        matching several products ("vacuum", "pro") or contextual references
+        return None so the message goes through normal function calling,
+        where the model can ask which product was meant.
+        
+        Args:
+            text: Sanitized user message
+        
+        Returns:
+            Bot response, or None if the message was not handled
+        """
+        match = _ADD_TO_CART_RE.match(text.strip())
+        if not match:
+            return None
+        
+        quantity = int(match.group(1)) if match.group(1) else 1
+        requested_name = match.group(2).strip().lower()
+        if quantity < 1 or len(requested_name) < 3 or requested_name in _CONTEXTUAL_REFERENCES:
+            return None
+        
+        resolved = self._unique_catalog_match(requested_name)
+        if not resolved:
+            return None
+        
+        logger.info(f"Handling add_to_cart locally: {resolved['name']} x{quantity}")
+        result = self.execute_function("add_to_cart", {
+            "product_name": resolved['name'],
+            "quantity": quantity,
+            "unit_price": resolved['price']
+        })
+        return result.get("result") if result.get("success") else None
+    
+    @staticmethod
+    def _unique_catalog_match(requested_name: str) -> Optional[Dict]:
+        """
+        Find the single catalog product a lowercased name refers to.
+        
+        An exact name wins; otherwise the name (or its singular form) must
+        appear in exactly one product name.
+        
+        Args:
+            requested_name: Lowercased product name from the user's message
+        
+        Returns:
+            Product dict, or None if no product or several products match
+        """
+        catalog = load_catalog()
+        if catalog is None:
+            return None
+        all_products, names_lower = catalog
+        
+        normalized_name = requested_name[:-1] if requested_name.endswith('s') and len(requested_name) > 3 else requested_name
+        matches = []
+        for product, name_lower in zip(all_products, names_lower):
+            if name_lower == requested_name:
+                return product
+            if normalized_name in name_lower:
+                matches.append(product)
+        return matches[0] if len(matches) == 1 else None
+    
+    def _try_local_command(self, text: str) -> Optional[str]:
+        """
+        Answer whole-message commands (view cart, list categories, greetings) without calling the LLM.
+        
+        Args:
+            text: Sanitized user message
+        
+        Returns:
+            Bot response, or None if the message is not such a command
+        """
+        match = _LOCAL_COMMAND_RE.match(text.strip())
+        if not match:
+            return None
+        
+        command = match.lastgroup
+        logger.info(f"Handling command locally: {command}")
+        if command in _LOCAL_REPLIES:
+            return _LOCAL_REPLIES[command]
+        function_name = "view_cart" if command == "cart" else "list_categories"
+        result = self.execute_function(function_name, {})
+        return result.get("result") if result.get("success") else None
+    
+    def _create_chat_completion(self, messages: List[Dict], tools: List[Dict], trace, max_retries: int = 3):
+        """
+        Call the chat model with function calling, retrying transient failures.
+        
+        Only the network call is retried; the response is processed by the
+        caller so local errors never trigger another LLM request.
+        
+        Args:
+            messages: Messages to send
+            tools: Function tool definitions
+            trace: Langfuse trace for this turn
+            max_retries: Maximum retry attempts
+        
+        Returns:
+            Chat completion response
+        
+        Raises:
+            Exception: The last API error once retries are exhausted
+        """
+        # Same context on every attempt: retries never modify messages
+        generation_input = {"messages": messages[-5:]}  # Last 5 messages for context
+        retry_count = 0
+        while True:
+            try:
+                model = self.model
+                logger.info(f"Making API call to {model}...")
+                
+                llm_call_start = time.time()
+                if AGENT_DEBUG:
+                    agent_log("chatbot.py:1023", "LLM call START", {"model": model, "messages_count": len(messages), "retry_count": retry_count}, hypothesis_id="D")
+                
+                # Create LLM generation span for Langfuse
+                llm_gen = self.tracer.generation(
+                    trace=trace,
+                    name="chat_completion",
+                    model=model,
+                    input=generation_input,
+                    metadata={"retry_count": retry_count}
+                )
+                
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto",
+                    temperature=0.7,
+                    max_tokens=500
+                )
+                
+                llm_call_end = time.time()
+                llm_call_duration = llm_call_end - llm_call_start
+                if AGENT_DEBUG:
+                    agent_log("chatbot.py:1044", "LLM call END", {"duration_ms": llm_call_duration * 1000, "has_tool_calls": bool(response.choices[0].message.tool_calls)}, hypothesis_id="D")
+                
+                # End generation with output and usage
+                usage_info = {}
+                if hasattr(response, 'usage') and response.usage:
+                    usage_info = {
+                        "input": response.usage.prompt_tokens,
+                        "output": response.usage.completion_tokens,
+                        "total": response.usage.total_tokens
+                    }
+                llm_gen.end(
+                    output={"content": response.choices[0].message.content},
+                    usage=usage_info
+                )
+                logger.info("API call completed successfully")
+                return response
+            except Exception as e:
+                retry_count += 1
+                if retry_count < max_retries and is_retryable_error(e):
+                    wait_time = backoff_delay(retry_count)
+                    logger.warning(f"API call failed, retrying in {wait_time:.2f}s... ({retry_count}/{max_retries})")
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"Failed to get response after {retry_count} attempts: {str(e)}", exc_info=True)
+                    raise
+    
+    def _stream_chat_completion(
+        self,
+        messages: List[Dict],
+        tools: List[Dict],
+        trace,
+        on_token: Callable[[str], None],
+        max_retries: int = 3
+    ) -> "ChatCompletionMessage":
+        """
+        Call the chat model with streaming, passing text deltas to on_token as they arrive.
+        
+        Tool-call fragments are reassembled by index into complete tool calls.
+        A failed request is retried only if no text has been emitted yet.
+        
+        Args:
+            messages: Messages to send
+            tools: Function tool definitions
+            trace: Langfuse trace for this turn
+            on_token: Called with each content delta
+            max_retries: Maximum retry attempts
+        
+        Returns:
+            The assembled assistant message
+        
+        Raises:
+            Exception: The last API error once retries are exhausted
+        """
+        from openai.types.chat import ChatCompletionMessage
+        
+        # Same context on every attempt: retries never modify messages
+        generation_input = {"messages": messages[-5:]}  # Last 5 messages for context
+        retry_count = 0
+        while True:
+            emitted = False
+            try:
+                model = self.model
+                logger.info(f"Making streaming API call to {model}...")
+                
+                llm_gen = self.tracer.generation(
+                    trace=trace,
+                    name="chat_completion",
+                    model=model,
+                    input=generation_input,
+                    metadata={"retry_count": retry_count, "stream": True}
+                )
+                
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto",
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                
+                content_parts = []
+                tool_call_parts: Dict[int, Dict] = {}
+                usage_info = {}
+                for chunk in stream:
+                    if chunk.usage:
+                        usage_info = {
+                            "input": chunk.usage.prompt_tokens,
+                            "output": chunk.usage.completion_tokens,
+                            "total": chunk.usage.total_tokens
+                        }
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content_parts.append(delta.content)
+                        emitted = True
+                        on_token(delta.content)
+                    for fragment in delta.tool_calls or []:
+                        part = tool_call_parts.setdefault(fragment.index, {"id": "", "name": "", "arguments": []})
+                        if fragment.id:
+                            part["id"] = fragment.id
+                        if fragment.function:
+                            if fragment.function.name:
+                                part["name"] += fragment.function.name
+                            if fragment.function.arguments:
+                                part["arguments"].append(fragment.function.arguments)
+                
+                content = "".join(content_parts) or None
+                tool_calls = [
+                    {
+                        "id": part["id"],
+                        "type": "function",
+                        "function": {"name": part["name"], "arguments": "".join(part["arguments"])}
+                    }
+                    for _, part in sorted(tool_call_parts.items())
+                ]
+                llm_gen.end(output={"content": content}, usage=usage_info)
+                logger.info("Streaming API call completed successfully")
+                return ChatCompletionMessage.model_validate({
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": tool_calls or None
+                })
+            except Exception as e:
+                retry_count += 1
+                if not emitted and retry_count < max_retries and is_retryable_error(e):
+                    wait_time = backoff_delay(retry_count)
+                    logger.warning(f"Streaming API call failed, retrying in {wait_time:.2f}s... ({retry_count}/{max_retries})")
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"Failed to get streamed response after {retry_count} attempts: {str(e)}", exc_info=True)
+                    raise
+    
+    def _lookup_tool_plan(self, plan_key: Optional[str]):
+        """
+        Find a cached tool plan for a message, exactly or (when the semantic
+        cache is enabled) by embedding similarity.
+        
+        Args:
+            plan_key: Normalized message, or None if it can't be cached
+        
+        Returns:
+            Tuple of (tool calls or None, message embedding or None)
+        """
+        if plan_key is None:
+            return None, None
+        plan = self.tool_plan_cache.get(("tool_plan", plan_key))
+        if plan is not None:
+            return plan, None
+        
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is None:
+            return None, None
+        try:
+            embedding = self.rag_agent.get_query_embedding(plan_key)
+            plan = semantic_cache.get("tool_plan", embedding)
+        except Exception as e:
+            logger.warning(f"Tool plan semantic lookup failed: {e}")
+            return None, None
+        # A paraphrase only reuses a plan whose arguments it also mentions
+        if plan is not None and not _plan_is_replayable(plan_key, plan, exact=False):
+            plan = None
+        return plan, embedding
+    
+    def _store_tool_plan(self, plan_key: str, tool_calls, embedding: Optional[List[float]] = None) -> None:
+        """
+        Cache the tool calls the model chose for a message.
+        
+        Args:
+            plan_key: Normalized message
+            tool_calls: Tool calls to replay for the same message
+            embedding: Message embedding for the semantic cache, if computed
+        """
+        self.tool_plan_cache.set(("tool_plan", plan_key), tool_calls)
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None and embedding is not None:
+            semantic_cache.set("tool_plan", embedding, tool_calls)
+    
+    def _prefetch_searches(self, tool_calls) -> None:
+        """
+        Run the searches requested by several tool calls concurrently.
+        
+        Tool calls are executed in order afterwards because they update
+        session state; the searches they need are then served from the RAG
+        agent's search cache.
+        
+        Args:
+            tool_calls: Tool calls from the model response
+        """
+        searches = []
+        for tool_call in tool_calls:
+            if tool_call.function.name != "search_products":
+                continue
+            try:
+                arguments = json_loads(tool_call.function.arguments or "{}")
+            except ValueError:
+                continue
+            if isinstance(arguments, dict):
+                searches.append((arguments.get("query", ""), arguments.get("sort_by", "relevance")))
+        if len(searches) < 2:
+            return
+        
+        futures = [
+            self._tool_executor.submit(self.rag_agent.search_products, query, k=10, sort_by=sort_by)
+            for query, sort_by in searches
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.debug(f"Search prefetch failed (retried in order): {e}")
+    
+    def _respond_to_tool_calls(self, tool_calls, messages: List[Dict], trace) -> str:
+        """
+        Execute requested function calls and build the reply from their results.
+        
+        Args:
+            tool_calls: Tool calls from the model response
+            messages: Messages sent to the model (extended with tool results
+                only if the fallback LLM call is needed)
+            trace: Langfuse trace for this turn
+        
+        Returns:
+            Bot response
+        """
+        function_results = []
+        # (tool_call, result) pairs, turned into tool messages only for the fallback call
+        executed_calls = []
+        self._prefetch_searches(tool_calls)
+        for tool_call in tool_calls:
+            function_name = tool_call.function.name
+            try:
+                arguments = json_loads(tool_call.function.arguments or "{}")
+            except ValueError as e:
+                # Malformed arguments are a local failure; don't re-query the model
+                logger.warning(f"Invalid arguments for {function_name}: {str(e)}")
+                function_results.append({
+                    "success": False,
+                    "result": "I couldn't understand that request. Could you please rephrase it?"
+                })
+                continue
+            
+            logger.info(f"Function called: {function_name} with args: {arguments}")
+            
+            func_start = time.time()
+            if AGENT_DEBUG:
+                agent_log("chatbot.py:1068", "Function execution START", {"function_name": function_name}, hypothesis_id="C")
+            
+            # Create span for function execution
+            func_span = self.tracer.span(
+                trace=trace,
+                name=f"function_{function_name}",
+                input={"function": function_name, "arguments": arguments}
+            )
+            
+            # Execute function
+            function_result = self.execute_function(function_name, arguments)
+            
+            func_end = time.time()
+            func_duration = func_end - func_start
+            if AGENT_DEBUG:
+                agent_log("chatbot.py:1072", "Function execution END", {"function_name": function_name, "duration_ms": func_duration * 1000, "success": function_result.get("success", False)}, hypothesis_id="C")
+            function_results.append(function_result)
+            
+            # End function span
+            func_span.end(output={"result": json_preview(function_result)})
+            executed_calls.append((tool_call, function_result))
+        
+        # Prepare formatted response from function results (immediate response)
+        bot_response = None
+        if function_results:
+            result = function_results[0]
+            logger.info(f"Processing function result: success={result.get('success')}, keys={list(result.keys())}")
+            # Priority: Use formatted result if available (handles multi-category, cart, etc.)
+            if result.get("success"):
+                # Check for grouped results first
+                if result.get("grouped_by_category") and result.get("result"):
+                    bot_response = result.get("result")
+                # Then check for regular result (cart operations, order operations, etc.)
+                elif result.get("result"):
+                    bot_response = result.get("result")
+                # Check for cart operations (they return result field)
+                elif result.get("cart"):
+                    # Cart operations return result in "result" field
+                    bot_response = result.get("result", "Cart operation completed.")
+                # Check for order operations
+                elif result.get("order_id"):
+                    bot_response = result.get("result", "Your order has been processed.")
+                # Fallback to products if no formatted result
+                elif result.get("products"):
+                    products = result["products"]
+                    if products:
+                        # If the user query is a stock/inventory request, show all products, not just 5
+                        user_query = self.chat_history[-1]["content"] if self.chat_history else ""
+                        show_all_stock = _SHOW_ALL_STOCK_RE.search(user_query) is not None
+                        if len(products) == 1:
+                            product = products[0]
+                            stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
+                            bot_response = (
+                                f"The {product['name']} is priced at ${product['price']:.2f} "
+                                f"and is currently {stock_msg}."
+                            )
+                        else:
+                            response_parts = [f"I found {len(products)} product(s):\n\n"]
+                            # Show all products for stock queries, else show only 8 (limit for performance)
+                            display_products = products if show_all_stock else products[:8]
+                            for i, product in enumerate(display_products, 1):
+                                stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
+                                response_parts.append(
+                                    f"{i}. {product['name']} - ${product['price']:.2f} ({stock_msg})\n"
+                                )
+                            if not show_all_stock and len(products) > 8:
+                                response_parts.append(f"...and {len(products) - 8} more. Ask for 'all stock' to see everything.\n")
+                            bot_response = "".join(response_parts)
+                    else:
+                        # Check if this was a filtered search (category + price)
+                        # Get query from result metadata if available
+                        query_text = result.get("query", "")
+                        
+                        # Check for category and price filter in query
+                        has_category = False
+                        has_price_filter = False
+                        category_name = "products"
+                        price_part = ""
+                        
+                        if query_text:
+                            query_lower = query_text.lower()
+                            # Check for categories
+                            if 'laptop' in query_lower:
+                                category_name = "laptops"
+                                has_category = True
+                            elif 'phone' in query_lower or 'iphone' in query_lower or 'samsung' in query_lower:
+                                category_name = "phones"
+                                has_category = True
+                            elif 'book' in query_lower and 'notebook' not in query_lower and 'macbook' not in query_lower:
+                                category_name = "books"
+                                has_category = True
+                            elif 'headphone' in query_lower or 'earbud' in query_lower:
+                                category_name = "headphones"
+                                has_category = True
+                            elif 'gaming' in query_lower or 'console' in query_lower:
+                                category_name = "gaming products"
+                                has_category = True
+                            
+                            # Check for price filter
+                            price_match = _UNDER_PRICE_RE.search(query_lower)
+                            if price_match:
+                                has_price_filter = True
+                                price_part = f" under ${price_match.group(1)}"
+                            else:
+                                price_match = _BELOW_PRICE_RE.search(query_lower)
+                                if price_match:
+                                    has_price_filter = True
+                                    price_part = f" below ${price_match.group(1)}"
+                        
+                        # Provide specific error message if category and price filter detected
+                        if has_category and has_price_filter:
+                            bot_response = f"No {category_name} found{price_part}. Please try different filters or browse all {category_name}."
+                        elif has_category:
+                            bot_response = f"No {category_name} found. Please try different keywords or browse all {category_name}."
+                        else:
+                            bot_response = "I couldn't find that product. Could you try rephrasing your search?"
+                else:
+                    # Final fallback - check if there's any result field
+                    bot_response = result.get("result", "I processed your request.")
+            else:
+                # Function returned failure - use error message
+                bot_response = result.get("result", "I couldn't process that request. Please try again.")
+        
+        # If we have a response from function results, use it (skip slow LLM call for faster response)
+        # BUT: If multiple function calls were made (multi-category query), aggregate all results
+        # Check if result has grouped_by_category - if so, use the pre-formatted result directly
+        has_grouped_category = any(r.get("grouped_by_category") for r in function_results if r.get("success") and r.get("result"))
+        if has_grouped_category and len(function_results) == 1:
+            # Single grouped result - use it directly without re-categorization
+            bot_response = function_results[0].get("result")
+            logger.info("Using pre-formatted grouped category result directly")
+        elif bot_response and len(function_results) == 1:
+            # Single result - use formatted response directly
+            logger.info(f"Using formatted response from function results: {bot_response[:100]}...")
+        elif function_results:
+            # Multiple results or no response - aggregate all function results
+            # With unified retrieval, we should rarely have multiple function calls for search
+            # But handle it gracefully if it happens
+            if bot_response and len(function_results) > 1:
+                # Reset bot_response to trigger aggregation
+                bot_response = None
+                logger.info(f"Multiple function calls detected ({len(function_results)}), aggregating results...")
+            
+            # Simplified aggregation: rely on search engine's grouping
+            # Only re-aggregate if we have multiple function calls without grouped results
+            from collections import OrderedDict
+            category_to_products = OrderedDict()
+            product_ids_seen = set()
+            
+            # Unified category display mapping (used by search engine and here)
+            category_display_map = {
+                "Home & Garden": "🏠 Home & Garden",
+                "home & garden": "🏠 Home & Garden",
+                "Home and Garden": "🏠 Home & Garden",
+                "home and garden": "🏠 Home & Garden",
+                "Sports": "⚽ Sports",
+                "sports": "⚽ Sports",
+                "sport": "⚽ Sports",
+                "Clothing": "👕 Clothing",
+                "clothing": "👕 Clothing",
+                "clothes": "👕 Clothing",
+                "Books": "📚 Books",
+                "books": "📚 Books",
+                "book": "📚 Books",
+                "Electronics": "⚡ Electronics",
+                "electronics": "⚡ Electronics",
+                "Computers": "💻 Laptops & Computers",
+                "computers": "💻 Laptops & Computers",
+                "Phones": "📱 Phones",
+                "phones": "📱 Phones",
+                "Audio": "🎧 Audio & Headphones",
+                "audio": "🎧 Audio & Headphones",
+                "Gaming": "🎮 Gaming",
+                "gaming": "🎮 Gaming",
+                "Wearables": "⌚ Wearables",
+                "wearables": "⌚ Wearables"
+            }
+            
+            for result in function_results:
+                if not result.get("success"):
+                    continue
+                
+                # If already grouped by category, use the grouping directly
+                if result.get("grouped_by_category") and result.get("products"):
+                    # Search engine already grouped these - use product's category field
+                    for p in result["products"]:
+                        pid = p.get("product_id")
+                        if pid and pid in product_ids_seen:
+                            continue
+                        original_category = p.get("category", "")
+                        # Map category to display name
+                        label = category_display_map.get(original_category) or category_display_map.get(original_category.lower() if original_category else "") or "⚡ Electronics"
+                        if label not in category_to_products:
+                            category_to_products[label] = []
+                        category_to_products[label].append(p)
+                        if pid:
+                            product_ids_seen.add(pid)
+                    continue
+                
+                # If products list (not grouped), group by product's category field
+                if result.get("products"):
+                    products = result["products"]
+                    if isinstance(products, list):
+                        for p in products:
+                            pid = p.get("product_id")
+                            if pid and pid in product_ids_seen:
+                                continue
+                            original_category = p.get("category", "")
+                            # Map category to display name
+                            label = category_display_map.get(original_category) or category_display_map.get(original_category.lower() if original_category else "") or "⚡ Electronics"
+                            if label not in category_to_products:
+                                category_to_products[label] = []
+                            category_to_products[label].append(p)
+                            if pid:
+                                product_ids_seen.add(pid)
+                    continue
+                
+                # Non-product results (cart, orders, etc.)
+                if result.get("result") and not result.get("products"):
+                    if not hasattr(self, '_non_product_results'):
+                        self._non_product_results = []
+                    self._non_product_results.append(result.get("result"))
+            
+            # Now format the deduplicated response
+            bot_response_parts = []
+            
+            # Add non-product results first (cart operations, orders, etc.)
+            if hasattr(self, '_non_product_results') and self._non_product_results:
+                bot_response_parts.extend(self._non_product_results)
+                delattr(self, '_non_product_results')
+            
+            # Add product results
+            # Only include categories that were requested in the query
+            # Map query to extracted categories (normalized)
+            requested_categories = []
+            if hasattr(self, 'last_query') and self.last_query:
+                from src.search import HybridSearch
+                requested_categories = HybridSearch()._extract_categories(self.last_query)
+            # Normalize category keys
+            def normalize(cat):
+                return cat.strip().replace(' ', '_').lower()
+            # Map to display labels
+            label_map = {
+                'clothing': '👕 Clothing',
+                'sports': '⚽ Sports',
+                'home_garden': '🏠 Home & Garden',
+                'books': '📚 Books',
+                'phones': '📱 Phones',
+                'computers': '💻 Laptops',
+                'audio': '🎧 Audio & Headphones',
+                'gaming': '🎮 Gaming',
+                'wearables': '⌚ Wearables',
+                'electronics': '⚡ Electronics'
+            }
+            # Only show requested categories, in order, with fallback for missing
+            any_found = False
+            for cat in requested_categories:
+                norm_cat = normalize(cat)
+                label = label_map.get(norm_cat, cat.capitalize())
+                group_products = category_to_products.get(label, [])
+                if not group_products:
+                    # Try fallback: check for label with different case or spaces
+                    alt_label = label_map.get(cat.lower(), cat.capitalize())
+                    group_products = category_to_products.get(alt_label, [])
+                if not group_products:
+                    bot_response_parts.append(f"**{label}:**\nNo products found for this category.\n")
+                    continue
+                any_found = True
+                if len(group_products) == 1:
+                    product = group_products[0]
+                    stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
+                    header = f"**{label}:**\n"
+                    bot_response_parts.append(
+                        f"{header}The {product['name']} is priced at ${product['price']:.2f} and is currently {stock_msg}."
+                    )
+                else:
+                    # Limit displayed products to ≤8 per category for better performance
+                    display_limit = min(8, len(group_products))
+                    header = f"**{label}:**\n"
+                    response_parts = [header + f"I found {len(group_products)} product(s):\n\n"]
+                    for i, product in enumerate(group_products[:display_limit], 1):
+                        stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
+                        response_parts.append(
+                            f"{i}. {product['name']} - ${product['price']:.2f} ({stock_msg})\n"
+                        )
+                    if len(group_products) > display_limit:
+                        response_parts.append(f"... and {len(group_products) - display_limit} more\n")
+                    bot_response_parts.append("".join(response_parts))
+            if not any_found:
+                bot_response_parts.append("No products found for any of the requested categories. Please try different keywords.")
+            
+            bot_response = "\n\n".join(bot_response_parts) if bot_response_parts else None
+            
+            if not bot_response:
+                logger.warning("No response from function results aggregation")
+        
+        # If we still don't have a response, try LLM call
+        if not bot_response:
+            fallback_start = time.time()
+            if AGENT_DEBUG:
+                agent_log("chatbot.py:1294", "FALLBACK LLM call triggered", {"chat_history_length": len(self.chat_history)}, hypothesis_id="A")
+            try:
+                # Add function results to messages
+                for tool_call, function_result in executed_calls:
+                    messages.append({
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [tool_call]
+                    })
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": json_dumps(function_result)
+                    })
+                logger.info("Making API call to generate response...")
+                # Fix: Use self.client instead of client, and use reduced context
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages[-3:],  # Use minimal context for fallback
+                    temperature=0.7,
+                    timeout=30.0
+                )
+                message = response.choices[0].message
+                bot_response = message.content
+                logger.info("LLM response generated successfully")
+                
+                fallback_end = time.time()
+                fallback_duration = fallback_end - fallback_start
+                if AGENT_DEBUG:
+                    agent_log("chatbot.py:1305", "FALLBACK LLM call END", {"duration_ms": fallback_duration * 1000}, hypothesis_id="A")
+            except Exception as e:
+                if AGENT_DEBUG:
+                    agent_log("chatbot.py:1307", "FALLBACK LLM call ERROR", {"error": str(e)[:100]}, hypothesis_id="E")
+                logger.error(f"Failed to generate LLM response: {str(e)}")
+                bot_response = "I processed your request, but couldn't generate a response. Please try again."
+        
+        # Final fallback
+        if not bot_response:
+            bot_response = "I'm sorry, I couldn't process that request. Please try again."
+            logger.warning("bot_response was None, using final fallback")
+        
+        return bot_response
+    
+    def handle_message(self, user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         Handle user message and return response.
         
         Args:
             user_input: User's message
+            on_token: Optional callback; when given, the model's text reply is
+                streamed to it as it is generated (the full response is still
+                returned)
         
         Returns:
             Bot's response
         """
-        # #region agent log
+        with self._state_lock:
+            return self._handle_message(user_input, on_token)
+    
+    def _handle_message(self, user_input: str, on_token: Optional[Callable[[str], None]]) -> str:
+        """Handle one turn; callers hold _state_lock."""
         handle_start = time.time()
-        try:
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:954","message":"handle_message START","data":{"user_input":user_input[:50],"sessionId":self.session_id},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-        except: pass
-        # #endregion
+        if AGENT_DEBUG:
+            agent_log("chatbot.py:954", "handle_message START", {"user_input": user_input[:50], "sessionId": self.session_id}, hypothesis_id="A")
         
         logger.debug(f"[DEBUG] handle_message called with user_input: {user_input}")
         # Create trace for this conversation turn
         trace = self.tracer.trace(
             name="handle_message",
             session_id=self.session_id,
-            user_id="demo_user",
+            user_id=TRACE_USER_ID,
             metadata={"input_length": len(user_input)},
             tags=["chatbot", "conversation"]
         )
@@ -1099,13 +2020,11 @@ Thank you for your purchase! 🎉
             
             # Intent Persistence: Check for continuation queries ("show me more", "more products", etc.)
             # If active_intent exists and user asks for more, reuse the intent
-            continuation_phrases = ["show me more", "more products", "more", "continue", "keep going", "next page"]
-            is_continuation = any(phrase in sanitized_input.lower() for phrase in continuation_phrases)
+            is_continuation = _CONTINUATION_RE.search(sanitized_input) is not None
             
             # Intent Expiry: Check if user is asking a new search or switching topics
             # Clear active_intent if user explicitly asks for different categories or new search
-            new_search_indicators = ["show me", "find", "search for", "looking for", "what is the price", "how much"]
-            is_new_search = any(indicator in sanitized_input.lower() for indicator in new_search_indicators)
+            is_new_search = _NEW_SEARCH_RE.search(sanitized_input) is not None
             
             # If continuation query and active_intent exists, reuse it
             if is_continuation and self.active_intent and self.active_intent.get("type") == "search":
@@ -1123,526 +2042,221 @@ Thank you for your purchase! 🎉
                 self.active_intent = None
                 logger.debug("Cleared active_intent due to new search query")
             
+            # Simple commands (add-to-cart naming a catalog product, view cart,
+            # list categories, greetings) skip the LLM
+            local_response = self._try_local_command(sanitized_input) or self._try_local_add_to_cart(sanitized_input)
+            if local_response:
+                self.chat_history.append({"role": "assistant", "content": local_response})
+                trace.end(output={"response": local_response[:200], "success": True, "local": True})
+                self.tracer.mark_pending()
+                return local_response
+            
             # Build messages for OpenAI
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a helpful e-commerce chatbot assistant.
-You help customers find products and place orders.
-Use the search_products function to find product information.
-Use the create_order function ONLY when the user explicitly wants to place an order.
-Be conversational, friendly, and helpful.
-Always use exact prices from search results."""
-                }
-            ]
+            messages = [SYSTEM_MESSAGE]
             
             # Add chat history - use reduced context for better latency
             # For order processing, minimal context is sufficient since details come from function arguments
             # For general queries, 5 messages provide sufficient context
             context_size = 5  # Default: last 5 messages
-            messages.extend(self.chat_history[-context_size:])
+            messages.extend(islice(self.chat_history, max(0, len(self.chat_history) - context_size), None))
             
             # Get response with function calling
             tools = self.get_function_tools()
             
-            max_retries = 3
-            retry_count = 0
+            # A repeated, self-contained request replays the model's earlier tool choice
+            plan_key = None if is_continuation else _tool_plan_key(sanitized_input)
+            cached_plan, plan_embedding = self._lookup_tool_plan(plan_key)
             
-            while retry_count < max_retries:
+            if cached_plan is not None:
+                logger.info(f"Replaying cached tool plan for: {sanitized_input[:50]}")
+                tool_calls, content = cached_plan, None
+            else:
+                # Only the API call is retried; local processing errors are not
                 try:
-                    # Use model from environment or default
-                    model = os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini")
-                    logger.info(f"Making API call to {model}...")
-                    
-                    # #region agent log
-                    llm_call_start = time.time()
-                    try:
-                        with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1023","message":"LLM call START","data":{"model":model,"messages_count":len(messages),"retry_count":retry_count},"sessionId":"debug-session","runId":"run1","hypothesisId":"D"}) + '\n')
-                    except: pass
-                    # #endregion
-                    
-                    # Create LLM generation span for Langfuse
-                    llm_gen = self.tracer.generation(
-                        trace=trace,
-                        name="chat_completion",
-                        model=model,
-                        input={"messages": messages[-5:]},  # Last 5 messages for context
-                        metadata={"retry_count": retry_count}
-                    )
-                    
-                    response = self.client.chat.completions.create(
-                        model=model,
-                        messages=messages,
-                        tools=tools,
-                        tool_choice="auto",
-                        temperature=0.7,
-                        max_tokens=500
-                    )
-                    
-                    # #region agent log
-                    llm_call_end = time.time()
-                    llm_call_duration = llm_call_end - llm_call_start
-                    try:
-                        with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1044","message":"LLM call END","data":{"duration_ms":llm_call_duration*1000,"has_tool_calls":bool(response.choices[0].message.tool_calls)},"sessionId":"debug-session","runId":"run1","hypothesisId":"D"}) + '\n')
-                    except: pass
-                    # #endregion
-                    
-                    # End generation with output and usage
-                    usage_info = {}
-                    if hasattr(response, 'usage') and response.usage:
-                        usage_info = {
-                            "input": response.usage.prompt_tokens,
-                            "output": response.usage.completion_tokens,
-                            "total": response.usage.total_tokens
-                        }
-                    llm_gen.end(
-                        output={"content": response.choices[0].message.content},
-                        usage=usage_info
-                    )
-                    logger.info("API call completed successfully")
-                    
-                    message = response.choices[0].message
-                    bot_response = None  # Initialize early to prevent UnboundLocalError
-                    
-                    # Check for function calls
-                    if message.tool_calls:
-                        # Execute functions
-                        function_results = []
-                        for tool_call in message.tool_calls:
-                            function_name = tool_call.function.name
-                            import json
-                            arguments = json.loads(tool_call.function.arguments)
-                            
-                            logger.info(f"Function called: {function_name} with args: {arguments}")
-                            
-                            # #region agent log
-                            func_start = time.time()
-                            try:
-                                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1068","message":"Function execution START","data":{"function_name":function_name},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-                            except: pass
-                            # #endregion
-                            
-                            # Create span for function execution
-                            func_span = self.tracer.span(
-                                trace=trace,
-                                name=f"function_{function_name}",
-                                input={"function": function_name, "arguments": arguments}
-                            )
-                            
-                            # Execute function
-                            function_result = self.execute_function(function_name, arguments)
-                            
-                            # #region agent log
-                            func_end = time.time()
-                            func_duration = func_end - func_start
-                            try:
-                                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1072","message":"Function execution END","data":{"function_name":function_name,"duration_ms":func_duration*1000,"success":function_result.get("success",False)},"sessionId":"debug-session","runId":"run1","hypothesisId":"C"}) + '\n')
-                            except: pass
-                            # #endregion
-                            function_results.append(function_result)
-                            
-                            # End function span
-                            func_span.end(output={"result": str(function_result)[:500]})
-                            
-                            # Add function result to messages
-                            messages.append({
-                                "role": "assistant",
-                                "content": None,
-                                "tool_calls": [tool_call]
-                            })
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": json.dumps(function_result)
-                            })
-                        
-                        # Prepare formatted response from function results (immediate response)
-                        bot_response = None
-                        if function_results:
-                            result = function_results[0]
-                            logger.info(f"Processing function result: success={result.get('success')}, keys={list(result.keys())}")
-                            # Priority: Use formatted result if available (handles multi-category, cart, etc.)
-                            if result.get("success"):
-                                # Check for grouped results first
-                                if result.get("grouped_by_category") and result.get("result"):
-                                    bot_response = result.get("result")
-                                # Then check for regular result (cart operations, order operations, etc.)
-                                elif result.get("result"):
-                                    bot_response = result.get("result")
-                                # Check for cart operations (they return result field)
-                                elif result.get("cart"):
-                                    # Cart operations return result in "result" field
-                                    bot_response = result.get("result", "Cart operation completed.")
-                                # Check for order operations
-                                elif result.get("order_id"):
-                                    bot_response = result.get("result", "Your order has been processed.")
-                                # Fallback to products if no formatted result
-                                elif result.get("products"):
-                                    products = result["products"]
-                                    if products:
-                                        # If the user query is a stock/inventory request, show all products, not just 5
-                                        user_query = self.chat_history[-1]["content"].lower() if self.chat_history else ""
-                                        show_all_stock = any(
-                                            kw in user_query for kw in [
-                                                "show me all stock", "show all stock", "all stock", "show me the stock", "stock information", "inventory", "all products", "list all products"
-                                            ]
-                                        )
-                                        if len(products) == 1:
-                                            product = products[0]
-                                            stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
-                                            bot_response = (
-                                                f"The {product['name']} is priced at ${product['price']:.2f} "
-                                                f"and is currently {stock_msg}."
-                                            )
-                                        else:
-                                            response_parts = [f"I found {len(products)} product(s):\n\n"]
-                                            # Show all products for stock queries, else show only 8 (limit for performance)
-                                            display_products = products if show_all_stock else products[:8]
-                                            for i, product in enumerate(display_products, 1):
-                                                stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
-                                                response_parts.append(
-                                                    f"{i}. {product['name']} - ${product['price']:.2f} ({stock_msg})\n"
-                                                )
-                                            if not show_all_stock and len(products) > 8:
-                                                response_parts.append(f"...and {len(products) - 8} more. Ask for 'all stock' to see everything.\n")
-                                            bot_response = "".join(response_parts)
-                                    else:
-                                        # Check if this was a filtered search (category + price)
-                                        # Get query from result metadata if available
-                                        query_text = result.get("query", "")
-                                        
-                                        # Check for category and price filter in query
-                                        has_category = False
-                                        has_price_filter = False
-                                        category_name = "products"
-                                        price_part = ""
-                                        
-                                        if query_text:
-                                            query_lower = query_text.lower()
-                                            # Check for categories
-                                            if 'laptop' in query_lower:
-                                                category_name = "laptops"
-                                                has_category = True
-                                            elif 'phone' in query_lower or 'iphone' in query_lower or 'samsung' in query_lower:
-                                                category_name = "phones"
-                                                has_category = True
-                                            elif 'book' in query_lower and 'notebook' not in query_lower and 'macbook' not in query_lower:
-                                                category_name = "books"
-                                                has_category = True
-                                            elif 'headphone' in query_lower or 'earbud' in query_lower:
-                                                category_name = "headphones"
-                                                has_category = True
-                                            elif 'gaming' in query_lower or 'console' in query_lower:
-                                                category_name = "gaming products"
-                                                has_category = True
-                                            
-                                            # Check for price filter
-                                            import re
-                                            price_match = re.search(r'under\s*\$?\s*(\d+(?:\.\d+)?)', query_lower)
-                                            if price_match:
-                                                has_price_filter = True
-                                                price_part = f" under ${price_match.group(1)}"
-                                            else:
-                                                price_match = re.search(r'below\s*\$?\s*(\d+(?:\.\d+)?)', query_lower)
-                                                if price_match:
-                                                    has_price_filter = True
-                                                    price_part = f" below ${price_match.group(1)}"
-                                        
-                                        # Provide specific error message if category and price filter detected
-                                        if has_category and has_price_filter:
-                                            bot_response = f"No {category_name} found{price_part}. Please try different filters or browse all {category_name}."
-                                        elif has_category:
-                                            bot_response = f"No {category_name} found. Please try different keywords or browse all {category_name}."
-                                        else:
-                                            bot_response = "I couldn't find that product. Could you try rephrasing your search?"
-                                else:
-                                    # Final fallback - check if there's any result field
-                                    bot_response = result.get("result", "I processed your request.")
-                            else:
-                                # Function returned failure - use error message
-                                bot_response = result.get("result", "I couldn't process that request. Please try again.")
-                        
-                        # If we have a response from function results, use it (skip slow LLM call for faster response)
-                        # BUT: If multiple function calls were made (multi-category query), aggregate all results
-                        # Check if result has grouped_by_category - if so, use the pre-formatted result directly
-                        has_grouped_category = any(r.get("grouped_by_category") for r in function_results if r.get("success") and r.get("result"))
-                        if has_grouped_category and len(function_results) == 1:
-                            # Single grouped result - use it directly without re-categorization
-                            bot_response = function_results[0].get("result")
-                            logger.info("Using pre-formatted grouped category result directly")
-                        elif bot_response and len(function_results) == 1:
-                            # Single result - use formatted response directly
-                            logger.info(f"Using formatted response from function results: {bot_response[:100]}...")
-                        elif function_results:
-                            # Multiple results or no response - aggregate all function results
-                            # With unified retrieval, we should rarely have multiple function calls for search
-                            # But handle it gracefully if it happens
-                            if bot_response and len(function_results) > 1:
-                                # Reset bot_response to trigger aggregation
-                                bot_response = None
-                                logger.info(f"Multiple function calls detected ({len(function_results)}), aggregating results...")
-                            
-                            # Simplified aggregation: rely on search engine's grouping
-                            # Only re-aggregate if we have multiple function calls without grouped results
-                            from collections import OrderedDict
-                            category_to_products = OrderedDict()
-                            product_ids_seen = set()
-                            
-                            # Unified category display mapping (used by search engine and here)
-                            category_display_map = {
-                                "Home & Garden": "🏠 Home & Garden",
-                                "home & garden": "🏠 Home & Garden",
-                                "Home and Garden": "🏠 Home & Garden",
-                                "home and garden": "🏠 Home & Garden",
-                                "Sports": "⚽ Sports",
-                                "sports": "⚽ Sports",
-                                "sport": "⚽ Sports",
-                                "Clothing": "👕 Clothing",
-                                "clothing": "👕 Clothing",
-                                "clothes": "👕 Clothing",
-                                "Books": "📚 Books",
-                                "books": "📚 Books",
-                                "book": "📚 Books",
-                                "Electronics": "⚡ Electronics",
-                                "electronics": "⚡ Electronics",
-                                "Computers": "💻 Laptops & Computers",
-                                "computers": "💻 Laptops & Computers",
-                                "Phones": "📱 Phones",
-                                "phones": "📱 Phones",
-                                "Audio": "🎧 Audio & Headphones",
-                                "audio": "🎧 Audio & Headphones",
-                                "Gaming": "🎮 Gaming",
-                                "gaming": "🎮 Gaming",
-                                "Wearables": "⌚ Wearables",
-                                "wearables": "⌚ Wearables"
-                            }
-                            
-                            for result in function_results:
-                                if not result.get("success"):
-                                    continue
-                                
-                                # If already grouped by category, use the grouping directly
-                                if result.get("grouped_by_category") and result.get("products"):
-                                    # Search engine already grouped these - use product's category field
-                                    for p in result["products"]:
-                                        pid = p.get("product_id")
-                                        if pid and pid in product_ids_seen:
-                                            continue
-                                        original_category = p.get("category", "")
-                                        # Map category to display name
-                                        label = category_display_map.get(original_category) or category_display_map.get(original_category.lower() if original_category else "") or "⚡ Electronics"
-                                        if label not in category_to_products:
-                                            category_to_products[label] = []
-                                        category_to_products[label].append(p)
-                                        if pid:
-                                            product_ids_seen.add(pid)
-                                    continue
-                                
-                                # If products list (not grouped), group by product's category field
-                                if result.get("products"):
-                                    products = result["products"]
-                                    if isinstance(products, list):
-                                        for p in products:
-                                            pid = p.get("product_id")
-                                            if pid and pid in product_ids_seen:
-                                                continue
-                                            original_category = p.get("category", "")
-                                            # Map category to display name
-                                            label = category_display_map.get(original_category) or category_display_map.get(original_category.lower() if original_category else "") or "⚡ Electronics"
-                                            if label not in category_to_products:
-                                                category_to_products[label] = []
-                                            category_to_products[label].append(p)
-                                            if pid:
-                                                product_ids_seen.add(pid)
-                                    continue
-                                
-                                # Non-product results (cart, orders, etc.)
-                                if result.get("result") and not result.get("products"):
-                                    if not hasattr(self, '_non_product_results'):
-                                        self._non_product_results = []
-                                    self._non_product_results.append(result.get("result"))
-                            
-                            # Now format the deduplicated response
-                            bot_response_parts = []
-                            
-                            # Add non-product results first (cart operations, orders, etc.)
-                            if hasattr(self, '_non_product_results') and self._non_product_results:
-                                bot_response_parts.extend(self._non_product_results)
-                                delattr(self, '_non_product_results')
-                            
-                            # Add product results
-                            # Only include categories that were requested in the query
-                            # Map query to extracted categories (normalized)
-                            requested_categories = []
-                            if hasattr(self, 'last_query') and self.last_query:
-                                from src.search import HybridSearch
-                                requested_categories = HybridSearch()._extract_categories(self.last_query)
-                            # Normalize category keys
-                            def normalize(cat):
-                                return cat.strip().replace(' ', '_').lower()
-                            # Map to display labels
-                            label_map = {
-                                'clothing': '👕 Clothing',
-                                'sports': '⚽ Sports',
-                                'home_garden': '🏠 Home & Garden',
-                                'books': '📚 Books',
-                                'phones': '📱 Phones',
-                                'computers': '💻 Laptops',
-                                'audio': '🎧 Audio & Headphones',
-                                'gaming': '🎮 Gaming',
-                                'wearables': '⌚ Wearables',
-                                'electronics': '⚡ Electronics'
-                            }
-                            # Only show requested categories, in order, with fallback for missing
-                            any_found = False
-                            for cat in requested_categories:
-                                norm_cat = normalize(cat)
-                                label = label_map.get(norm_cat, cat.capitalize())
-                                group_products = category_to_products.get(label, [])
-                                if not group_products:
-                                    # Try fallback: check for label with different case or spaces
-                                    alt_label = label_map.get(cat.lower(), cat.capitalize())
-                                    group_products = category_to_products.get(alt_label, [])
-                                if not group_products:
-                                    bot_response_parts.append(f"**{label}:**\nNo products found for this category.\n")
-                                    continue
-                                any_found = True
-                                if len(group_products) == 1:
-                                    product = group_products[0]
-                                    stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
-                                    header = f"**{label}:**\n"
-                                    bot_response_parts.append(
-                                        f"{header}The {product['name']} is priced at ${product['price']:.2f} and is currently {stock_msg}."
-                                    )
-                                else:
-                                    # Limit displayed products to ≤8 per category for better performance
-                                    display_limit = min(8, len(group_products))
-                                    header = f"**{label}:**\n"
-                                    response_parts = [header + f"I found {len(group_products)} product(s):\n\n"]
-                                    for i, product in enumerate(group_products[:display_limit], 1):
-                                        stock_msg = "in stock" if product['stock_status'] == "in_stock" else f"{product['stock_status']}"
-                                        response_parts.append(
-                                            f"{i}. {product['name']} - ${product['price']:.2f} ({stock_msg})\n"
-                                        )
-                                    if len(group_products) > display_limit:
-                                        response_parts.append(f"... and {len(group_products) - display_limit} more\n")
-                                    bot_response_parts.append("".join(response_parts))
-                            if not any_found:
-                                bot_response_parts.append("No products found for any of the requested categories. Please try different keywords.")
-                            
-                            bot_response = "\n\n".join(bot_response_parts) if bot_response_parts else None
-                            
-                            if not bot_response:
-                                logger.warning("No response from function results aggregation")
-                        
-                        # If we still don't have a response, try LLM call
-                        if not bot_response:
-                            # #region agent log
-                            fallback_start = time.time()
-                            try:
-                                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1294","message":"FALLBACK LLM call triggered","data":{"chat_history_length":len(self.chat_history)},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-                            except: pass
-                            # #endregion
-                            try:
-                                logger.info("Making API call to generate response...")
-                                # Fix: Use self.client instead of client, and use reduced context
-                                response = self.client.chat.completions.create(
-                                    model=os.getenv("OPENAI_MODEL", "openai/gpt-4o-mini"),
-                                    messages=messages[-3:],  # Use minimal context for fallback
-                                    temperature=0.7,
-                                    timeout=30.0
-                                )
-                                message = response.choices[0].message
-                                bot_response = message.content
-                                logger.info("LLM response generated successfully")
-                                
-                                # #region agent log
-                                fallback_end = time.time()
-                                fallback_duration = fallback_end - fallback_start
-                                try:
-                                    with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1305","message":"FALLBACK LLM call END","data":{"duration_ms":fallback_duration*1000},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-                                except: pass
-                                # #endregion
-                            except Exception as e:
-                                # #region agent log
-                                try:
-                                    with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1307","message":"FALLBACK LLM call ERROR","data":{"error":str(e)[:100]},"sessionId":"debug-session","runId":"run1","hypothesisId":"E"}) + '\n')
-                                except: pass
-                                # #endregion
-                                logger.error(f"Failed to generate LLM response: {str(e)}")
-                                bot_response = "I processed your request, but couldn't generate a response. Please try again."
-                        
-                        # Final fallback
-                        if not bot_response:
-                            bot_response = "I'm sorry, I couldn't process that request. Please try again."
-                            logger.warning("bot_response was None, using final fallback")
+                    if on_token is not None:
+                        message = self._stream_chat_completion(messages, tools, trace, on_token)
                     else:
-                        # No tool calls - use message content directly
-                        if message.content:
-                            bot_response = message.content
-                        else:
-                            bot_response = "I received your message but couldn't generate a response."
-                    
-                    # Ensure bot_response is always set before using it
-                    if not bot_response:
-                        bot_response = "I'm sorry, I couldn't process that request. Please try again."
-                    
-                    self.chat_history.append({"role": "assistant", "content": bot_response})
-                    trace.end(output={"response": bot_response[:200], "success": True})
-                    # Flush asynchronously to avoid blocking response
-                    self._flush_tracer_async()
-                    
-                    # #region agent log
-                    handle_end = time.time()
-                    total_duration = handle_end - handle_start
-                    try:
-                        with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps({"id":f"log_{int(time.time()*1000)}","timestamp":int(time.time()*1000),"location":"chatbot.py:1320","message":"handle_message END","data":{"total_duration_ms":total_duration*1000,"response_length":len(bot_response)},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-                    except: pass
-                    # #endregion
-                    
-                    logger.info(f"Returning response to user: {bot_response[:100] if len(bot_response) > 100 else bot_response}")
-                    return bot_response
-                    
+                        message = self._create_chat_completion(messages, tools, trace).choices[0].message
                 except Exception as e:
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        wait_time = 2 ** retry_count
-                        logger.warning(f"API call failed, retrying in {wait_time}s... ({retry_count}/{max_retries})")
-                        time.sleep(wait_time)
-                    else:
-                        logger.error(f"Failed to get response after {max_retries} attempts: {str(e)}", exc_info=True)
-                        trace.end(output={"error": str(e), "success": False})
-                        # Flush asynchronously to avoid blocking response
-                        self._flush_tracer_async()
-                        return "I'm sorry, I'm having trouble processing your request right now. Please try again in a moment."
+                    trace.end(output={"error": str(e), "success": False})
+                    self.tracer.mark_pending()
+                    return "I'm sorry, I'm having trouble processing your request right now. Please try again in a moment."
+                tool_calls, content = message.tool_calls, message.content
+                if tool_calls and plan_key and _plan_is_replayable(plan_key, tool_calls):
+                    self._store_tool_plan(plan_key, tool_calls, plan_embedding)
+            
+            bot_response = None  # Initialize early to prevent UnboundLocalError
+            
+            # Check for function calls
+            if tool_calls:
+                # Execute functions and format their results
+                bot_response = self._respond_to_tool_calls(tool_calls, messages, trace)
+            else:
+                # No tool calls - use message content directly
+                if content:
+                    bot_response = content
+                else:
+                    bot_response = "I received your message but couldn't generate a response."
+            
+            # Ensure bot_response is always set before using it
+            if not bot_response:
+                bot_response = "I'm sorry, I couldn't process that request. Please try again."
+            
+            self.chat_history.append({"role": "assistant", "content": bot_response})
+            trace.end(output={"response": bot_response[:200], "success": True})
+            self.tracer.mark_pending()
+            
+            handle_end = time.time()
+            total_duration = handle_end - handle_start
+            if AGENT_DEBUG:
+                agent_log("chatbot.py:1320", "handle_message END", {"total_duration_ms": total_duration * 1000, "response_length": len(bot_response)}, hypothesis_id="A")
+            
+            logger.info(f"Returning response to user: {bot_response[:100] if len(bot_response) > 100 else bot_response}")
+            return bot_response
             
         except Exception as e:
             logger.error(f"Error handling message: {str(e)}", exc_info=True)
             trace.end(output={"error": str(e), "success": False})
-            # Flush asynchronously to avoid blocking response
-            self._flush_tracer_async()
+            self.tracer.mark_pending()
             return "I encountered an error. Please try again."
     
+    def _prewarm_message_embeddings(self, messages: List[str]) -> None:
+        """
+        Embed queued messages in one batched call for the semantic tool-plan lookup.
+        
+        Only does work when the semantic cache is enabled, since that lookup is
+        the only place user messages are embedded.
+        
+        Args:
+            messages: Messages about to be handled one by one
+        """
+        if get_semantic_cache() is None:
+            return
+        plan_keys = [key for key in map(_tool_plan_key, messages) if key is not None]
+        if plan_keys:
+            self.rag_agent.prewarm_query_embeddings(plan_keys)
+    
+    def _prewarm_follow_ups(self, product_names: List[str]) -> None:
+        """
+        Resolve and price recently shown products ahead of a likely follow-up.
+        
+        "Add the X to cart", "buy it" and checkout then hit the product
+        caches instead of scanning the catalog and reading metadata.
+        
+        Args:
+            product_names: Names of the products just shown to the user
+        """
+        try:
+            for name in product_names:
+                self._resolve_product_name(name)
+                self.order_agent.get_product_price(name)
+        except Exception as e:
+            logger.debug(f"Follow-up prewarm failed (non-critical): {e}")
+    
+    def warmup(self) -> None:
+        """Load search indexes and caches up front so the first message isn't slowed by cold starts."""
+        self.rag_agent.warmup()
+    
+    def handle_message_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Handle user message, yielding the response in pieces as it is produced.
+        
+        The model's text reply is yielded token by token while it streams;
+        replies built from function results arrive as a single piece.
+        
+        Args:
+            user_input: User's message
+        
+        Yields:
+            Response text pieces; together they form the text to display
+        """
+        pieces: "queue.Queue[Optional[str]]" = queue.Queue()
+        result: List[str] = []
+        
+        def worker():
+            try:
+                result.append(self.handle_message(user_input, on_token=pieces.put))
+            finally:
+                pieces.put(None)
+        
+        threading.Thread(target=worker, name="chat-stream", daemon=True).start()
+        
+        streamed = []
+        while (piece := pieces.get()) is not None:
+            streamed.append(piece)
+            yield piece
+        
+        response = result[0] if result else "I encountered an error. Please try again."
+        streamed_text = "".join(streamed)
+        if not streamed_text:
+            yield response
+        elif response.startswith(streamed_text):
+            if len(response) > len(streamed_text):
+                yield response[len(streamed_text):]
+        else:
+            # The streamed text was replaced by a reply built from function results
+            yield f"\n{response}"
+    
+    async def handle_message_async(self, user_input: str) -> str:
+        """
+        Handle user message without blocking the event loop.
+        
+        The turn runs on a worker thread, so an async frontend keeps serving
+        other sessions while the model and database calls are in flight.
+        
+        Args:
+            user_input: User's message
+        
+        Returns:
+            Bot's response
+        """
+        return await asyncio.to_thread(self.handle_message, user_input)
+    
+    async def handle_message_stream_async(self, user_input: str) -> AsyncIterator[str]:
+        """
+        Async counterpart of handle_message_stream.
+        
+        Args:
+            user_input: User's message
+        
+        Yields:
+            Response text pieces as they are produced
+        """
+        stream = self.handle_message_stream(user_input)
+        done = object()
+        while (piece := await asyncio.to_thread(next, stream, done)) is not done:
+            yield piece
+    
     def run(self):
         """Run interactive chatbot."""
-        print("=" * 60)
-        print("Welcome to the E-commerce Chatbot!")
-        print("Ask me about products, prices, or place an order.")
-        print("Type 'quit' or 'exit' to end the conversation.")
-        print("=" * 60)
-        print()
+        out = sys.stdout
+        # Streamed tokens are flushed one by one only when someone is watching
+        interactive = out.isatty()
+        rule = "=" * 60
+        out.write(
+            f"{rule}\n"
+            "Welcome to the E-commerce Chatbot!\n"
+            "Ask me about products, prices, or place an order.\n"
+            "Type 'quit' or 'exit' to end the conversation.\n"
+            f"{rule}\n\n"
+        )
+        
+        # Lines pasted together with the last input, answered in order
+        pasted: Deque[str] = deque()
+        speculation = None
         
         while True:
             try:
-                user_input = input("You: ").strip()
+                if pasted:
+                    user_input = pasted.popleft()
+                else:
+                    user_input = input("You: ").strip()
+                    # Stale if it hasn't started yet; the new message takes priority
+                    if speculation is not None:
+                        speculation.cancel()
+                    pasted.extend(_read_pasted_lines())
+                    if pasted:
+                        self._prewarm_message_embeddings([user_input, *pasted])
                 
                 if user_input.lower() in ['quit', 'exit', 'q']:
                     break
@@ -1650,32 +2264,56 @@ Always use exact prices from search results."""
                 if not user_input:
                     continue
                 
-                response = self.handle_message(user_input)
-                print(f"Bot: {response}\n")
+                out.write("Bot: ")
+                for piece in self.handle_message_stream(user_input):
+                    out.write(piece)
+                    if interactive:
+                        out.flush()
+                out.write("\n\n")
+                out.flush()
+                
+                # Use the time the user spends reading to prepare for a follow-up
+                shown = [product.get("name") for product in islice(reversed(self.browsed_products), 3)]
+                shown = [name for name in shown if name]
+                if shown:
+                    speculation = self._speculation_pool.submit(self._prewarm_follow_ups, shown)
                 
             except KeyboardInterrupt:
-                print("\n\nGoodbye!")
+                out.write("\n\nGoodbye!\n")
+                out.flush()
                 break
             except Exception as e:
                 logger.error(f"Error in main loop: {str(e)}", exc_info=True)
-                print("I encountered an error. Please try again.\n")
+                out.write("I encountered an error. Please try again.\n\n")
+                out.flush()
+        
+        # Send any trace events still pending from the last turns
+        self.tracer.flush()
+        
+        # Let the next session start with this one's query embeddings
+        self.rag_agent.save_embedding_cache()
+        
+        # How often repeated messages skipped the model's tool-choice call
+        logger.info(f"Tool plan cache stats: {self.tool_plan_cache.stats()}")
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            logger.info(f"Semantic cache stats: {semantic_cache.stats()}")
         
         # Exit summary
         if self.order_count > 0:
-            print(f"\n{'='*60}")
-            print(f"You placed {self.order_count} order(s). Thank you!")
-            print(f"{'='*60}\n")
+            out.write(f"\n{rule}\nYou placed {self.order_count} order(s). Thank you!\n{rule}\n\n")
         else:
-            print("\nThank you for using the E-commerce Chatbot!\n")
+            out.write("\nThank you for using the E-commerce Chatbot!\n\n")
+        out.flush()
 
 
 if __name__ == "__main__":
     """Run chatbot."""
     import argparse
-    from dotenv import load_dotenv
+    from src.utils import load_env
     
     # Load environment variables
-    load_dotenv()
+    load_env()
     
     parser = argparse.ArgumentParser(description="E-commerce Chatbot")
     parser.add_argument(
@@ -1698,6 +2336,7 @@ if __name__ == "__main__":
             db_path=args.db_path,
             vector_store_path=args.vector_store
         )
+        chatbot.warmup()
         chatbot.run()
     except Exception as e:
         print(f"Error starting chatbot: {str(e)}")
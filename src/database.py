@@ -1,14 +1,19 @@
 """Database operations with error handling and security."""
 
+import json
 import os
 import re
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, text
+from sqlalchemy import create_engine, event, Column, String, Integer, Float, DateTime, text
 from sqlalchemy.exc import OperationalError, DatabaseError
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 from src.logger import get_logger
@@ -20,9 +25,8 @@ logger = get_logger()
 Base = declarative_base()
 
 
-class Order(Base):
-    """SQLAlchemy model for orders table."""
-    __tablename__ = "orders"
+class OrderColumnsMixin:
+    """Columns shared by confirmed and pending orders."""
     
     order_id = Column(String, primary_key=True)
     product_name = Column(String, nullable=False)
@@ -34,21 +38,119 @@ class Order(Base):
     timestamp = Column(DateTime, nullable=False)
 
 
+class Order(OrderColumnsMixin, Base):
+    """SQLAlchemy model for orders table."""
+    __tablename__ = "orders"
+
+
+class PendingOrder(OrderColumnsMixin, Base):
+    """SQLAlchemy model for orders staged while awaiting user confirmation."""
+    __tablename__ = "pending_orders"
+
+
+class ProductRecord(Base):
+    """SQLAlchemy model for the products lookup table (price and stock by name)."""
+    __tablename__ = "products"
+    
+    name = Column(String, primary_key=True)
+    product_id = Column(String, nullable=False)
+    price = Column(Float, nullable=False)
+    category = Column(String, nullable=True)
+    stock_status = Column(String, nullable=False)
+
+
+# Connections kept open per database (SQLite connections are cheap to hold,
+# costly to open: connect + PRAGMAs on every checkout otherwise)
+POOL_SIZE = 8
+POOL_MAX_OVERFLOW = 8
+
+# Engines and session factories keyed by resolved database path
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[str, sessionmaker] = {}
+# SQLite allows one writer at a time; writers in this process queue on this
+# lock instead of polling SQLite's busy handler, while readers never wait
+_write_locks: Dict[str, threading.RLock] = {}
+_engines_lock = threading.Lock()
+# Resolved paths whose schema init_database has already created in this process
+_initialized_paths: set = set()
+
+# Staged orders older than this were abandoned (e.g. the process died before
+# the user confirmed) and are deleted at startup and when new orders are staged
+PENDING_ORDER_TTL_MINUTES = 30
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Configure each new pooled connection.
+    
+    WAL lets readers run alongside the writer and makes commits fsync less
+    often; the larger page cache (64 MB) and in-memory temp storage stay
+    warm for as long as the pooled connection lives.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def get_engine(db_path: str = "./orders.db") -> Engine:
+    """
+    Get the shared engine for a database path.
+    
+    The engine and its connection pool are created once per path, so
+    orders, pending orders and product lookups reuse open SQLite
+    connections instead of reconnecting on every call.
+    
+    Args:
+        db_path: Path to database file
+    
+    Returns:
+        SQLAlchemy engine
+    """
+    key = str(Path(db_path).resolve())
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                f"sqlite:///{db_path}",
+                echo=False,
+                connect_args={"check_same_thread": False},
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_MAX_OVERFLOW
+            )
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+            _engines[key] = engine
+            _session_factories[key] = sessionmaker(bind=engine)
+            _write_locks[key] = threading.RLock()
+            logger.debug(f"Created database engine for {db_path}")
+        return engine
 
 
 @contextmanager
-def get_db_session(db_path: str):
+def get_db_session(db_path: str, write: bool = True):
     """
     Context manager for database sessions with error handling.
     
     Args:
         db_path: Path to database file
+        write: Whether the session writes; write sessions for the same
+            database run one at a time, read-only sessions run concurrently
     
     Yields:
         Database session
     """
-    engine = create_engine(f"sqlite:///{db_path}", echo=False)
-    SessionLocal = sessionmaker(bind=engine)
+    get_engine(db_path)
+    key = str(Path(db_path).resolve())
+    SessionLocal = _session_factories[key]
+    write_lock = _write_locks[key] if write else None
+    if write_lock is not None:
+        write_lock.acquire()
     session = SessionLocal()
     try:
         yield session
@@ -59,23 +161,33 @@ def get_db_session(db_path: str):
         raise
     finally:
         session.close()
+        if write_lock is not None:
+            write_lock.release()
 
 
 def init_database(db_path: str = "./orders.db") -> None:
     """
     Initialize database and create tables if they don't exist.
     
+    Runs once per database path per process; later calls (e.g. from each
+    new chatbot instance) return without probing the schema again.
+    
     Args:
         db_path: Path to database file
     """
+    key = str(Path(db_path).resolve())
+    if key in _initialized_paths:
+        return
+    
     try:
         # Create directory if it doesn't exist
         db_dir = Path(db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
         
-        engine = create_engine(f"sqlite:///{db_path}", echo=False)
-        Base.metadata.create_all(engine)
+        Base.metadata.create_all(get_engine(db_path))
+        _initialized_paths.add(key)
         logger.info(f"Database initialized at {db_path}")
+        purge_stale_pending_orders(db_path)
     except OperationalError as e:
         logger.error(f"Database initialization error: {str(e)}", exc_info=True)
         raise
@@ -84,6 +196,28 @@ def init_database(db_path: str = "./orders.db") -> None:
         raise
 
 
+def _order_row(order: OrderModel) -> Dict:
+    """
+    Build sanitized column values for an order row.
+    
+    Args:
+        order: OrderModel instance
+    
+    Returns:
+        Dictionary of column values
+    """
+    return {
+        "order_id": order.order_id,
+        "product_name": sanitize_input(order.product_name, max_length=200),
+        "quantity": order.quantity,
+        "unit_price": order.unit_price,
+        "total_price": order.total_price,
+        "customer_name": sanitize_input(order.customer_name, max_length=100) if order.customer_name else None,
+        "customer_email": order.customer_email if (order.customer_email and validate_email(order.customer_email)) else None,
+        "timestamp": order.timestamp
+    }
+
+
 def create_order(order: OrderModel, db_path: str = "./orders.db") -> str:
     """
     Create a new order in the database with error handling.
@@ -103,22 +237,8 @@ def create_order(order: OrderModel, db_path: str = "./orders.db") -> str:
     
     while retry_count < max_retries:
         try:
-            # Sanitize inputs
-            sanitized_product_name = sanitize_input(order.product_name, max_length=200)
-            sanitized_customer_name = sanitize_input(order.customer_name, max_length=100) if order.customer_name else None
-            sanitized_customer_email = order.customer_email if (order.customer_email and validate_email(order.customer_email)) else None
-            
             with get_db_session(db_path) as session:
-                db_order = Order(
-                    order_id=order.order_id,
-                    product_name=sanitized_product_name,
-                    quantity=order.quantity,
-                    unit_price=order.unit_price,
-                    total_price=order.total_price,
-                    customer_name=sanitized_customer_name,
-                    customer_email=sanitized_customer_email,
-                    timestamp=order.timestamp
-                )
+                db_order = Order(**_order_row(order))
                 session.add(db_order)
                 session.commit()
                 
@@ -131,7 +251,6 @@ def create_order(order: OrderModel, db_path: str = "./orders.db") -> str:
                 retry_count += 1
                 if retry_count < max_retries:
                     logger.warning(f"Database locked, retrying ({retry_count}/{max_retries})...")
-                    import time
                     time.sleep(0.5 * retry_count)  # Exponential backoff
                     continue
                 else:
@@ -153,6 +272,208 @@ def create_order(order: OrderModel, db_path: str = "./orders.db") -> str:
     raise DatabaseError("Failed to create order after multiple attempts.")
 
 
+def create_orders(orders: List[OrderModel], db_path: str = "./orders.db") -> List[str]:
+    """
+    Create several orders in one transaction with a single batched INSERT.
+    
+    Args:
+        orders: OrderModel instances
+        db_path: Path to database file
+    
+    Returns:
+        Order IDs, in the same order as the input
+    
+    Raises:
+        DatabaseError: If the batch cannot be written; no order is saved then
+    """
+    if not orders:
+        return []
+    
+    rows = [_order_row(order) for order in orders]
+    insert_orders = Order.__table__.insert()
+    max_retries = 3
+    retry_count = 0
+    
+    while retry_count < max_retries:
+        try:
+            # One executemany and one commit for the whole batch
+            with get_db_session(db_path) as session:
+                session.execute(insert_orders, rows)
+            
+            order_ids = [row["order_id"] for row in rows]
+            logger.info(f"Orders created successfully: {', '.join(order_ids)}")
+            return order_ids
+            
+        except OperationalError as e:
+            error_msg = str(e).lower()
+            if "locked" in error_msg:
+                retry_count += 1
+                if retry_count < max_retries:
+                    logger.warning(f"Database locked, retrying ({retry_count}/{max_retries})...")
+                    time.sleep(0.5 * retry_count)
+                    continue
+                logger.error("Database locked after multiple retries")
+                raise DatabaseError("Database is currently locked. Please try again later.")
+            elif "disk" in error_msg or "full" in error_msg:
+                logger.error("Disk full error")
+                raise DatabaseError("Insufficient disk space. Please contact support.")
+            else:
+                logger.error(f"Database operational error: {str(e)}", exc_info=True)
+                raise DatabaseError("An error occurred while creating the orders. Please try again.")
+        except DatabaseError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error creating orders: {str(e)}", exc_info=True)
+            raise DatabaseError("An unexpected error occurred. Please try again.")
+    
+    raise DatabaseError("Failed to create orders after multiple attempts.")
+
+
+def _delete_stale_pending_orders(session: Session) -> int:
+    """Delete pending orders older than PENDING_ORDER_TTL_MINUTES (caller commits)."""
+    cutoff = datetime.now() - timedelta(minutes=PENDING_ORDER_TTL_MINUTES)
+    return session.query(PendingOrder).filter(PendingOrder.timestamp < cutoff).delete(synchronize_session=False)
+
+
+def purge_stale_pending_orders(db_path: str = "./orders.db") -> int:
+    """
+    Delete abandoned pending orders left behind by earlier runs.
+    
+    Args:
+        db_path: Path to database file
+    
+    Returns:
+        Number of pending orders deleted
+    """
+    try:
+        with get_db_session(db_path) as session:
+            removed = _delete_stale_pending_orders(session)
+        if removed:
+            logger.info(f"Removed {removed} stale pending orders")
+        return removed
+    except Exception as e:
+        logger.error(f"Error removing stale pending orders: {str(e)}", exc_info=True)
+        return 0
+
+
+def create_pending_order(
+    order: OrderModel,
+    db_path: str = "./orders.db"
+) -> Tuple[str, Callable[[], str], Callable[[], None]]:
+    """
+    Stage an order in the pending_orders table while the user confirms it.
+    
+    Pending orders older than PENDING_ORDER_TTL_MINUTES are deleted in the
+    same transaction, so rows abandoned by a crashed process don't pile up.
+    
+    Args:
+        order: OrderModel instance
+        db_path: Path to database file
+    
+    Returns:
+        Tuple of (order_id, commit_fn, rollback_fn). commit_fn moves the row
+        into orders and returns the order ID; rollback_fn discards it.
+    """
+    row = _order_row(order)
+    with get_db_session(db_path) as session:
+        _delete_stale_pending_orders(session)
+        session.add(PendingOrder(**row))
+    logger.debug(f"Staged pending order: {order.order_id}")
+    
+    def commit_pending() -> str:
+        with get_db_session(db_path) as session:
+            pending = session.get(PendingOrder, order.order_id)
+            if pending is None:
+                # Staged row is gone (e.g. cleaned up); write the order directly
+                logger.warning(f"Pending order {order.order_id} not found, creating directly")
+            else:
+                session.add(Order(**{column: getattr(pending, column) for column in row}))
+                session.delete(pending)
+        if pending is None:
+            return create_order(order, db_path)
+        logger.info(f"Order created successfully: {order.order_id}")
+        return order.order_id
+    
+    def rollback_pending() -> None:
+        with get_db_session(db_path) as session:
+            session.query(PendingOrder).filter(PendingOrder.order_id == order.order_id).delete()
+        logger.debug(f"Discarded pending order: {order.order_id}")
+    
+    return order.order_id, commit_pending, rollback_pending
+
+
+def sync_products_table(products: List[Dict], db_path: str = "./orders.db") -> int:
+    """
+    Insert or update product price and stock rows from catalog data.
+    
+    Args:
+        products: Product dictionaries (as in products.json)
+        db_path: Path to database file
+    
+    Returns:
+        Number of products written
+    """
+    with get_db_session(db_path) as session:
+        for product in products:
+            session.merge(ProductRecord(
+                name=product["name"],
+                product_id=product["product_id"],
+                price=float(product["price"]),
+                category=product.get("category"),
+                stock_status=product.get("stock_status", "in_stock")
+            ))
+    logger.info(f"Synced {len(products)} products to products table")
+    return len(products)
+
+
+def seed_products_table(db_path: str = "./orders.db", products_path: str = "./data/products.json") -> None:
+    """
+    Populate the products table from the catalog file if it is empty.
+    
+    Args:
+        db_path: Path to database file
+        products_path: Path to products JSON file
+    """
+    try:
+        with get_db_session(db_path, write=False) as session:
+            if session.query(ProductRecord.name).first() is not None:
+                return
+        
+        products_file = Path(products_path)
+        if not products_file.exists():
+            logger.warning(f"Products file not found, products table left empty: {products_path}")
+            return
+        
+        with open(products_file, 'r', encoding='utf-8') as f:
+            products = json.load(f)
+        sync_products_table(products, db_path)
+    except Exception as e:
+        logger.error(f"Error seeding products table: {str(e)}", exc_info=True)
+
+
+def get_product_meta(product_name: str, db_path: str = "./orders.db") -> Optional[Dict]:
+    """
+    Look up price and stock status for a product by exact name.
+    
+    Args:
+        product_name: Name of the product
+        db_path: Path to database file
+    
+    Returns:
+        Dict with 'price' and 'stock_status', or None if not found
+    """
+    try:
+        with get_db_session(db_path, write=False) as session:
+            record = session.get(ProductRecord, product_name)
+            if record is None:
+                return None
+            return {"price": record.price, "stock_status": record.stock_status}
+    except Exception as e:
+        logger.error(f"Error reading product metadata for {product_name}: {str(e)}", exc_info=True)
+        return None
+
+
 def get_order_by_id(order_id: str, db_path: str = "./orders.db") -> Optional[Dict]:
     """
     Retrieve order by order ID.
@@ -165,7 +486,7 @@ def get_order_by_id(order_id: str, db_path: str = "./orders.db") -> Optional[Dic
         Order dictionary or None if not found
     """
     try:
-        with get_db_session(db_path) as session:
+        with get_db_session(db_path, write=False) as session:
             order = session.query(Order).filter(Order.order_id == order_id).first()
             if order:
                 return {
@@ -195,7 +516,7 @@ def get_all_orders(db_path: str = "./orders.db") -> List[Dict]:
         List of order dictionaries
     """
     try:
-        with get_db_session(db_path) as session:
+        with get_db_session(db_path, write=False) as session:
             orders = session.query(Order).all()
             return [
                 {
@@ -213,45 +534,3 @@ def get_all_orders(db_path: str = "./orders.db") -> List[Dict]:
     except Exception as e:
         logger.error(f"Error retrieving all orders: {str(e)}", exc_info=True)
         return []
-
-
-def check_stock(product_name: str, vector_store_path: str = "./vector_store") -> str:
-    """
-    Check stock status for a product from vector store metadata.
-    
-    Args:
-        product_name: Name of the product
-        vector_store_path: Path to vector store
-    
-    Returns:
-        Stock status: "in_stock", "low_stock", or "out_of_stock"
-    """
-    try:
-        import chromadb
-        from chromadb.config import Settings
-        
-        # Load vector store
-        client = chromadb.PersistentClient(
-            path=vector_store_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        collection = client.get_collection("products")
-        
-        # Search for product
-        results = collection.get(
-            where={"name": product_name},
-            limit=1
-        )
-        
-        if results and results['metadatas'] and len(results['metadatas']) > 0:
-            stock_status = results['metadatas'][0].get('stock_status', 'in_stock')
-            return stock_status
-        else:
-            logger.warning(f"Product not found in vector store: {product_name}")
-            return "out_of_stock"
-            
-    except Exception as e:
-        logger.error(f"Error checking stock for {product_name}: {str(e)}", exc_info=True)
-        # Default to out_of_stock on error for safety
-        return "out_of_stock"
-
@@ -0,0 +1,105 @@
+"""Opt-in structured debug events (NDJSON), written off the request path."""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Debug events are only recorded when AGENT_DEBUG=1
+AGENT_DEBUG = os.getenv("AGENT_DEBUG") == "1"
+DEBUG_LOG_PATH = os.getenv("AGENT_DEBUG_LOG", os.path.join("logs", "agent_debug.log"))
+
+# Seconds between batched writes, and the most events held before dropping
+FLUSH_INTERVAL = 0.25
+MAX_PENDING_EVENTS = 10000
+
+_events: "queue.Queue[str]" = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+_fd: Optional[int] = None
+_flush_lock = threading.Lock()
+
+
+def agent_log(
+    location: str,
+    message: str,
+    data: Dict[str, Any],
+    hypothesis_id: str,
+    run_id: str = "run1",
+    log_id: Optional[str] = None
+) -> None:
+    """
+    Queue a debug event for the background writer.
+
+    Call sites check AGENT_DEBUG first so nothing is built when disabled.
+    Events are dropped rather than blocking if the writer falls behind.
+
+    Args:
+        location: Source location (e.g. 'rag_agent.py:90')
+        message: Event description
+        data: Event payload
+        hypothesis_id: Debugging hypothesis the event belongs to
+        run_id: Debugging run identifier
+        log_id: Event ID (defaults to one derived from the timestamp)
+    """
+    timestamp = int(time.time() * 1000)
+    event = {
+        "id": log_id or f"log_{timestamp}",
+        "timestamp": timestamp,
+        "location": location,
+        "message": message,
+        "data": data,
+        "sessionId": "debug-session",
+        "runId": run_id,
+        "hypothesisId": hypothesis_id
+    }
+    try:
+        _events.put_nowait(json.dumps(event, default=str) + "\n")
+    except queue.Full:
+        return
+    _ensure_writer()
+
+
+def _ensure_writer() -> None:
+    """Start the background writer on first use."""
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="agent-debug-log", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def _run_writer() -> None:
+    """Write queued events in batches every FLUSH_INTERVAL seconds."""
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def flush() -> None:
+    """Write all queued events with a single write call."""
+    global _fd
+    with _flush_lock:
+        lines = []
+        while True:
+            try:
+                lines.append(_events.get_nowait())
+            except queue.Empty:
+                break
+        if not lines:
+            return
+        try:
+            if _fd is None:
+                Path(DEBUG_LOG_PATH).parent.mkdir(parents=True, exist_ok=True)
+                _fd = os.open(DEBUG_LOG_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.write(_fd, "".join(lines).encode("utf-8"))
+        except OSError:
+            # Debug output must never break the chatbot
+            pass
@@ -0,0 +1,190 @@
+"""Micro-batched query embeddings for concurrent searches."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from openai import OpenAI
+
+from src.logger import get_logger
+from src.utils import backoff_delay, is_retryable_error
+
+logger = get_logger()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent embedding requests into batched API calls.
+
+    Callers block on embed() while a background worker collects requests
+    for a short window and sends them as one embeddings.create call, so
+    concurrent searches share one HTTP round trip instead of one each.
+    Batches are sent (and retried) on a small pool, so the collector keeps
+    batching new requests while an earlier batch is slow or backing off.
+    """
+
+    # Batches in flight at once, across every batcher in the process
+    _send_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embedding-send")
+
+    def __init__(
+        self,
+        client: OpenAI,
+        model: str,
+        batch_window: float = 0.02,
+        max_batch_size: int = 16,
+        max_retries: int = 3
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            client: OpenAI client
+            model: Embedding model name
+            batch_window: Seconds to wait for more requests after the first
+            max_batch_size: Maximum number of inputs per API call
+            max_retries: Maximum attempts per batch
+        """
+        self.client = client
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Get the embedding for one text, batched with concurrent callers.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector
+
+        Raises:
+            Exception: The API error if the batch failed after retries
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Get embeddings for several texts, queued together so they share batches.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embedding vectors in input order
+
+        Raises:
+            Exception: The API error if a batch failed after retries
+        """
+        self._ensure_worker()
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def _ensure_worker(self) -> None:
+        """Start the background worker on first use."""
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Collect requests into batches and hand each one to the send pool."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical texts in one batch are embedded once
+            waiters: Dict[str, List[Future]] = {}
+            for text, future in batch:
+                waiters.setdefault(text, []).append(future)
+            self._send_executor.submit(self._send_batch, waiters)
+
+    def _send_batch(self, waiters: Dict[str, List[Future]]) -> None:
+        """
+        Embed one batch and resolve its futures.
+
+        Args:
+            waiters: Futures waiting on each distinct text in the batch
+        """
+        texts = list(waiters)
+        try:
+            embeddings = self._create_embeddings(texts)
+        except Exception as e:
+            for futures in waiters.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for text, embedding in zip(texts, embeddings):
+            for future in waiters[text]:
+                future.set_result(embedding)
+
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts with retries.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embedding vectors in input order
+        """
+        retry_count = 0
+        while True:
+            try:
+                response = self.client.embeddings.create(model=self.model, input=texts)
+                if len(texts) > 1:
+                    logger.debug(f"Embedded {len(texts)} queries in one request")
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                retry_count += 1
+                if retry_count < self.max_retries and is_retryable_error(e):
+                    wait_time = backoff_delay(retry_count)
+                    logger.warning(f"Embedding generation failed, retrying in {wait_time:.2f}s...")
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"Failed to generate query embedding: {str(e)}", exc_info=True)
+                    raise
+
+
+@lru_cache(maxsize=8)
+def get_embedding_batcher(client: OpenAI, model: str) -> EmbeddingBatcher:
+    """
+    Get the shared batcher for a client and embedding model.
+
+    Every RAG agent in the process (one per chatbot session) shares it, so
+    concurrent sessions' queries are batched together by one collector thread.
+
+    Args:
+        client: OpenAI client (shared clients come from get_openai_client)
+        model: Embedding model name
+
+    Returns:
+        EmbeddingBatcher for the pair
+    """
+    return EmbeddingBatcher(client, model, max_retries=3)
@@ -8,13 +8,14 @@ from typing import List, Dict, Optional
 
 import chromadb
 from chromadb.config import Settings
-from dotenv import load_dotenv
 from openai import OpenAI
 
+from src.database import init_database, sync_products_table
 from src.logger import get_logger
+from src.utils import backoff_delay, is_retryable_error, load_env
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 # Initialize logger with error handling
 try:
@@ -94,12 +95,12 @@ def generate_embeddings_batch(
                 break
             except Exception as e:
                 retry_count += 1
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # Exponential backoff
-                    logger.warning(f"Embedding generation failed, retrying in {wait_time}s... ({retry_count}/{max_retries})")
+                if retry_count < max_retries and is_retryable_error(e):
+                    wait_time = backoff_delay(retry_count)  # Jittered exponential backoff
+                    logger.warning(f"Embedding generation failed, retrying in {wait_time:.2f}s... ({retry_count}/{max_retries})")
                     time.sleep(wait_time)
                 else:
-                    logger.error(f"Failed to generate embeddings after {max_retries} attempts: {str(e)}", exc_info=True)
+                    logger.error(f"Failed to generate embeddings after {retry_count} attempts: {str(e)}", exc_info=True)
                     raise
     
     return all_embeddings
@@ -109,7 +110,8 @@ def initialize_vector_store(
     products_path: str = "./data/products.json",
     vector_store_path: str = "./vector_store",
     embedding_model: Optional[str] = None,
-    batch_size: int = 50
+    batch_size: int = 50,
+    db_path: str = "./orders.db"
 ) -> None:
     """
     Initialize vector store with product embeddings and metadata.
@@ -119,6 +121,7 @@ def initialize_vector_store(
         vector_store_path: Path to vector store directory
         embedding_model: OpenAI embedding model name
         batch_size: Batch size for embedding generation
+        db_path: Path to database file holding the products lookup table
     """
     try:
         # Load products
@@ -218,6 +221,10 @@ def initialize_vector_store(
         
         logger.info(f"Successfully initialized vector store with {len(products)} products at {vector_store_path}")
         
+        # Keep the products lookup table (price/stock by name) in sync
+        init_database(db_path)
+        sync_products_table(products, db_path)
+        
     except Exception as e:
         logger.error(f"Error initializing vector store: {str(e)}", exc_info=True)
         raise
@@ -254,6 +261,12 @@ if __name__ == "__main__":
         default=50,
         help="Batch size for embedding generation"
     )
+    parser.add_argument(
+        "--db-path",
+        type=str,
+        default="./orders.db",
+        help="Path to database file for the products lookup table"
+    )
     
     args = parser.parse_args()
     
@@ -262,7 +275,8 @@ if __name__ == "__main__":
             products_path=args.products,
             vector_store_path=args.vector_store,
             embedding_model=args.model,
-            batch_size=args.batch_size
+            batch_size=args.batch_size,
+            db_path=args.db_path
         )
         print("Vector store initialized successfully!")
     except Exception as e:
@@ -0,0 +1,281 @@
+"""Prebuilt lookup structures for keyword search over products.json."""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.catalog import load_products
+from src.logger import get_logger
+
+logger = get_logger()
+
+# pyahocorasick is optional; it finds every vocabulary term in one pass per product
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Query term -> related terms used to expand keyword searches
+KEYWORD_SYNONYMS: Dict[str, List[str]] = {
+    'laptop': ['laptop', 'macbook', 'dell', 'notebook', 'xps', 'portable'],
+    'phone': ['phone', 'iphone', 'samsung', 'galaxy', 'smartphone', 'mobile'],
+    'headphones': ['headphones', 'headphone', 'earbuds', 'airpods', 'earphones', 'headset', 'wh-1000'],
+    'watch': ['watch', 'smartwatch', 'apple watch', 'fitness'],
+    'tablet': ['tablet', 'ipad', 'surface'],
+    'computer': ['computer', 'laptop', 'macbook', 'desktop', 'pc'],
+    'monitor': ['monitor', 'display', 'screen', 'lg'],
+    'keyboard': ['keyboard', 'logitech', 'mechanical'],
+    'mouse': ['mouse', 'logitech'],
+}
+
+# Terms whose match scores are precomputed when an index is built
+SYNONYM_VOCABULARY = frozenset(KEYWORD_SYNONYMS).union(*KEYWORD_SYNONYMS.values())
+
+# Most recently used non-vocabulary keywords whose match scores stay cached
+MAX_CACHED_KEYWORDS = 1024
+
+# Bit assigned to each category filter in a product's category tags
+CATEGORY_BITS: Dict[str, int] = {
+    'phones': 1 << 0,
+    'computers': 1 << 1,
+    'audio': 1 << 2,
+    'gaming': 1 << 3,
+    'books': 1 << 4,
+    'wearables': 1 << 5,
+    'electronics': 1 << 6,
+}
+
+
+def _category_match(category_filter: str, name: str, desc: str, category: str) -> bool:
+    """
+    Check whether a product belongs to a category filter.
+
+    Args:
+        category_filter: Category filter (e.g. 'phones', 'books')
+        name: Lowercased product name
+        desc: Lowercased product description
+        category: Lowercased product category
+
+    Returns:
+        True if the product matches the category
+    """
+    if category_filter == 'phones':
+        phone_keywords = ['iphone', 'samsung', 'galaxy', 'smartphone', 'mobile phone', 'cell phone']
+        exclude_keywords = ['headphone', 'earbud', 'airpod', 'speaker']
+        if any(kw in name or kw in desc for kw in exclude_keywords):
+            return False
+        return any(kw in name or kw in desc for kw in phone_keywords) or 'phone' in name
+    elif category_filter == 'computers':
+        computer_keywords = ['laptop', 'macbook', 'computer', 'pc', 'desktop', 'xps', 'notebook']
+        return any(kw in name or kw in desc for kw in computer_keywords)
+    elif category_filter == 'audio':
+        audio_keywords = ['headphone', 'earbud', 'speaker', 'airpod', 'audio', 'sound']
+        return any(kw in name or kw in desc for kw in audio_keywords)
+    elif category_filter == 'gaming':
+        gaming_keywords = ['playstation', 'xbox', 'nintendo', 'console', 'controller', 'switch', 'ps5']
+        if any(exclude in name or exclude in desc for exclude in ['laptop', 'macbook', 'computer', 'xps', 'dell']):
+            return False
+        return any(kw in name or kw in desc for kw in gaming_keywords)
+    elif category_filter == 'books':
+        if 'book' in category:
+            return True
+        book_keywords = ['book', 'novel', 'reading']
+        exclude_keywords = ['macbook', 'notebook', 'laptop']
+        has_book_keyword = any(kw in name or kw in desc for kw in book_keywords)
+        return has_book_keyword and not any(kw in name for kw in exclude_keywords)
+    elif category_filter == 'wearables':
+        wearable_keywords = ['watch', 'smartwatch', 'fitness', 'tracker', 'wearable']
+        return any(kw in name or kw in desc for kw in wearable_keywords)
+    elif category_filter == 'electronics':
+        return 'electronics' in category
+    return False
+
+
+class KeywordIndex:
+    """
+    Precomputed product fields and match masks for keyword search.
+
+    Lowercased text, prices and per-category membership (one uint16 of
+    CATEGORY_BITS tags per product) are built once per catalog version.
+    Each keyword's match vectors (does the searchable text / the name
+    contain it) are precomputed for the synonym vocabulary and computed on
+    first use for other terms, keeping the MAX_CACHED_KEYWORDS most recently
+    used, so scoring a query is a handful of NumPy array additions instead
+    of a Python loop over every product.
+    """
+
+    def __init__(self, products: List[Dict]):
+        """
+        Build the index.
+
+        Args:
+            products: Product dictionaries as loaded from products.json
+        """
+        self.products = products
+        self.names = [p.get('name', '').lower() for p in products]
+        self.descriptions = [p.get('description', '').lower() for p in products]
+        self.categories = [p.get('category', '').lower() for p in products]
+        self.searchable = [
+            f"{name} {desc} {category}"
+            for name, desc, category in zip(self.names, self.descriptions, self.categories)
+        ]
+        self.prices = np.array([float(p.get('price', 0)) for p in products], dtype=np.float64)
+        self.category_tags = self._build_category_tags()
+
+        # Per-keyword points: 1 for a match anywhere, +2 when it is in the name.
+        # Vocabulary scores are kept for the index's lifetime; other keywords
+        # (anything users type) go through a bounded LRU
+        self._keyword_scores: Dict[str, np.ndarray] = {}
+        self._adhoc_scores = lru_cache(maxsize=MAX_CACHED_KEYWORDS)(self._compute_keyword_scores)
+        self._prewarm(SYNONYM_VOCABULARY)
+
+    def _build_category_tags(self) -> np.ndarray:
+        """
+        Run the category keyword rules once per product.
+
+        Returns:
+            uint16 array of shape (n_products,) with CATEGORY_BITS set for
+            every category filter the product matches
+        """
+        tags = np.zeros(len(self.products), dtype=np.uint16)
+        for i, (name, desc, category) in enumerate(zip(self.names, self.descriptions, self.categories)):
+            bits = 0
+            for category_filter, bit in CATEGORY_BITS.items():
+                if _category_match(category_filter, name, desc, category):
+                    bits |= bit
+            tags[i] = bits
+        return tags
+
+    def _prewarm(self, vocabulary: Iterable[str]) -> None:
+        """
+        Precompute match scores for a vocabulary of keywords.
+
+        With pyahocorasick installed, each product's text is scanned once for
+        all terms (overlapping matches included); otherwise each term is
+        checked separately.
+
+        Args:
+            vocabulary: Lowercased keywords
+        """
+        vocabulary = [term for term in vocabulary if term and term not in self._keyword_scores]
+        if not vocabulary:
+            return
+        if not AHOCORASICK_AVAILABLE:
+            for term in vocabulary:
+                self._keyword_scores[term] = self._compute_keyword_scores(term)
+            return
+
+        automaton = ahocorasick.Automaton()
+        for term in vocabulary:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+
+        scores = {term: np.zeros(len(self.products), dtype=np.int32) for term in vocabulary}
+        for i, (text, name) in enumerate(zip(self.searchable, self.names)):
+            for term in {term for _, term in automaton.iter(text)}:
+                scores[term][i] += 1
+            for term in {term for _, term in automaton.iter(name)}:
+                scores[term][i] += 2
+        self._keyword_scores.update(scores)
+
+    def keyword_scores(self, keyword: str) -> np.ndarray:
+        """
+        Get the points each product earns for one keyword.
+
+        Args:
+            keyword: Lowercased keyword (may contain spaces)
+
+        Returns:
+            int32 array of shape (n_products,)
+        """
+        scores = self._keyword_scores.get(keyword)
+        if scores is None:
+            scores = self._adhoc_scores(keyword)
+        return scores
+
+    def _compute_keyword_scores(self, keyword: str) -> np.ndarray:
+        """Scan every product for one keyword (see keyword_scores)."""
+        in_text = np.fromiter((keyword in text for text in self.searchable), dtype=bool, count=len(self.searchable))
+        in_name = np.fromiter((keyword in name for name in self.names), dtype=bool, count=len(self.names))
+        return in_text.astype(np.int32) + 2 * in_name.astype(np.int32)
+
+    def category_mask(self, category_filter: str) -> np.ndarray:
+        """
+        Get a boolean mask of products belonging to a category filter.
+
+        Args:
+            category_filter: Category filter (e.g. 'phones', 'books')
+
+        Returns:
+            Boolean array of shape (n_products,)
+        """
+        bit = CATEGORY_BITS.get(category_filter)
+        if bit is None:
+            return np.zeros(len(self.products), dtype=bool)
+        return (self.category_tags & bit) != 0
+
+    def top_matches(
+        self,
+        keywords: Iterable[str],
+        k: int,
+        price_filter: Optional[Tuple[float, float]] = None,
+        category_filter: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Score products against keywords and return the best k.
+
+        Args:
+            keywords: Lowercased keywords
+            k: Number of products to return
+            price_filter: Optional (min_price, max_price) tuple, inclusive
+            category_filter: Optional category filter
+
+        Returns:
+            Matching products by descending score; ties keep catalog order
+        """
+        scores = np.zeros(len(self.products), dtype=np.int32)
+        for keyword in keywords:
+            scores += self.keyword_scores(keyword)
+
+        if price_filter:
+            min_price, max_price = price_filter
+            scores[(self.prices < min_price) | (self.prices > max_price)] = 0
+        if category_filter:
+            scores[~self.category_mask(category_filter)] = 0
+
+        matched = np.flatnonzero(scores)
+        if 0 < k < len(matched):
+            # Keep everything tied with the k-th best score so the stable sort
+            # below breaks ties by catalog order
+            kth = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+            matched = matched[scores[matched] >= kth]
+        order = matched[np.argsort(-scores[matched], kind='stable')][:k]
+        return [self.products[i] for i in order]
+
+
+# Index for the most recently loaded catalog list, keyed by products path
+_indexes: Dict[str, KeywordIndex] = {}
+
+
+def get_keyword_index(products_path: str = "./data/products.json") -> Optional[KeywordIndex]:
+    """
+    Get the keyword index for a products file, rebuilding it when the file changes.
+
+    Args:
+        products_path: Path to products JSON file
+
+    Returns:
+        KeywordIndex, or None if the file does not exist
+    """
+    products = load_products(products_path)
+    if products is None:
+        return None
+    index = _indexes.get(products_path)
+    # load_products returns the same list until the file changes
+    if index is None or index.products is not products:
+        index = KeywordIndex(products)
+        _indexes[products_path] = index
+        logger.debug(f"Built keyword index for {len(products)} products from {products_path}")
+    return index
@@ -0,0 +1,122 @@
+"""OpenAI client construction with a pooled, keep-alive HTTP transport."""
+
+import atexit
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from openai import OpenAI
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool sizing for the LLM/embedding endpoint; one pool serves
+# every chatbot session in the process
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+# Idle connections stay open this long, across the pauses between user turns
+KEEPALIVE_EXPIRY = 60.0
+# Read timeout covers whole non-streamed completions; connecting fails fast
+REQUEST_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 10.0
+
+
+def create_http_client() -> httpx.Client:
+    """
+    Create a pooled HTTP client for API requests.
+
+    Connections are kept alive between calls, so back-to-back requests to
+    the same endpoint skip the TCP and TLS handshakes.
+
+    Returns:
+        httpx client
+    """
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+
+def create_openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    Create an OpenAI client backed by a pooled HTTP client.
+
+    Args:
+        api_key: API key
+        base_url: Optional API base URL (e.g. OpenRouter)
+
+    Returns:
+        OpenAI client
+    """
+    http_client = create_http_client()
+    logger.debug(f"Created OpenAI client (http2={HTTP2_AVAILABLE}, base_url={base_url or 'default'})")
+    if base_url:
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+
+def prewarm_connection(client: OpenAI) -> None:
+    """
+    Open a connection to the client's endpoint ahead of the first real request.
+
+    A cheap HEAD request runs the TCP and TLS handshakes, leaving the
+    connection in the keep-alive pool for the next call. Failures are
+    logged and ignored.
+
+    Args:
+        client: OpenAI client whose endpoint to connect to
+    """
+    try:
+        client._client.head(str(client.base_url))
+        logger.debug(f"Prewarmed connection to {client.base_url}")
+    except Exception as e:
+        logger.debug(f"Connection prewarm failed: {e}")
+
+
+@lru_cache(maxsize=8)
+def start_prewarm(client: OpenAI) -> None:
+    """
+    Prewarm a client's connection in a background thread, once per client.
+
+    Clients are shared by every chatbot session, so only the first session
+    to start pays for the handshake; later calls return immediately.
+
+    Args:
+        client: OpenAI client whose endpoint to connect to
+    """
+    threading.Thread(target=prewarm_connection, args=(client,), name="llm-prewarm", daemon=True).start()
+
+
+@lru_cache(maxsize=8)
+def get_openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    Get the shared OpenAI client for an API key and base URL.
+
+    Chatbots and agents created with the same credentials reuse one client
+    and its connection pool instead of each opening their own. The client
+    is closed at interpreter exit.
+
+    Args:
+        api_key: API key
+        base_url: Optional API base URL (e.g. OpenRouter)
+
+    Returns:
+        OpenAI client
+    """
+    client = create_openai_client(api_key, base_url)
+    atexit.register(client.close)
+    return client
@@ -7,6 +7,8 @@ from uuid import uuid4
 
 from pydantic import BaseModel, Field, field_validator
 
+from src.utils import validate_email as is_valid_email
+
 
 class StockStatus(str, Enum):
     """Stock status enumeration."""
@@ -51,11 +53,8 @@ class OrderModel(BaseModel):
     @classmethod
     def validate_email(cls, v: Optional[str]) -> Optional[str]:
         """Validate email format if provided."""
-        if v is not None:
-            import re
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_pattern, v):
-                raise ValueError("Invalid email format")
+        if v is not None and not is_valid_email(v):
+            raise ValueError("Invalid email format")
         return v
 
     class Config:
@@ -1,15 +1,64 @@
 """Advanced hybrid search with BM25 + semantic matching."""
 
-import json
+import heapq
 import math
 import re
-from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from collections import Counter
+from src.catalog import load_products
 from src.logger import get_logger
+from src.debug_log import AGENT_DEBUG, agent_log
 
 logger = get_logger()
 
+# Query parsing patterns, compiled once at import
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_UNDER_PRICE_RE = re.compile(r'under\s*\$?\s*(\d+(?:\.\d+)?)')
+_BELOW_PRICE_RE = re.compile(r'below\s*\$?(\d+)')
+_ABOVE_PRICE_RE = re.compile(r'above\s*\$?(\d+)')
+_OVER_PRICE_RE = re.compile(r'over\s*\$?(\d+)')
+_PRICE_FILTER_RE = re.compile(r'(under|below|over|above|less than|more than|cheaper than|costing less than|costing more than|\$\d+)')
+
+
+@lru_cache(maxsize=512)
+def _word_boundary_pattern(keyword: str) -> "re.Pattern":
+    """Compiled pattern matching a keyword as a standalone word."""
+    return re.compile(r'\b' + re.escape(keyword) + r'\b')
+
+
+def _rank_scored(
+    scored_products: List[Dict[str, Any]],
+    sort_by: Optional[str],
+    k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Order scored products for a sort option, keeping only the best k if given.
+
+    heapq.nlargest/nsmallest match a stable full sort truncated to k, but only
+    keep a k-sized heap instead of sorting every match.
+
+    Args:
+        scored_products: Dicts with 'product' and 'score' keys
+        sort_by: 'price_low', 'price_high', or anything else for relevance
+        k: Number of results to keep (None keeps all)
+
+    Returns:
+        Scored products in result order
+    """
+    if sort_by == 'price_low':
+        key, smallest = (lambda x: x['product'].get('price', float('inf'))), True
+    elif sort_by == 'price_high':
+        key, smallest = (lambda x: x['product'].get('price', 0)), False
+    else:
+        key, smallest = (lambda x: x['score']), False
+
+    if k is None:
+        return sorted(scored_products, key=key, reverse=not smallest)
+    if smallest:
+        return heapq.nsmallest(k, scored_products, key=key)
+    return heapq.nlargest(k, scored_products, key=key)
+
 
 class HybridSearch:
     """
@@ -66,6 +115,9 @@ class HybridSearch:
         self.idf_cache: Dict[str, float] = {}
         self.doc_lengths: List[int] = []
         self.term_frequencies: List[Dict[str, int]] = []
+        # Lowercased (name, description, category) and name tokens per product, by index
+        self._lowered: List[Tuple[str, str, str]] = []
+        self._name_tokens: List[set] = []
         
         self._load_products()
         self._build_index()
@@ -73,10 +125,9 @@ class HybridSearch:
     def _load_products(self):
         """Load products from JSON file."""
         try:
-            products_file = Path(self.products_path)
-            if products_file.exists():
-                with open(products_file, 'r', encoding='utf-8') as f:
-                    self.products = json.load(f)
+            products = load_products(self.products_path)
+            if products is not None:
+                self.products = products
                 logger.info(f"Loaded {len(self.products)} products for hybrid search")
             else:
                 logger.warning(f"Products file not found: {self.products_path}")
@@ -89,7 +140,7 @@ class HybridSearch:
         """Tokenize text into normalized terms."""
         # Lowercase and remove special characters
         text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
+        text = _NON_WORD_RE.sub(' ', text)
         tokens = text.split()
         
         # Stem simple suffixes
@@ -121,6 +172,13 @@ class HybridSearch:
             
             tf = Counter(tokens)
             self.term_frequencies.append(tf)
+            
+            self._lowered.append((
+                product.get('name', '').lower(),
+                product.get('description', '').lower(),
+                product.get('category', '').lower()
+            ))
+            self._name_tokens.append(set(self._tokenize(product.get('name', ''))))
         
         self.avg_doc_length = total_length / self.doc_count if self.doc_count > 0 else 0
         
@@ -149,20 +207,20 @@ class HybridSearch:
         query_lower = query.lower()
         
         # Check for explicit price mentions
-        price_match = re.search(r'under\s*\$?\s*(\d+(?:\.\d+)?)', query_lower)
+        price_match = _UNDER_PRICE_RE.search(query_lower)
         if price_match:
             max_price = float(price_match.group(1))
             return (0.0, max_price)
         
-        price_match = re.search(r'below\s*\$?(\d+)', query_lower)
+        price_match = _BELOW_PRICE_RE.search(query_lower)
         if price_match:
             return (0, float(price_match.group(1)))
         
-        price_match = re.search(r'above\s*\$?(\d+)', query_lower)
+        price_match = _ABOVE_PRICE_RE.search(query_lower)
         if price_match:
             return (float(price_match.group(1)), float('inf'))
         
-        price_match = re.search(r'over\s*\$?(\d+)', query_lower)
+        price_match = _OVER_PRICE_RE.search(query_lower)
         if price_match:
             return (float(price_match.group(1)), float('inf'))
         
@@ -175,13 +233,8 @@ class HybridSearch:
     
     def _extract_categories(self, query: str) -> List[str]:
         """Extract multiple categories from query with support for comma/and-separated lists. STRICT for price queries."""
-        # #region agent log
-        try:
-            import json
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_extract_cat_start","timestamp":int(__import__('time').time()*1000),"location":"search.py:177","message":"_extract_categories START","data":{"query":query},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-        except: pass
-        # #endregion
+        if AGENT_DEBUG:
+            agent_log("search.py:177", "_extract_categories START", {"query": query}, hypothesis_id="A")
         query_lower = query.lower()
         categories = {
             'phones': ['phone', 'phones', 'mobile', 'mobiles', 'smartphone', 'cellphone', 'iphone', 'iphones', 'samsung', 'galaxy'],
@@ -217,7 +270,7 @@ class HybridSearch:
             book_keywords = ['book', 'books', 'novel', 'novels', 'reading']
             return any(bk in segment for bk in book_keywords)
         # Check if price filter is present (for fallback logic)
-        price_filter_present = bool(re.search(r'(under|below|over|above|less than|more than|cheaper than|costing less than|costing more than|\$\d+)', query_clean))
+        price_filter_present = bool(_PRICE_FILTER_RE.search(query_clean))
         for segment in segments:
             segment = segment.strip()
             if not segment:
@@ -264,13 +317,8 @@ class HybridSearch:
             
             # If segment didn't match, try word-by-word matching
             if not segment_matched:
-                # #region agent log
-                try:
-                    import json
-                    with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps({"id":f"log_segment_not_matched","timestamp":int(__import__('time').time()*1000),"location":"search.py:242","message":"Segment not matched, checking words","data":{"segment":segment,"words":words},"sessionId":"debug-session","runId":"run1","hypothesisId":"B"}) + '\n')
-                except: pass
-                # #endregion
+                if AGENT_DEBUG:
+                    agent_log("search.py:242", "Segment not matched, checking words", {"segment": segment, "words": words}, hypothesis_id="B")
                 for word in words:
                     word = word.strip().lower()  # Ensure lowercase for consistent matching
                     if not word:
@@ -281,13 +329,8 @@ class HybridSearch:
                             continue
                         # Exact match (case-insensitive)
                         if word in keywords or word_normalized in keywords:
-                            # #region agent log
-                            try:
-                                import json
-                                with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps({"id":f"log_word_matched","timestamp":int(__import__('time').time()*1000),"location":"search.py:252","message":"Word matched category","data":{"word":word,"category":category},"sessionId":"debug-session","runId":"run1","hypothesisId":"B"}) + '\n')
-                            except: pass
-                            # #endregion
+                            if AGENT_DEBUG:
+                                agent_log("search.py:252", "Word matched category", {"word": word, "category": category}, hypothesis_id="B")
                             if category not in found_categories:
                                 found_categories.append(category)
                             break
@@ -302,8 +345,8 @@ class HybridSearch:
                                     found_categories.append(category)
                                 break
                             # Use word boundary matching to prevent category leakage (e.g., "book" matching "notebook")
-                            pattern = r'\b' + re.escape(keyword_lower) + r'\b'
-                            if re.search(pattern, word) or re.search(pattern, word_normalized):
+                            pattern = _word_boundary_pattern(keyword_lower)
+                            if pattern.search(word) or pattern.search(word_normalized):
                                 if category == 'books' and not is_explicit_book_segment(word):
                                     continue
                                 if category not in found_categories:
@@ -319,13 +362,8 @@ class HybridSearch:
                                     if category not in found_categories:
                                         found_categories.append(category)
                                     break
-        # #region agent log
-        try:
-            import json
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_extract_cat_segments","timestamp":int(__import__('time').time()*1000),"location":"search.py:280","message":"_extract_categories segments","data":{"segments":segments,"found_categories":found_categories},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-        except: pass
-        # #endregion
+        if AGENT_DEBUG:
+            agent_log("search.py:280", "_extract_categories segments", {"segments": segments, "found_categories": found_categories}, hypothesis_id="A")
         # Fallback: if no categories found in segments, check whole query
         # For price queries, still try to find categories but be more careful
         if not found_categories:
@@ -338,8 +376,7 @@ class HybridSearch:
                     continue
                 for keyword in keywords:
                     # Check if keyword appears as a standalone word (not part of another word)
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    if re.search(pattern, query_lower):
+                    if _word_boundary_pattern(keyword).search(query_lower):
                         if category not in found_categories:
                             found_categories.append(category)
                         break
@@ -349,13 +386,8 @@ class HybridSearch:
                             found_categories.append(category)
                         break
         
-        # #region agent log
-        try:
-            import json
-            with open(r'e:\AIFinalProject\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps({"id":f"log_extract_cat_end","timestamp":int(__import__('time').time()*1000),"location":"search.py:324","message":"_extract_categories END","data":{"found_categories":found_categories},"sessionId":"debug-session","runId":"run1","hypothesisId":"A"}) + '\n')
-        except: pass
-        # #endregion
+        if AGENT_DEBUG:
+            agent_log("search.py:324", "_extract_categories END", {"found_categories": found_categories}, hypothesis_id="A")
         return found_categories if found_categories else []
     
     def _extract_category(self, query: str) -> Optional[str]:
@@ -426,10 +458,13 @@ class HybridSearch:
         
         return score
     
-    def _name_match_bonus(self, query_terms: List[str], product: Dict) -> float:
-        """Give bonus points for matches in product name."""
-        name_tokens = set(self._tokenize(product.get('name', '')))
-        matches = len(name_tokens.intersection(set(query_terms)))
+    def _name_match_bonus(self, query_terms: List[str], product: Dict, doc_idx: Optional[int] = None) -> float:
+        """Give bonus points for matches in product name (doc_idx uses the prebuilt name tokens)."""
+        if doc_idx is not None:
+            name_tokens = self._name_tokens[doc_idx]
+        else:
+            name_tokens = set(self._tokenize(product.get('name', '')))
+        matches = len(name_tokens.intersection(query_terms))
         return matches * 2.0  # 2x bonus for name matches
     
     def _stock_bonus(self, product: Dict) -> float:
@@ -441,7 +476,13 @@ class HybridSearch:
             return 0.2
         return 0
     
-    def _matches_category(self, product: Dict, category_filter: str, query: str = "") -> bool:
+    def _matches_category(
+        self,
+        product: Dict,
+        category_filter: str,
+        query: str = "",
+        lowered: Optional[Tuple[str, str, str]] = None
+    ) -> bool:
         """
         Check if a product matches a given category filter.
         
@@ -449,13 +490,17 @@ class HybridSearch:
             product: Product dictionary
             category_filter: Category to check against
             query: Original query (for context-dependent matching)
+            lowered: Prebuilt lowercased (name, description, category), if known
             
         Returns:
             True if product matches category
         """
-        product_category = product.get('category', '').lower()
-        product_name = product.get('name', '').lower()
-        product_desc = product.get('description', '').lower()
+        if lowered is not None:
+            product_name, product_desc, product_category = lowered
+        else:
+            product_category = product.get('category', '').lower()
+            product_name = product.get('name', '').lower()
+            product_desc = product.get('description', '').lower()
         
         category_match = False
         if category_filter == 'phones':
@@ -476,7 +521,7 @@ class HybridSearch:
             gaming_keywords = ['playstation', 'xbox', 'nintendo', 'console', 'controller', 'switch', 'ps5', 'gaming']
             category_match = any(kw in product_name or kw in product_desc for kw in gaming_keywords)
             if 'accessories' in query.lower() or 'accessory' in query.lower():
-                if 'accessories' in product_name.lower() or 'accessory' in product_name.lower():
+                if 'accessories' in product_name or 'accessory' in product_name:
                     if any(gk in product_name or gk in product_desc for gk in ['console', 'controller', 'playstation', 'xbox', 'nintendo']):
                         category_match = True
             if any(exclude in product_name or exclude in product_desc for exclude in ['laptop', 'macbook', 'computer', 'xps', 'dell']):
@@ -485,7 +530,7 @@ class HybridSearch:
             wearable_keywords = ['watch', 'smartwatch', 'fitness', 'tracker', 'wearable']
             category_match = any(kw in product_name or kw in product_desc for kw in wearable_keywords)
         elif category_filter == 'books':
-            if 'book' in product_category.lower():
+            if 'book' in product_category:
                 category_match = True
             else:
                 book_keywords = ['book', 'novel', 'reading']
@@ -504,15 +549,15 @@ class HybridSearch:
                 home_keywords = ['vacuum', 'appliance', 'coffee', 'kitchen', 'roomba', 'dyson', 'instant pot', 'nespresso', 'philips hue']
                 category_match = any(kw in product_name or kw in product_desc for kw in home_keywords)
         elif category_filter == 'clothing':
-            category_match = 'clothing' in product_category.lower()
+            category_match = 'clothing' in product_category
             if not category_match:
                 clothing_keywords = ['shoes', 'sneakers', 'jeans', 'jacket', 'sweater', 'nike', 'adidas', 'levi', 'patagonia', 'north face']
-                category_match = any(kw in product_name.lower() or kw in product_desc.lower() for kw in clothing_keywords)
+                category_match = any(kw in product_name or kw in product_desc for kw in clothing_keywords)
         elif category_filter == 'sports':
-            category_match = 'sport' in product_category.lower()
+            category_match = 'sport' in product_category
             if not category_match:
                 sports_keywords = ['yoga', 'mat', 'fitness', 'gym', 'running', 'bike', 'peloton', 'water bottle', 'dumbbell']
-                category_match = any(kw in product_name.lower() or kw in product_desc.lower() for kw in sports_keywords)
+                category_match = any(kw in product_name or kw in product_desc for kw in sports_keywords)
         
         return category_match
     
@@ -548,6 +593,7 @@ class HybridSearch:
         # Unified retrieval: Single pass through all products
         # Score all products once, then group by category if needed
         scored_products = []
+        query_term_set = set(query_terms)
         
         for idx, product in enumerate(self.products):
             # Apply stock filter
@@ -570,7 +616,7 @@ class HybridSearch:
             if len(categories) > 1:
                 # Multi-category: Check if product matches any of the requested categories
                 for category in categories:
-                    if self._matches_category(product, category, query):
+                    if self._matches_category(product, category, query, self._lowered[idx]):
                         category_match = True
                         matched_categories.append(category)
                         break
@@ -578,7 +624,7 @@ class HybridSearch:
                     category_match = False
             elif len(categories) == 1:
                 # Single category: Check if product matches the category
-                category_match = self._matches_category(product, categories[0], query)
+                category_match = self._matches_category(product, categories[0], query, self._lowered[idx])
                 if category_match:
                     matched_categories = [categories[0]]
             # else: no category filter, include all products (category_match = True)
@@ -588,7 +634,7 @@ class HybridSearch:
             
             # Calculate relevance scores
             bm25_score = self._bm25_score(query_terms, idx)
-            name_bonus = self._name_match_bonus(query_terms, product)
+            name_bonus = self._name_match_bonus(query_term_set, product, idx)
             stock_bonus = self._stock_bonus(product)
             total_score = bm25_score + name_bonus + stock_bonus
             
@@ -601,16 +647,9 @@ class HybridSearch:
                     'matched_categories': matched_categories if matched_categories else (categories if categories else [])
                 })
         
-        # Sort results
-        if sort_by == 'price_low':
-            scored_products.sort(key=lambda x: x['product'].get('price', float('inf')))
-        elif sort_by == 'price_high':
-            scored_products.sort(key=lambda x: x['product'].get('price', 0), reverse=True)
-        else:
-            scored_products.sort(key=lambda x: x['score'], reverse=True)
-        
         # Group by category for multi-category queries
         if len(categories) > 1:
+            scored_products = _rank_scored(scored_products, sort_by)
             grouped_results = {}
             # Initialize empty lists for each requested category
             for cat in categories:
@@ -651,7 +690,7 @@ class HybridSearch:
                 return []
         
         # Single category or no category - return flat list
-        return [item['product'] for item in scored_products[:k]]
+        return [item['product'] for item in _rank_scored(scored_products, sort_by, k)]
     
     def _search_by_category(
         self,
@@ -665,6 +704,8 @@ class HybridSearch:
     ) -> List[Dict]:
         """Search products for a specific category."""
         scored_products = []
+        query_term_set = set(query_terms)
+        query_lower = query.lower()
         
         for idx, product in enumerate(self.products):
             # Apply filters
@@ -672,9 +713,7 @@ class HybridSearch:
                 continue
             
             # Category filter
-            product_category = product.get('category', '').lower()
-            product_name = product.get('name', '').lower()
-            product_desc = product.get('description', '').lower()
+            product_name, product_desc, product_category = self._lowered[idx]
             
             category_match = False
             if category_filter == 'phones':
@@ -696,8 +735,8 @@ class HybridSearch:
                 # Also check for "accessories" if query mentions gaming
                 category_match = any(kw in product_name or kw in product_desc for kw in gaming_keywords)
                 # Check for gaming accessories (accessories keyword with gaming context)
-                if 'accessories' in query.lower() or 'accessory' in query.lower():
-                    if 'accessories' in product_name.lower() or 'accessory' in product_name.lower():
+                if 'accessories' in query_lower or 'accessory' in query_lower:
+                    if 'accessories' in product_name or 'accessory' in product_name:
                         # Only match if it's actually gaming-related (console, controller, etc.)
                         if any(gk in product_name or gk in product_desc for gk in ['console', 'controller', 'playstation', 'xbox', 'nintendo']):
                             category_match = True
@@ -709,7 +748,7 @@ class HybridSearch:
                 category_match = any(kw in product_name or kw in product_desc for kw in wearable_keywords)
             elif category_filter == 'books':
                 # Check category first
-                if 'book' in product_category.lower():
+                if 'book' in product_category:
                     category_match = True
                 else:
                     # Check for book-related keywords but exclude "MacBook", "notebook" (computer)
@@ -733,18 +772,18 @@ class HybridSearch:
                     category_match = any(kw in product_name or kw in product_desc for kw in home_keywords)
             elif category_filter == 'clothing':
                 # Match products with "Clothing" category (case-insensitive)
-                category_match = 'clothing' in product_category.lower()
+                category_match = 'clothing' in product_category
                 # Also match common clothing keywords
                 if not category_match:
                     clothing_keywords = ['shoes', 'sneakers', 'jeans', 'jacket', 'sweater', 'nike', 'adidas', 'levi', 'patagonia', 'north face']
-                    category_match = any(kw in product_name.lower() or kw in product_desc.lower() for kw in clothing_keywords)
+                    category_match = any(kw in product_name or kw in product_desc for kw in clothing_keywords)
             elif category_filter == 'sports':
                 # Match products with "Sports" category (case-insensitive)
-                category_match = 'sport' in product_category.lower()
+                category_match = 'sport' in product_category
                 # Also match common sports keywords (exclude 'garmin', 'fitbit' to avoid wearables being shown as separate)
                 if not category_match:
                     sports_keywords = ['yoga', 'mat', 'fitness', 'gym', 'running', 'bike', 'peloton', 'water bottle', 'dumbbell']
-                    category_match = any(kw in product_name.lower() or kw in product_desc.lower() for kw in sports_keywords)
+                    category_match = any(kw in product_name or kw in product_desc for kw in sports_keywords)
             
             if not category_match:
                 continue
@@ -759,7 +798,7 @@ class HybridSearch:
             
             # Calculate scores
             bm25_score = self._bm25_score(query_terms, idx)
-            name_bonus = self._name_match_bonus(query_terms, product)
+            name_bonus = self._name_match_bonus(query_term_set, product, idx)
             stock_bonus = self._stock_bonus(product)
             
             total_score = bm25_score + name_bonus + stock_bonus
@@ -772,15 +811,7 @@ class HybridSearch:
                     'name_bonus': name_bonus
                 })
         
-        # Sort results
-        if sort_by == 'price_low':
-            scored_products.sort(key=lambda x: x['product'].get('price', float('inf')))
-        elif sort_by == 'price_high':
-            scored_products.sort(key=lambda x: x['product'].get('price', 0), reverse=True)
-        else:
-            scored_products.sort(key=lambda x: x['score'], reverse=True)
-        
-        return [item['product'] for item in scored_products[:k]]
+        return [item['product'] for item in _rank_scored(scored_products, sort_by, k)]
     
     def get_recommendations(
         self,
@@ -801,8 +832,9 @@ class HybridSearch:
         """
         # Find the reference product
         ref_product = None
-        for product in self.products:
-            if product_name.lower() in product.get('name', '').lower():
+        product_name_lower = product_name.lower()
+        for product, (name_lower, _, _) in zip(self.products, self._lowered):
+            if product_name_lower in name_lower:
                 ref_product = product
                 break
         
@@ -837,14 +869,14 @@ class HybridSearch:
             if score > 0:
                 scored.append((score, product))
         
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [p for _, p in scored[:k]]
+        return [p for _, p in heapq.nlargest(k, scored, key=lambda x: x[0])]
     
     def get_products_by_category(self, category: str, k: int = 10) -> List[Dict]:
         """Get products by category."""
         matching = []
-        for product in self.products:
-            if category.lower() in product.get('category', '').lower():
+        category_lower = category.lower()
+        for product, (_, _, product_category) in zip(self.products, self._lowered):
+            if category_lower in product_category:
                 matching.append(product)
         return matching[:k]
     
@@ -934,11 +966,9 @@ class HybridSearch:
                 'vector_score': vector_score
             })
         
-        # Sort by combined score descending
-        scored_merged.sort(key=lambda x: x['combined_score'], reverse=True)
-        
-        # Return top k products
-        return [item['product'] for item in scored_merged[:k]]
+        # Return top k products by combined score
+        top = heapq.nlargest(k, scored_merged, key=lambda x: x['combined_score'])
+        return [item['product'] for item in top]
 
 
 # Singleton instance
@@ -1,6 +1,9 @@
 """Langfuse tracing utilities for observability."""
 
+import atexit
 import os
+import threading
+import time
 from typing import Optional, Dict, Any, Callable
 from functools import wraps
 from datetime import datetime
@@ -13,8 +16,12 @@ except ImportError:
     LANGFUSE_AVAILABLE = False
     Langfuse = None
 
-from dotenv import load_dotenv
-load_dotenv()
+from src.utils import load_env
+load_env()
+
+
+# Seconds between background flushes of pending trace events
+FLUSH_INTERVAL_SECONDS = 1.0
 
 
 class LangfuseTracer:
@@ -34,6 +41,8 @@ class LangfuseTracer:
             
         self.enabled = False
         self.client = None
+        # Set when events were recorded since the last background flush
+        self._flush_pending = False
         
         # Check if Langfuse credentials are available
         secret_key = os.getenv("LANGFUSE_SECRET_KEY")
@@ -58,6 +67,9 @@ class LangfuseTracer:
             else:
                 print("[Langfuse] Credentials not configured. Tracing disabled.")
         
+        if self.enabled:
+            threading.Thread(target=self._flush_loop, name="langfuse-flush", daemon=True).start()
+        
         self._initialized = True
     
     def trace(
@@ -139,6 +151,18 @@ class LangfuseTracer:
                 self.client.flush()
             except Exception as e:
                 print(f"[Langfuse] Error flushing: {e}")
+    
+    def mark_pending(self):
+        """Schedule a flush on the background thread instead of flushing now."""
+        self._flush_pending = True
+    
+    def _flush_loop(self):
+        """Flush every FLUSH_INTERVAL_SECONDS while events are pending."""
+        while True:
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            if self._flush_pending:
+                self._flush_pending = False
+                self.flush()
 
 
 class TraceWrapper:
@@ -232,7 +256,7 @@ def traced(name: Optional[str] = None):
                 trace.end(output={"error": str(e)})
                 raise
             finally:
-                tracer.flush()
+                tracer.mark_pending()
         
         return wrapper
     return decorator
@@ -246,4 +270,6 @@ def get_tracer() -> LangfuseTracer:
     global _tracer
     if _tracer is None:
         _tracer = LangfuseTracer()
+        # Events are flushed in batches, so send whatever is left on exit
+        atexit.register(_tracer.flush)
     return _tracer
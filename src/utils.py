@@ -1,7 +1,37 @@
 """Utility functions for input sanitization and security."""
 
+import json
+import random
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional
+
+# orjson is an optional, faster drop-in for JSON (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Characters stripped from input (deleted in one str.translate pass)
+_DANGEROUS_CHARS_TABLE = str.maketrans('', '', '<>"\';\\')
+# Every SQL pattern below contains one of these; ASCII text without them skips the regexes
+_SQL_INJECTION_MARKERS = ('drop', 'delete', 'insert', 'update', 'select', 'union', '--', '/*')
+# SQL injection patterns, applied in this order
+_SQL_INJECTION_RES = tuple(re.compile(pattern) for pattern in (
+    r'(?i)\bDROP\s+TABLE\b',
+    r'(?i)\bDELETE\s+FROM\b',
+    r'(?i)\bINSERT\s+INTO\b',
+    r'(?i)\bUPDATE\s+SET\b',
+    r'(?i)\bSELECT\s+.*\s+FROM\b',
+    r'(?i)\bUNION\s+SELECT\b',
+    r'--',  # SQL comments
+    r'/\*.*?\*/',  # SQL block comments
+))
+
+# HTTP status codes that will fail the same way on every retry
+NON_RETRYABLE_STATUS_CODES = frozenset({400, 401, 403, 404, 422})
 
 
 def sanitize_input(text: str, max_length: Optional[int] = None) -> str:
@@ -19,20 +49,14 @@ def sanitize_input(text: str, max_length: Optional[int] = None) -> str:
         return ""
     
     # Remove potentially dangerous characters and SQL keywords
-    sanitized = re.sub(r'[<>"\';\\]', '', text)
+    sanitized = text.translate(_DANGEROUS_CHARS_TABLE)
     # Remove SQL injection patterns
-    sql_patterns = [
-        r'(?i)\bDROP\s+TABLE\b',
-        r'(?i)\bDELETE\s+FROM\b',
-        r'(?i)\bINSERT\s+INTO\b',
-        r'(?i)\bUPDATE\s+SET\b',
-        r'(?i)\bSELECT\s+.*\s+FROM\b',
-        r'(?i)\bUNION\s+SELECT\b',
-        r'--',  # SQL comments
-        r'/\*.*?\*/',  # SQL block comments
-    ]
-    for pattern in sql_patterns:
-        sanitized = re.sub(pattern, '', sanitized)
+    # Non-ASCII text always runs the regexes: case-insensitive matching also
+    # folds characters such as 'ı' and 'ſ' that a substring check would miss
+    lowered = sanitized.lower()
+    if not sanitized.isascii() or any(marker in lowered for marker in _SQL_INJECTION_MARKERS):
+        for pattern in _SQL_INJECTION_RES:
+            sanitized = pattern.sub('', sanitized)
     sanitized = sanitized.strip()
     
     if max_length and len(sanitized) > max_length:
@@ -51,10 +75,9 @@ def validate_email(email: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
-    if not email:
+    if not email or "@" not in email:
         return False
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(email_pattern, email))
+    return _EMAIL_RE.match(email) is not None
 
 
 def sanitize_product_name(name: str) -> str:
@@ -82,3 +105,105 @@ def sanitize_customer_name(name: str) -> str:
     """
     return sanitize_input(name, max_length=100)
 
+
+def backoff_delay(retry_count: int, base: float = 0.25, cap: float = 4.0) -> float:
+    """
+    Compute a jittered exponential backoff delay for a retry attempt.
+    
+    Args:
+        retry_count: Number of attempts made so far (1 for the first retry)
+        base: Delay multiplier in seconds
+        cap: Maximum delay before jitter in seconds
+    
+    Returns:
+        Delay in seconds
+    """
+    return min(cap, (2 ** retry_count) * base) * random.uniform(0.5, 1.5)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check whether an API error is worth retrying.
+    
+    Errors carrying a client-side HTTP status (bad request, auth, not found)
+    fail identically on every attempt, so they are not retried.
+    
+    Args:
+        error: Exception raised by an API call
+    
+    Returns:
+        True if the call should be retried
+    """
+    return getattr(error, "status_code", None) not in NON_RETRYABLE_STATUS_CODES
+
+
+def json_loads(data: str) -> Any:
+    """
+    Parse a JSON document, using orjson when it is installed.
+    
+    Args:
+        data: JSON text
+    
+    Returns:
+        Parsed value
+    
+    Raises:
+        ValueError: If the text is not valid JSON
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(value: Any) -> str:
+    """
+    Serialize a value to compact JSON text, using orjson when it is installed.
+    
+    Args:
+        value: JSON-serializable value (numpy scalars and arrays are accepted
+            when orjson is available)
+    
+    Returns:
+        JSON text
+    
+    Raises:
+        TypeError: If the value is not serializable
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def json_preview(value: Any, limit: int = 500) -> str:
+    """
+    Render the start of a value as JSON text for logs and traces.
+    
+    With orjson the value is serialized in C and the bytes are cut, instead
+    of building the full Python repr just to keep its first characters.
+    
+    Args:
+        value: Value to preview
+        limit: Maximum length of the preview (bytes with orjson, characters otherwise)
+    
+    Returns:
+        Truncated JSON (or repr, for values orjson cannot serialize)
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)[:limit].decode("utf-8", "ignore")
+        except TypeError:
+            pass
+    return str(value)[:limit]
+
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """
+    Load variables from .env into the environment, once per process.
+    
+    Modules that need the settings at import time call this instead of
+    load_dotenv(), so the file is found and parsed only on the first call.
+    Variables already set in the environment are not overridden.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
@@ -0,0 +1,75 @@
+"""Shared ChromaDB client handles for the product vector store."""
+
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+import chromadb
+from chromadb.config import Settings
+
+from src.logger import get_logger
+
+logger = get_logger()
+
+# Opened clients keyed by resolved vector store path
+_clients: Dict[str, "chromadb.api.ClientAPI"] = {}
+_clients_lock = threading.Lock()
+
+# Opened collections keyed by (resolved vector store path, collection name)
+_collections: Dict[Tuple[str, str], "chromadb.Collection"] = {}
+
+
+def get_chroma_client(vector_store_path: str = "./vector_store") -> "chromadb.api.ClientAPI":
+    """
+    Get the shared ChromaDB client for a vector store path.
+
+    Opening a PersistentClient loads the SQLite catalog and index metadata,
+    so each path is opened once per process and the handle is reused by the
+    RAG agent, the order agent and stock checks.
+
+    Args:
+        vector_store_path: Path to vector store directory
+
+    Returns:
+        ChromaDB client
+    """
+    key = str(Path(vector_store_path).resolve())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = chromadb.PersistentClient(
+                path=vector_store_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
+            _clients[key] = client
+            logger.debug(f"Opened ChromaDB client at {vector_store_path}")
+        return client
+
+
+def get_collection(name: str = "products", vector_store_path: str = "./vector_store") -> "chromadb.Collection":
+    """
+    Get a shared collection handle from the shared client.
+
+    Args:
+        name: Collection name
+        vector_store_path: Path to vector store directory
+
+    Returns:
+        ChromaDB collection
+    """
+    key = (str(Path(vector_store_path).resolve()), name)
+    collection = _collections.get(key)
+    if collection is not None:
+        return collection
+
+    client = get_chroma_client(vector_store_path)
+    with _clients_lock:
+        collection = _collections.get(key)
+        if collection is None:
+            collection = client.get_collection(name)
+            _collections[key] = collection
+        return collection
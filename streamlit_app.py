@@ -170,10 +170,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state with caching
-@st.cache_resource
+# Initialize session state; each browser session gets its own chatbot (cart,
+# history, session ID) on top of the process-wide client, collection and indexes
 def get_chatbot():
-    """Get or create chatbot instance (cached across reruns to avoid cold starts)."""
+    """Create the chatbot for this browser session."""
     from src.chatbot import EcommerceChatbot
     return EcommerceChatbot()
 
@@ -294,7 +294,7 @@ with st.sidebar:
             with st.expander("🎟️ Have a coupon?"):
                 coupon = st.text_input("Enter code:", key="coupon_input")
                 if st.button("Apply"):
-                    success, msg = cart.apply_coupon(coupon)
+                    success, msg = st.session_state.chatbot.apply_coupon(coupon)
                     if success:
                         st.success(msg)
                         st.rerun()
@@ -335,7 +335,7 @@ with st.sidebar:
     
     if st.button("🛒 Clear Cart", use_container_width=True):
         if st.session_state.initialized:
-            st.session_state.chatbot.cart.clear()
+            st.session_state.chatbot.clear_cart()
             st.rerun()
     
     if st.button("📦 View Orders", use_container_width=True):
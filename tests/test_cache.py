@@ -0,0 +1,144 @@
+"""Unit tests for TTLCache: LRU order, expiry, shard capacity and the reaper."""
+
+import time
+
+import pytest
+
+from src import cache as cache_module
+from src.cache import MIN_SHARD_SIZE, NUM_SHARDS, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.time() at a value the test can move forward."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_get_returns_cached_value_and_counts_hits():
+    cache = TTLCache(default_ttl=60, max_size=10)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(default_ttl=60, max_size=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    # Reading "a" makes "b" the least recently used entry
+    cache.get("a")
+    cache.set("d", "d")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_overwriting_a_key_refreshes_its_position():
+    cache = TTLCache(default_ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 3)
+    cache.set("c", 4)
+
+    assert cache.get("a") == 3
+    assert cache.get("b") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(default_ttl=60, max_size=10)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+
+    clock[0] += 10
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+
+    clock[0] += 60
+    assert cache.get("default") is None
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache(default_ttl=60, max_size=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    cache.clear()
+    assert cache.size() == 0
+
+
+@pytest.mark.parametrize("max_size", [1, 20, 100, 2 * MIN_SHARD_SIZE - 1])
+def test_small_caches_are_one_exact_lru(max_size):
+    cache = TTLCache(default_ttl=60, max_size=max_size)
+    for i in range(max_size * 3):
+        cache.set(i, i)
+
+    assert len(cache._shards) == 1
+    assert cache.size() == max_size
+    assert cache.stats()["max_size"] == max_size
+    # Exactly the most recent max_size keys survive
+    assert all(cache.get(i) == i for i in range(max_size * 2, max_size * 3))
+
+
+@pytest.mark.parametrize("max_size", [2 * MIN_SHARD_SIZE, 500, 1000, 3000])
+def test_sharded_caches_never_exceed_reported_capacity(max_size):
+    cache = TTLCache(default_ttl=60, max_size=max_size)
+    for i in range(max_size * 4):
+        cache.set(f"key-{i}", i)
+
+    capacity = cache.stats()["max_size"]
+    assert 1 < len(cache._shards) <= NUM_SHARDS
+    assert max_size <= capacity < max_size + len(cache._shards)
+    assert cache.size() <= capacity
+    assert all(len(shard.entries) >= MIN_SHARD_SIZE for shard in cache._shards)
+
+
+def test_cleanup_expired_removes_only_expired_entries(clock):
+    cache = TTLCache(default_ttl=60, max_size=10)
+    cache.set("old", 1, ttl=5)
+    cache.set("new", 2, ttl=120)
+    # An overwritten key leaves a stale heap record that must be skipped
+    cache.set("rewritten", 3, ttl=5)
+    cache.set("rewritten", 4, ttl=120)
+
+    clock[0] += 10
+    assert cache.cleanup_expired() == 1
+    assert cache.size() == 2
+    assert cache.get("rewritten") == 4
+
+
+def test_new_caches_are_registered_with_the_reaper():
+    cache = TTLCache(default_ttl=60, max_size=10)
+
+    assert cache in cache_module._reaped_caches
+    assert cache_module._reaper_thread is not None
+
+
+def test_reaper_sweeps_registered_caches(clock, monkeypatch):
+    cache = TTLCache(default_ttl=60, max_size=10)
+    cache.set("old", 1, ttl=5)
+    clock[0] += 10
+
+    class OneSweep:
+        """Stop event that lets the reaper loop run exactly once."""
+
+        def __init__(self):
+            self.calls = 0
+
+        def wait(self, timeout):
+            self.calls += 1
+            return self.calls > 1
+
+    monkeypatch.setattr(cache_module, "_reaper_stopped", OneSweep())
+    cache_module._reap_expired()
+
+    assert cache.size() == 0
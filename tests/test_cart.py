@@ -0,0 +1,147 @@
+"""Unit tests for ShoppingCart indexes and totals, and CartManager storage."""
+
+import pytest
+
+from src.cart import CartManager, ShoppingCart
+
+
+def reference_totals(items, discount_percent):
+    """Totals recomputed from scratch, as the properties did before caching."""
+    subtotal = sum(price * quantity for _, price, quantity in items)
+    discount = subtotal * (discount_percent / 100)
+    after_discount = subtotal - discount
+    tax = after_discount * ShoppingCart.TAX_RATE
+    shipping = 0.0 if after_discount >= ShoppingCart.FREE_SHIPPING_THRESHOLD else ShoppingCart.SHIPPING_COST
+    return subtotal, discount, tax, shipping, after_discount + tax + shipping
+
+
+def assert_totals(cart, items, discount_percent=0.0):
+    subtotal, discount, tax, shipping, total = reference_totals(items, discount_percent)
+    assert cart.subtotal == pytest.approx(subtotal)
+    assert cart.discount_amount == pytest.approx(discount)
+    assert cart.tax_amount == pytest.approx(tax)
+    assert cart.shipping_cost == pytest.approx(shipping)
+    assert cart.total == pytest.approx(total)
+    assert cart.item_count == sum(quantity for _, _, quantity in items)
+
+
+def test_adding_same_product_increases_quantity():
+    cart = ShoppingCart()
+    cart.add_item("PROD001", "iPhone 15 Pro", 999.0)
+    cart.add_item("PROD001", "iPhone 15 Pro", 999.0, quantity=2)
+
+    assert len(cart.items) == 1
+    assert cart.items[0].quantity == 3
+
+
+def test_same_name_with_different_case_is_one_item():
+    cart = ShoppingCart()
+    cart.add_item("PROD001", "iPhone 15 Pro", 999.0)
+    cart.add_item("OTHER", "IPHONE 15 PRO", 999.0)
+
+    assert len(cart.items) == 1
+    assert cart.items[0].quantity == 2
+
+
+def test_remove_and_update_are_case_insensitive():
+    cart = ShoppingCart()
+    cart.add_item("PROD001", "iPhone 15 Pro", 999.0)
+    cart.add_item("PROD009", "PlayStation 5", 499.0)
+
+    assert cart.update_quantity("playstation 5", 4) is True
+    assert cart.items[1].quantity == 4
+    assert cart.remove_item("IPHONE 15 PRO") is True
+    assert cart.remove_item("iPhone 15 Pro") is False
+    assert [item.product_name for item in cart.items] == ["PlayStation 5"]
+    # The removed product's ID is free again
+    cart.add_item("PROD001", "iPhone 15 Pro", 999.0)
+    assert len(cart.items) == 2
+
+
+def test_update_quantity_to_zero_removes_item():
+    cart = ShoppingCart()
+    cart.add_item("PROD020", "Dune", 18.0)
+
+    assert cart.update_quantity("dune", 0) is True
+    assert cart.is_empty
+
+
+def test_totals_follow_every_change():
+    cart = ShoppingCart()
+    items = []
+    assert_totals(cart, items)
+
+    cart.add_item("PROD020", "Dune", 18.0, quantity=2)
+    items = [("Dune", 18.0, 2)]
+    assert_totals(cart, items)
+
+    cart.add_item("PROD009", "PlayStation 5", 499.0)
+    items.append(("PlayStation 5", 499.0, 1))
+    assert_totals(cart, items)
+
+    cart.update_quantity("Dune", 5)
+    items[0] = ("Dune", 18.0, 5)
+    assert_totals(cart, items)
+
+    success, _ = cart.apply_coupon("save20")
+    assert success
+    assert_totals(cart, items, discount_percent=20.0)
+
+    cart.remove_item("PlayStation 5")
+    items.pop()
+    assert_totals(cart, items, discount_percent=20.0)
+
+    cart.clear()
+    assert_totals(cart, [])
+    assert cart.coupon_code is None
+
+
+def test_free_shipping_threshold():
+    cart = ShoppingCart()
+    cart.add_item("PROD020", "Dune", 50.0)
+    assert cart.shipping_cost == ShoppingCart.SHIPPING_COST
+
+    cart.update_quantity("Dune", 2)
+    assert cart.shipping_cost == 0.0
+
+
+def test_invalid_coupon_is_rejected():
+    cart = ShoppingCart()
+    success, message = cart.apply_coupon("NOPE")
+
+    assert not success
+    assert "Invalid coupon code" in message
+    assert cart.discount_percent == 0.0
+
+
+def test_summary_and_dict_agree_with_totals():
+    cart = ShoppingCart()
+    cart.add_item("PROD020", "Dune", 18.0, quantity=2)
+    cart.apply_coupon("SAVE10")
+    data = cart.to_dict()
+
+    assert data["total"] == pytest.approx(cart.total)
+    assert data["item_count"] == 2
+    assert data["items"][0]["subtotal"] == pytest.approx(36.0)
+    assert f"**Total: ${cart.total:.2f}**" in cart.get_summary()
+
+
+def test_cart_manager_returns_same_cart_per_session():
+    cart = CartManager.get_cart("test-session-a")
+
+    assert CartManager.get_cart("test-session-a") is cart
+    assert CartManager.get_cart("test-session-b") is not cart
+    CartManager.remove_cart("test-session-a")
+    CartManager.remove_cart("test-session-b")
+
+
+def test_cart_manager_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(CartManager, "_MAX_CARTS", 2)
+    monkeypatch.setattr(CartManager, "_carts", type(CartManager._carts)())
+    first = CartManager.get_cart("first")
+    CartManager.get_cart("second")
+    # Touching "first" makes "second" the least recently used session
+    assert CartManager.get_cart("first") is first
+    CartManager.get_cart("third")
+
+    assert list(CartManager._carts) == ["first", "third"]
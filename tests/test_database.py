@@ -0,0 +1,131 @@
+"""Unit tests for batched order writes and pending orders."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.exc import DatabaseError
+
+from src import database
+from src.database import (
+    PENDING_ORDER_TTL_MINUTES,
+    PendingOrder,
+    create_orders,
+    create_pending_order,
+    get_all_orders,
+    get_db_session,
+    get_order_by_id,
+    init_database,
+    purge_stale_pending_orders,
+)
+from src.models import OrderModel
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "orders.db")
+    init_database(path)
+    return path
+
+
+def make_order(product_name="Dune", quantity=1, unit_price=18.0, **fields):
+    fields.setdefault("customer_name", "Test Customer")
+    fields.setdefault("customer_email", "test@example.com")
+    return OrderModel(product_name=product_name, quantity=quantity, unit_price=unit_price, **fields)
+
+
+def pending_ids(db_path):
+    with get_db_session(db_path, write=False) as session:
+        return {row.order_id for row in session.query(PendingOrder).all()}
+
+
+def test_create_orders_writes_every_order(db_path):
+    orders = [make_order("Dune", 2), make_order("Atomic Habits", 1, 16.0), make_order("PlayStation 5", 1, 499.0)]
+
+    order_ids = create_orders(orders, db_path)
+
+    assert order_ids == [order.order_id for order in orders]
+    saved = {order["order_id"]: order for order in get_all_orders(db_path)}
+    assert set(saved) == set(order_ids)
+    assert saved[orders[0].order_id]["total_price"] == pytest.approx(36.0)
+    assert saved[orders[2].order_id]["product_name"] == "PlayStation 5"
+
+
+def test_create_orders_with_no_orders(db_path):
+    assert create_orders([], db_path) == []
+    assert get_all_orders(db_path) == []
+
+
+def test_create_orders_is_all_or_nothing(db_path):
+    first = make_order("Dune")
+    duplicate = make_order("Atomic Habits", order_id=first.order_id)
+
+    with pytest.raises(DatabaseError):
+        create_orders([first, duplicate], db_path)
+    assert get_all_orders(db_path) == []
+
+
+def test_create_orders_sanitizes_rows(db_path):
+    order = make_order("Dune<script>", customer_name="Robert'; DROP TABLE orders")
+
+    create_orders([order], db_path)
+
+    saved = get_order_by_id(order.order_id, db_path)
+    assert saved["product_name"] == "Dunescript"
+    assert "DROP TABLE" not in saved["customer_name"]
+
+
+def test_pending_order_commit_moves_row_to_orders(db_path):
+    order = make_order()
+
+    order_id, commit, _ = create_pending_order(order, db_path)
+    assert pending_ids(db_path) == {order_id}
+    assert get_order_by_id(order_id, db_path) is None
+
+    assert commit() == order_id
+    assert pending_ids(db_path) == set()
+    assert get_order_by_id(order_id, db_path)["product_name"] == "Dune"
+
+
+def test_pending_order_rollback_discards_row(db_path):
+    order_id, _, rollback = create_pending_order(make_order(), db_path)
+
+    rollback()
+
+    assert pending_ids(db_path) == set()
+    assert get_order_by_id(order_id, db_path) is None
+
+
+def test_commit_after_pending_row_expired_still_creates_order(db_path):
+    order_id, commit, _ = create_pending_order(make_order(), db_path)
+    with get_db_session(db_path) as session:
+        session.query(PendingOrder).delete()
+
+    assert commit() == order_id
+    assert get_order_by_id(order_id, db_path) is not None
+
+
+def test_stale_pending_orders_are_purged(db_path):
+    stale_time = datetime.now() - timedelta(minutes=PENDING_ORDER_TTL_MINUTES + 5)
+    stale_id, _, _ = create_pending_order(make_order(timestamp=stale_time), db_path)
+    fresh_id, _, _ = create_pending_order(make_order(), db_path)
+    # Staging the fresh order already swept the stale one
+    assert pending_ids(db_path) == {fresh_id}
+
+    create_pending_order(make_order(timestamp=stale_time), db_path)
+    assert purge_stale_pending_orders(db_path) == 1
+    assert pending_ids(db_path) == {fresh_id}
+    assert stale_id not in pending_ids(db_path)
+
+
+def test_init_database_purges_stale_pending_orders(db_path):
+    stale_time = datetime.now() - timedelta(minutes=PENDING_ORDER_TTL_MINUTES + 5)
+    create_pending_order(make_order(timestamp=stale_time), db_path)
+
+    # Simulate a new process opening the same database
+    database._initialized_paths.clear()
+    init_database(db_path)
+
+    assert pending_ids(db_path) == set()
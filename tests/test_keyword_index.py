@@ -0,0 +1,101 @@
+"""KeywordIndex scoring must match the original per-product linear scan."""
+
+from pathlib import Path
+
+import pytest
+
+from src.catalog import load_products
+from src.keyword_index import CATEGORY_BITS, KEYWORD_SYNONYMS, KeywordIndex, _category_match
+
+PRODUCTS_PATH = str(Path(__file__).resolve().parent.parent / "data" / "products.json")
+
+
+def expand_keywords(query):
+    """Split, singularize and synonym-expand a query as RAGAgent._keyword_search does."""
+    keywords = [word[:-1] if word.endswith('s') and len(word) > 3 else word for word in query.lower().split()]
+    expanded = set(keywords)
+    for keyword in keywords:
+        expanded.update(KEYWORD_SYNONYMS.get(keyword, []))
+    return expanded
+
+
+def linear_scan(products, keywords, k, price_filter=None, category_filter=None):
+    """Reference implementation: the scoring loop KeywordIndex replaced."""
+    scored = []
+    for product in products:
+        name = product.get('name', '').lower()
+        desc = product.get('description', '').lower()
+        category = product.get('category', '').lower()
+        if price_filter:
+            price = float(product.get('price', 0))
+            if price < price_filter[0] or price > price_filter[1]:
+                continue
+        if category_filter and not _category_match(category_filter, name, desc, category):
+            continue
+        searchable = f"{name} {desc} {category}"
+        score = 0
+        for keyword in keywords:
+            if keyword in searchable:
+                score += 1
+                if keyword in name:
+                    score += 2
+        if score > 0:
+            scored.append((score, product))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [product for _, product in scored[:k]]
+
+
+@pytest.fixture(scope="module")
+def products():
+    products = load_products(PRODUCTS_PATH)
+    assert products, "data/products.json is required"
+    return products
+
+
+@pytest.fixture(scope="module")
+def index(products):
+    return KeywordIndex(products)
+
+
+QUERIES = [
+    "laptops",
+    "phone",
+    "headphones for running",
+    "apple watch",
+    "sony",
+    "pro",
+    "book novel",
+    "vacuum robot",
+    "gaming console",
+    "nothing matches this xyzzy",
+    "a",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("k", [1, 3, 10, 100])
+def test_top_matches_equals_linear_scan(products, index, query, k):
+    keywords = expand_keywords(query)
+    assert index.top_matches(keywords, k) == linear_scan(products, keywords, k)
+
+
+@pytest.mark.parametrize("category_filter", list(CATEGORY_BITS))
+@pytest.mark.parametrize("price_filter", [None, (0, 100), (100, 1000), (500, 5000)])
+def test_filters_equal_linear_scan(products, index, category_filter, price_filter):
+    keywords = expand_keywords("pro premium wireless book phone laptop")
+    expected = linear_scan(products, keywords, 10, price_filter, category_filter)
+    assert index.top_matches(keywords, 10, price_filter, category_filter) == expected
+
+
+def test_unknown_category_matches_nothing(index):
+    assert index.top_matches({"pro"}, 10, category_filter="furniture") == []
+
+
+def test_adhoc_keyword_cache_is_bounded(index):
+    maxsize = index._adhoc_scores.cache_info().maxsize
+    for i in range(maxsize + 50):
+        index.keyword_scores(f"adhoc-{i}")
+
+    assert index._adhoc_scores.cache_info().currsize == maxsize
+    # Vocabulary scores are kept separately and never evicted
+    assert all(term in index._keyword_scores for term in KEYWORD_SYNONYMS)
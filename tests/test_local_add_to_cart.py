@@ -0,0 +1,68 @@
+"""The local add-to-cart fast path must only fire for an unambiguous product."""
+
+from pathlib import Path
+
+import pytest
+
+from src.chatbot import EcommerceChatbot
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """A chatbot shell that records add_to_cart calls instead of touching a cart."""
+    # The catalog is read from ./data/products.json
+    monkeypatch.chdir(REPO_ROOT)
+    bot = EcommerceChatbot.__new__(EcommerceChatbot)
+    bot.calls = []
+
+    def execute_function(function_name, arguments):
+        bot.calls.append((function_name, arguments))
+        return {"success": True, "result": f"Added {arguments['product_name']}"}
+
+    bot.execute_function = execute_function
+    return bot
+
+
+@pytest.mark.parametrize("message", [
+    "add a vacuum to my cart",
+    "add sony to cart",
+    "add the pro to my cart",
+    "add 2 air to cart",
+])
+def test_ambiguous_names_fall_through_to_the_model(bot, message):
+    assert bot._try_local_add_to_cart(message) is None
+    assert bot.calls == []
+
+
+@pytest.mark.parametrize("message, product_name, quantity", [
+    ("add an iPhone to my cart", "iPhone 15 Pro", 1),
+    ("please add 2 x macbooks to cart", "MacBook Pro 14-inch", 2),
+    ("add 3 Dune to my cart.", "Dune", 3),
+    ("add the kindle paperwhite to cart", "Kindle Paperwhite", 1),
+])
+def test_unique_names_are_added_locally(bot, message, product_name, quantity):
+    assert bot._try_local_add_to_cart(message) == f"Added {product_name}"
+    (function_name, arguments), = bot.calls
+    assert function_name == "add_to_cart"
+    assert arguments["product_name"] == product_name
+    assert arguments["quantity"] == quantity
+
+
+@pytest.mark.parametrize("message", [
+    "add it to my cart",
+    "add that one to cart",
+    "add xyzzy to my cart",
+    "add 0 dune to cart",
+    "show me my cart",
+])
+def test_contextual_unknown_or_unmatched_messages_are_not_handled(bot, message):
+    assert bot._try_local_add_to_cart(message) is None
+    assert bot.calls == []
+
+
+def test_unique_catalog_match(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    assert EcommerceChatbot._unique_catalog_match("ipad air")["name"] == "iPad Air"
+    assert EcommerceChatbot._unique_catalog_match("pro") is None
@@ -0,0 +1,80 @@
+"""sanitize_input's fast path must match the original regex chain exactly."""
+
+import random
+import re
+
+import pytest
+
+from src.utils import sanitize_input
+
+SQL_PATTERNS = [
+    r'(?i)\bDROP\s+TABLE\b',
+    r'(?i)\bDELETE\s+FROM\b',
+    r'(?i)\bINSERT\s+INTO\b',
+    r'(?i)\bUPDATE\s+SET\b',
+    r'(?i)\bSELECT\s+.*\s+FROM\b',
+    r'(?i)\bUNION\s+SELECT\b',
+    r'--',
+    r'/\*.*?\*/',
+]
+
+
+def reference_sanitize(text, max_length=None):
+    """The regex-only implementation the fast path replaced."""
+    if not text:
+        return ""
+    sanitized = re.sub(r'[<>"\';\\]', '', text)
+    for pattern in SQL_PATTERNS:
+        sanitized = re.sub(pattern, '', sanitized)
+    sanitized = sanitized.strip()
+    if max_length and len(sanitized) > max_length:
+        sanitized = sanitized[:max_length]
+    return sanitized
+
+
+CASES = [
+    "",
+    "show me laptops under $1000",
+    "  padded input  ",
+    "<script>alert('x')</script>",
+    "Robert'; DROP TABLE orders;--",
+    "drop   table users",
+    "DeLeTe FrOm orders",
+    "insert into x values (1)",
+    "please UPDATE SET price=0",
+    "select name from products",
+    "1 UNION SELECT password",
+    "a /* hidden */ b",
+    "dash--dash",
+    "dropped tables are fine",
+    "selection of fromage",
+    # Non-ASCII characters that IGNORECASE folds onto ASCII letters
+    "droр table",
+    "ınsert into x",
+    "SELECT ſ FROM t",
+    "dİſcount --",
+    "café \\ \"quoted\"",
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_reference_on_known_inputs(text):
+    assert sanitize_input(text) == reference_sanitize(text)
+
+
+@pytest.mark.parametrize("max_length", [None, 1, 5, 100])
+def test_max_length_matches_reference(max_length):
+    text = "  Robert'; DROP TABLE orders; -- and more text after it  "
+    assert sanitize_input(text, max_length) == reference_sanitize(text, max_length)
+
+
+def test_matches_reference_on_random_inputs():
+    rng = random.Random(1234)
+    fragments = [
+        "drop", "DROP", "table", "delete", "from", "insert", "into", "update", "set",
+        "select", "union", "--", "/*", "*/", "-", "/", "*", " ", "  ", "\t", "\n",
+        "<", ">", "'", '"', ";", "\\", "laptop", "x", "ı", "ſ", "İ", "é",
+    ]
+    for _ in range(5000):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 12)))
+        assert sanitize_input(text) == reference_sanitize(text), repr(text)
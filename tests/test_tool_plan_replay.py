@@ -0,0 +1,46 @@
+"""Cached tool plans are only replayed for messages that ground their arguments."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.chatbot import _plan_is_replayable, _tool_plan_key
+
+
+def tool_call(name, arguments="{}"):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def search(query):
+    return [tool_call("search_products", f'{{"query": "{query}"}}')]
+
+
+def test_exact_hit_needs_one_shared_word():
+    assert _plan_is_replayable(_tool_plan_key("show me laptops"), search("laptops"))
+    assert not _plan_is_replayable(_tool_plan_key("yes please"), search("laptops"))
+
+
+@pytest.mark.parametrize("message, cached_query", [
+    ("laptops under $500", "laptops under $1000"),
+    ("sony headphones", "bose headphones"),
+    ("cheap phones", "cheap tablets"),
+])
+def test_semantic_hit_rejects_different_arguments(message, cached_query):
+    assert not _plan_is_replayable(_tool_plan_key(message), search(cached_query), exact=False)
+
+
+@pytest.mark.parametrize("message, cached_query", [
+    ("could you show me laptops under $1000", "laptops under $1000"),
+    ("Laptops under 1000 dollars", "laptops under 1000"),
+])
+def test_semantic_hit_accepts_covered_arguments(message, cached_query):
+    assert _plan_is_replayable(_tool_plan_key(message), search(cached_query), exact=False)
+
+
+def test_semantic_hit_rejects_empty_arguments():
+    assert not _plan_is_replayable(_tool_plan_key("show me laptops"), search(""), exact=False)
+
+
+def test_state_changing_plans_are_never_replayed():
+    plan = [tool_call("add_to_cart", '{"product_name": "Dune"}')]
+    assert not _plan_is_replayable(_tool_plan_key("add dune to cart"), plan)